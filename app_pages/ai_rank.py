@@ -4,21 +4,14 @@ from pathlib import Path
 import re
 
 import pandas as pd
-import psycopg2
 import streamlit as st
 
-from config import secret_get
+import db
+from queries import fetch_ohlcv_range
+from strategies.rankings import aggregate_stats, fetch_rank_stats, hourly_rank
 from prompt_manager import get_prompt
 from grok_api import ask_xai
 
-DB_CFG = {
-    "host": secret_get("DB_HOST", "127.0.0.1"),
-    "port": secret_get("DB_PORT", "5432"),
-    "dbname": secret_get("DB_NAME", "ohlcv_1h"),
-    "user": secret_get("DB_USER", "postgres"),
-    "password": secret_get("DB_PASSWORD", ""),
-}
-
 AI_CACHE_FILE = Path("data/airank_cache.json")
 
 
@@ -44,12 +37,9 @@ def _save_ai_cache(cache: dict) -> None:
 
 
 def get_labels_map() -> dict[str, list]:
-    conn = psycopg2.connect(**DB_CFG)
-    cur = conn.cursor()
-    cur.execute("SELECT instrument_id, labels FROM instruments")
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+    with db.connection("ohlcv") as conn, conn.cursor() as cur:
+        cur.execute("SELECT instrument_id, labels FROM instruments")
+        rows = cur.fetchall()
 
     labels = {}
     for sym, lbl in rows:
@@ -63,77 +53,17 @@ def get_labels_map() -> dict[str, list]:
 
 
 def get_latest_ts() -> int:
-    conn = psycopg2.connect(**DB_CFG)
-    cur = conn.cursor()
-    cur.execute("SELECT MAX(time) FROM ohlcv_1h")
-    res = cur.fetchone()
-    cur.close()
-    conn.close()
+    with db.connection("ohlcv") as conn, conn.cursor() as cur:
+        cur.execute("SELECT MAX(time) FROM ohlcv_1h")
+        res = cur.fetchone()
     if not res or res[0] is None:
         raise RuntimeError("ohlcv_1h \u8868\u65e0\u6570\u636e")
     return int(res[0])
 
 
 def fetch_range(start_ts: int, end_ts: int) -> pd.DataFrame:
-    conn = psycopg2.connect(**DB_CFG)
-    sql = "SELECT symbol, time, open, close FROM ohlcv_1h WHERE time BETWEEN %s AND %s"
-    df = pd.read_sql(sql, conn, params=(start_ts, end_ts))
-    conn.close()
-    return df
-
-
-def hourly_rank(df: pd.DataFrame) -> pd.DataFrame:
-    if df.empty:
-        return pd.DataFrame(columns=["time", "symbol", "pct", "rank"])
-
-    df["pct"] = (df["close"] - df["open"]) / df["open"] * 100
-    df["rank"] = (
-        df.groupby("time")["pct"].rank(ascending=False, method="min").astype(int)
-    )
-    df = df.sort_values(["time", "rank"])
-    return df[["time", "symbol", "pct", "rank"]]
-
-
-def aggregate_stats(ranks: pd.DataFrame, top_n: int = 40) -> pd.DataFrame:
-    if ranks.empty:
-        return pd.DataFrame(
-            columns=["symbol", "times", "avg_percentile", "median_rank"]
-        )
-
-    pivot_rank = ranks.pivot(index="symbol", columns="time", values="rank")
-    pivot_pct = ranks.pivot(index="time", columns="symbol", values="pct")
-
-    times = (pivot_rank <= top_n).sum(axis=1)
-
-    max_rank_by_time = ranks.groupby("time")["rank"].max()
-    pivot_rank = pivot_rank.apply(
-        lambda col: col.fillna(max_rank_by_time[col.name] + 1)
-    )
-    median_rank = pivot_rank.median(axis=1)
-
-    df_percentile = pd.DataFrame(
-        index=pivot_pct.index, columns=pivot_pct.columns, dtype=float
-    )
-    N = pivot_pct.shape[1]
-    for h in pivot_pct.index:
-        ranks_series = pivot_pct.loc[h].rank(
-            ascending=False, method="first", na_option="bottom"
-        )
-        df_percentile.loc[h] = (N - ranks_series) / (N - 1)
-
-    avg_percentile = df_percentile.mean(axis=0)
-
-    stats = pd.DataFrame(
-        {
-            "symbol": avg_percentile.index,
-            "times": times.reindex(avg_percentile.index).fillna(0).astype(int),
-            "avg_percentile": avg_percentile,
-            "median_rank": median_rank.reindex(avg_percentile.index),
-        }
-    )
-
-    stats = stats.sort_values(["times", "avg_percentile"], ascending=[False, False])
-    return stats.reset_index(drop=True)
+    with db.connection("ohlcv") as conn:
+        return fetch_ohlcv_range(conn, start_ts, end_ts, fields=("open", "close"))
 
 
 # ---- AI summary helpers ----
@@ -245,9 +175,12 @@ def render_ai_rank_page():
         start_ts = end_ts - (hours - 1) * 3600 * 1000
 
         with st.spinner("\u8ba1\u7b97\u4e2d..."):
-            df = fetch_range(start_ts, end_ts)
-            ranks = hourly_rank(df)
-            stats = aggregate_stats(ranks, int(top_n))
+            stats = fetch_rank_stats(start_ts, end_ts, int(top_n))
+            if stats is None:
+                # rank_1h 还没排到最新一小时，现场计算
+                df = fetch_range(start_ts, end_ts)
+                ranks = hourly_rank(df)
+                stats = aggregate_stats(ranks, int(top_n))
 
         if stats.empty:
             st.warning("\u6307\u5b9a\u533a\u95f4\u6ca1\u6709\u6570\u636e")
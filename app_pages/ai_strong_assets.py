@@ -2,7 +2,7 @@ import streamlit as st
 from datetime import datetime, date, time, timedelta, timezone as dt_timezone
 from sqlalchemy import text
 from db import engine_ohlcv
-from strategies.strong_assets import compute_period_metrics
+from strategies.strong_assets import compute_universe_period_metrics
 from query_history import add_entry, get_history
 from utils import (
     safe_rerun,
@@ -12,7 +12,6 @@ from utils import (
     quick_range_buttons,
 )
 from result_cache import load_cached, save_cached
-import pandas as pd
 from grok_search import live_search_summary, x_search_summary
 from config import load_proxy_env
 
@@ -139,29 +138,16 @@ def render_ai_strong_assets_page():
         cache_id, df = load_cached("ai_strong_assets", params)
         if df is None:
 
-            # 拉取所有 symbol 及对应标签
+            # 拉取对应标签，所有 symbol 的指标一次查询算出
             with engine_ohlcv.connect() as conn:
-                symbols = [
-                    row[0]
-                    for row in conn.execute(text("SELECT DISTINCT symbol FROM ohlcv_1h"))
-                ]
                 result = conn.execute(text("SELECT instrument_id, labels FROM instruments"))
                 labels_map = {instr_id: labels for instr_id, labels in result}
 
-            records = []
-            for symbol in symbols:
-                try:
-                    m = compute_period_metrics(symbol, start_ts, end_ts)
-                except ValueError:
-                    continue
-                m["symbol"] = symbol
-                records.append(m)
-
-            if not records:
+            df = compute_universe_period_metrics(start_ts, end_ts)
+            if df.empty:
                 st.warning("该区间内无数据")
                 return
 
-            df = pd.DataFrame(records)
             save_cached("ai_strong_assets", params, df)
         else:
             with engine_ohlcv.connect() as conn:
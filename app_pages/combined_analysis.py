@@ -4,7 +4,7 @@ import numpy as np
 from datetime import datetime, date, time, timedelta, timezone as dt_timezone
 from sqlalchemy import text
 from db import engine_ohlcv
-from strategies.strong_assets import compute_period_metrics
+from strategies.strong_assets import compute_universe_period_metrics
 from app_pages.price_change_by_label import (
     get_mappings,
     compute_period_metrics as label_compute,
@@ -156,27 +156,14 @@ def render_combined_page():
         }
         # Always compute using all symbols so the full list is available
         with engine_ohlcv.connect() as conn:
-            symbols = [
-                row[0]
-                for row in conn.execute(text("SELECT DISTINCT symbol FROM ohlcv_1h"))
-            ]
             result = conn.execute(text("SELECT instrument_id, labels FROM instruments"))
             labels_map = {instr_id: labels for instr_id, labels in result}
 
-        records = []
-        for symbol in symbols:
-            try:
-                m = compute_period_metrics(symbol, start_ts, end_ts)
-            except ValueError:
-                continue
-            m["symbol"] = symbol
-            records.append(m)
-
-        if not records:
+        df = compute_universe_period_metrics(start_ts, end_ts)
+        if df.empty:
             st.warning("该区间内无数据")
             return
 
-        df = pd.DataFrame(records)
         sa_cache_id = save_cached("strong_assets", sa_params, df)
 
         history_extra["sa_id"] = sa_cache_id
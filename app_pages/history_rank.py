@@ -5,6 +5,7 @@ from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from sqlalchemy import text
 from db import engine_ohlcv
+from queries import fetch_ohlcv
 from config import TZ_NAME
 from datetime import timedelta
 CSV_FILE = Path("data/rank_history.csv")
@@ -89,20 +90,14 @@ def update_history() -> pd.DataFrame:
             last_time = pd.to_datetime(last_time)
     records = []
 
+    end_ms = int(pd.Timestamp.now(tz="UTC").timestamp() * 1000)
+
     def fetch_history(sym: str):
-        if last_time is None:
-            sql = text(
-                "SELECT time, open, high, low, close, volume_usd FROM ohlcv_1h WHERE symbol=:sym ORDER BY time"
-            )
-            params = {"sym": sym}
-        else:
+        # 全量回补时从 0 开始读，fetch_ohlcv 会并入已归档的 K 线
+        start_ms = 0
+        if last_time is not None:
             start_ms = int(last_time.tz_convert("UTC").timestamp() * 1000) - 96 * 15 * 60 * 1000
-            sql = text(
-                "SELECT time, open, high, low, close, volume_usd FROM ohlcv_1h WHERE symbol=:sym AND time >= :s ORDER BY time"
-            )
-            params = {"sym": sym, "s": start_ms}
-        with engine_ohlcv.connect() as conn:
-            df = pd.read_sql(sql, conn, params=params)
+        df = fetch_ohlcv(engine_ohlcv, sym, start_ms, end_ms)
         if df.empty:
             return None
         df["dt"] = pd.to_datetime(df["time"], unit="ms", utc=True).dt.tz_convert(TZ_NAME)
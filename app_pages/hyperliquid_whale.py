@@ -1,48 +1,28 @@
 # 文件路径：pages/hyperliquid_whale.py
 
 import os
-import requests
-import psycopg2
 import pandas as pd
 import streamlit as st
 from datetime import datetime, timedelta
 from streamlit_autorefresh import st_autorefresh
 from dotenv import load_dotenv
-from config import secret_get
+import db
+from config import CG_API_BASE, secret_get
+from ingestion.ratelimit import limited_get
 
 load_dotenv()
 
-def get_conn():
-    """
-    创建并缓存数据库连接，使用 st.cache_resource
-    """
-    DB_CONFIG = {
-        'host': secret_get('DB_HOST', '127.0.0.1'),
-        'port': secret_get('DB_PORT', '5432'),
-        'dbname': secret_get('INSTR_DB', 'postgres'),
-        'user': secret_get('DB_USER', 'postgres'),
-        'password': secret_get('DB_PASSWORD', ''),
-    }
-
-    @st.cache_resource
-    def _connect():
-        conn = psycopg2.connect(**DB_CONFIG)
-        conn.autocommit = True
-        return conn
-
-    return _connect()
-
-
 def fetch_hyperliquid_data(api_key: str) -> list:
     """
     从 Coinglass Hyperliquid Whale API 拉取实时鲸鱼数据
     """
-    url = "https://open-api-v4.coinglass.com/api/hyperliquid/whale-alert"
+    url = f"{CG_API_BASE}/hyperliquid/whale-alert"
     headers = {
         'CG-API-KEY': api_key,
         'accept': 'application/json'
     }
-    resp = requests.get(url, headers=headers)
+    # 与采集脚本共享 CoinGlass 配额，页面请求优先；每次重试都重新取令牌
+    resp = limited_get(url, priority="high", headers=headers)
     if resp.status_code != 200:
         st.error(f"API 请求失败：{resp.status_code}")
         return []
@@ -166,18 +146,15 @@ def render_table(df: pd.DataFrame):
 def render_hyperliquid_whale_page():
     st.title("Hyperliquid 鲸鱼监控")
 
-    conn = get_conn()
-    cur = conn.cursor()
-
     # 备注输入
     with st.form("remark_form"):
         addr = st.text_input("钱包地址（User Address）")
         note = st.text_input("备注")
         if st.form_submit_button("提交备注"):
-            cur.execute(
-                "UPDATE hl_realtime SET remark=%s, last_update=NOW() WHERE user_address=%s", (note, addr)
-            )
-            conn.commit()
+            with db.connection("instruments") as conn, conn.cursor() as cur:
+                cur.execute(
+                    "UPDATE hl_realtime SET remark=%s, last_update=NOW() WHERE user_address=%s", (note, addr)
+                )
             st.success("备注已保存")
 
     # 自动刷新
@@ -189,8 +166,10 @@ def render_hyperliquid_whale_page():
         st.error('未配置 CG_API_KEY')
         return
     records = fetch_hyperliquid_data(api_key)
-    update_database(conn, records)
+    # 每 5 秒刷新一次，从连接池借用连接，不再长期占用一个缓存连接
+    with db.connection("instruments") as conn:
+        update_database(conn, records)
 
-    # 渲染表格
-    df_recent = load_recent_data(conn, hours=4)
+        # 渲染表格
+        df_recent = load_recent_data(conn, hours=4)
     render_table(df_recent)
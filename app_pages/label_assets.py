@@ -3,9 +3,8 @@
 import os
 import streamlit as st
 import pandas as pd
-import psycopg2
 from dotenv import load_dotenv
-from config import secret_get
+import db
 
 def render_label_assets_page():
     """
@@ -14,14 +13,12 @@ def render_label_assets_page():
     能正确归入所有已打的标签组里。
     """
     load_dotenv()
-    DB_CFG = {
-        'host':     secret_get('DB_HOST', '127.0.0.1'),
-        'port':     secret_get('DB_PORT', '5432'),
-        'dbname':   secret_get('INSTR_DB', 'postgres'),
-        'user':     secret_get('DB_USER', 'postgres'),
-        'password': secret_get('DB_PASSWORD', ''),
-    }
-    conn = psycopg2.connect(**DB_CFG)
+    # 页面提前结束（st.stop / rerun）时连接也会归还连接池
+    with db.connection("instruments") as conn:
+        _render_label_assets(conn)
+
+
+def _render_label_assets(conn):
     cur = conn.cursor()
 
     # —— 1. 确保三张表结构存在 ——
@@ -188,4 +185,3 @@ def render_label_assets_page():
                     st.session_state.editing = None
 
     cur.close()
-    conn.close()
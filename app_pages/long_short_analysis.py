@@ -1,11 +1,10 @@
 import os
 import streamlit as st
 import pandas as pd
-import psycopg2
 import altair as alt
 from datetime import timedelta
 from dotenv import load_dotenv
-from config import secret_get
+import db
 
 
 def render_long_short_analysis_page():
@@ -13,39 +12,27 @@ def render_long_short_analysis_page():
     子页面：USD 单位多空持仓、OI/Mcap 分析，支持“只看币安”并先表格后绘图
     """
     load_dotenv()
-    # 主数据：coinmarket_aggregated 数据库
-    DB_CFG = {
-        'host': secret_get('DB_HOST', '127.0.0.1'),
-        'port': secret_get('DB_PORT', '5432'),
-        'dbname': secret_get('DB_NAME', 'coinmarket_aggregated'),
-        'user': secret_get('DB_USER', 'postgres'),
-        'password': secret_get('DB_PASSWORD', ''),
-    }
-    # instruments 表所在数据库（默认postgres）
-    DB_CFG_INST = DB_CFG.copy()
-    DB_CFG_INST['dbname'] = secret_get('INSTR_DB', 'postgres')
 
     @st.cache_data(ttl=60)
     def load_data():
-        conn = psycopg2.connect(**DB_CFG)
         # 选取所有可用字段
         sql = '''
         SELECT *
         FROM coinmarket_aggregated
         ORDER BY ts
         '''
-        df = pd.read_sql(sql, conn, parse_dates=['ts'])
-        conn.close()
-        return df
+        # 主数据：coinmarket_aggregated 数据库
+        with db.connection("coinmarket_aggregated") as conn:
+            return pd.read_sql(sql, conn, parse_dates=['ts'])
 
     @st.cache_data(ttl=300)
     def load_binance_symbols():
         """
         从 instruments 表读取 Binance 交易对列表，提取基础币种
         """
-        conn = psycopg2.connect(**DB_CFG_INST)
-        df = pd.read_sql("SELECT instrument_id FROM instruments", conn)
-        conn.close()
+        # instruments 表所在数据库（默认postgres）
+        with db.connection("instruments") as conn:
+            df = pd.read_sql("SELECT instrument_id FROM instruments", conn)
         ids = df['instrument_id'].tolist()
         # 提取基础符号：去掉 USDT 后缀等
         base_syms = []
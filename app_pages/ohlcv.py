@@ -15,6 +15,8 @@ def render_ohlcv_page():
         (
             "ohlcv_1h",
             "ohlcv_4h",
+            "ohlcv_1d",
+            "ohlcv_1w",
         ),
         key="ohlcv_table",
     )
@@ -10,7 +10,7 @@ from tgbot.time_vol_alert import last_hour_label
 from tgbot.time_strong_asset import last_4h_range
 from sqlalchemy import text
 from result_cache import load_cached, save_cached
-from strategies.strong_assets import compute_period_metrics
+from strategies.strong_assets import compute_universe_period_metrics
 from db import engine_ohlcv
 
 CACHE_BASE = Path("/home/ubuntu/k2database/tgbot/data/cache")
@@ -73,24 +73,14 @@ def _load_slot_df(start_ts: int, end_ts: int) -> pd.DataFrame:
         return df
 
     with engine_ohlcv.begin() as conn:
-        symbols = [r[0] for r in conn.execute(text("SELECT DISTINCT symbol FROM ohlcv_1h"))]
         label_map = {
             r[0]: r[1] for r in conn.execute(text("SELECT instrument_id, labels FROM instruments"))
         }
 
-    records = []
-    for sym in symbols:
-        try:
-            m = compute_period_metrics(sym, start_ts, end_ts)
-        except ValueError:
-            continue
-        m["symbol"] = sym
-        records.append(m)
-
-    if not records:
+    df = compute_universe_period_metrics(start_ts, end_ts)
+    if df.empty:
         df = pd.DataFrame()
     else:
-        df = pd.DataFrame(records)
         df["标签"] = df["symbol"].map(
             lambda s: "，".join(label_map.get(s, [])) if label_map.get(s) else ""
         )
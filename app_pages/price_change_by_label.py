@@ -6,29 +6,20 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 from datetime import datetime, date, time, timedelta, timezone
-from sqlalchemy import text
+import db
 from db import engine_ohlcv
-import psycopg2
+from queries import fetch_ohlcv
 from dotenv import load_dotenv
-from config import secret_get
 from utils import safe_rerun, short_time_range, quick_range_buttons
 from query_history import add_entry, get_history
 from result_cache import load_cached, save_cached
 
 # —— 1. 读取环境 & 配置 ——
 load_dotenv()
-INSTR_DB = {
-    'host':   secret_get('DB_HOST','127.0.0.1'),
-    'port':   secret_get('DB_PORT','5432'),
-    'dbname': secret_get('DB_NAME','postgres'),
-    'user':   secret_get('DB_USER','postgres'),
-    'password': secret_get('DB_PASSWORD',''),
-}
 
 def get_mappings():
-    conn = psycopg2.connect(**INSTR_DB)
-    df = pd.read_sql("SELECT instrument_id AS symbol, labels FROM instruments", conn)
-    conn.close()
+    with db.connection("coin") as conn:
+        df = pd.read_sql("SELECT instrument_id AS symbol, labels FROM instruments", conn)
     def normalize(x):
         if isinstance(x, list): return x
         if pd.isna(x): return []
@@ -40,15 +31,7 @@ def get_mappings():
 def compute_period_metrics(symbol, start_ts, end_ts):
     """Return percentage change and drawdown for the given period."""
     try:
-        with engine_ohlcv.connect() as conn:
-            df = pd.read_sql(
-                text(
-                    "SELECT time, high, low, close FROM ohlcv_1h "
-                    "WHERE symbol=:symbol AND time BETWEEN :start AND :end ORDER BY time"
-                ),
-                conn,
-                params={"symbol": symbol, "start": start_ts, "end": end_ts},
-            )
+        df = fetch_ohlcv(engine_ohlcv, symbol, start_ts, end_ts)
 
         if df.empty:
             return None, None
@@ -9,6 +9,7 @@ from utils import safe_rerun, quick_range_buttons
 from sqlalchemy import text
 
 from db import engine_ohlcv
+from queries import fetch_ohlcv
 from strategies.strong_assets import compute_period_metrics
 from strategies.bottom_lift import analyze_bottom_lift
 
@@ -31,52 +32,14 @@ def save_watchlist(lst: list[str]) -> None:
     WATCHLIST_FILE.write_text(json.dumps(lst, ensure_ascii=False, indent=2))
 
 
-def aggregate_4h(df: pd.DataFrame) -> pd.DataFrame:
-    """Aggregate 15m candles into 4h bars aligned to 00:00/04:00/08:00..."""
-    df = df.set_index("dt").sort_index()
-    df.index = df.index.floor("15min")
-    tz = df.index.tz
-    if tz is not None:
-        origin = pd.Timestamp("1970-01-01", tz=tz)
-    else:
-        origin = "epoch"
-    rs = df.resample(
-        "4H",
-        label="left",
-        closed="left",
-        origin=origin,
-        offset="0H",
-    )
-
-    counts = rs["open"].count()
-    complete = counts[counts == 16].index
-    if complete.empty:
-        return pd.DataFrame()
-
-    o = rs["open"].first().loc[complete]
-    h = rs["high"].max().loc[complete]
-    l = rs["low"].min().loc[complete]
-    c = rs["close"].last().loc[complete]
-    v = rs["volume_usd"].sum().loc[complete]
-    res = pd.DataFrame({"open": o, "high": h, "low": l, "close": c, "volume": v})
-    res = res.reset_index().rename(columns={"dt": "start"})
-    return res
-
-
-def aggregate_daily(df4h: pd.DataFrame) -> pd.DataFrame:
-    df = df4h.set_index("start").sort_index()
-    counts = df["open"].resample("24H").count()
-    complete = counts[counts == 6].index
-    if complete.empty:
-        return pd.DataFrame()
-    o = df["open"].resample("24H").first().loc[complete]
-    h = df["high"].resample("24H").max().loc[complete]
-    l = df["low"].resample("24H").min().loc[complete]
-    c = df["close"].resample("24H").last().loc[complete]
-    v = df["volume"].resample("24H").sum().loc[complete]
-    res = pd.DataFrame({"open": o, "high": h, "low": l, "close": c, "volume": v})
-    res = res.reset_index().rename(columns={"start": "date"})
-    return res
+def load_bars(sym: str, table: str, start_ts: int, end_ts: int) -> pd.DataFrame:
+    """Read rolled-up bars (``ohlcv_4h``/``ohlcv_1d``) with a ``start`` column."""
+    df = fetch_ohlcv(engine_ohlcv, sym, start_ts, end_ts, table)
+    if df.empty:
+        return df
+    df["start"] = pd.to_datetime(df["time"], unit="ms", utc=True).dt.tz_convert("Asia/Shanghai")
+    df["close"] = df["close"].astype(float)
+    return df
 
 
 def rsi(series: pd.Series, period: int = 14) -> pd.Series:
@@ -180,12 +143,12 @@ def render_watchlist_page():
             except ValueError:
                 continue
             max_vol = df["high"].max() - df["low"].min()
-            # 聚合4H
-            agg4h = aggregate_4h(df)
+            # 4H / 日线由 ingestion.rollup 从 ohlcv_1h 聚合入库
+            agg4h = load_bars(sym, "ohlcv_4h", start_ts, end_ts)
             if agg4h.empty:
                 continue
             rsi4 = rsi(agg4h["close"]).iloc[-1] if len(agg4h) >= 14 else None
-            daily = aggregate_daily(agg4h)
+            daily = load_bars(sym, "ohlcv_1d", start_ts, end_ts)
             rsi1d = rsi(daily["close"]).iloc[-1] if len(daily) >= 14 else None
             macd_line, signal_line = macd(agg4h["close"])
             golden, death = find_cross_times(agg4h["start"], macd_line, signal_line)
@@ -0,0 +1,288 @@
+"""Process-wide in-memory cube of recent 1h bars.
+
+Pages and bots mostly look at the last hours or days of ``ohlcv_1h``.  A
+:class:`BarCube` keeps that window in one preallocated numpy array of shape
+``(symbols, hours, fields)`` (fields in ``queries.OHLCV_FIELDS`` order) and
+refreshes it in the background: every poll reads ``ingestion_watermarks``
+and fetches only the symbols whose watermark moved, re-reading a few hours
+of overlap so corrected bars are picked up too.  Older bars filled in by
+``ingestion.gaps`` do not move a watermark, so the incremental refresh never
+sees them; they are picked up by the full reload every ``BAR_CUBE_RELOAD``
+seconds, or on the next poll after :meth:`BarCube.invalidate`.  The cube only
+answers while its last successful refresh is at most ``STALE_POLLS`` poll
+intervals old; when Postgres is unreachable for longer, :func:`load_matrix`
+falls back to querying it directly instead of serving frozen bars.
+
+Time slices are zero-copy views; a symbol subset is gathered into a new
+array.  Views are live, so a bar written by a refresh shows up in views
+handed out earlier.  When the window moves past the end of the buffer a
+fresh buffer is allocated, which keeps older views valid.
+
+Long-running processes opt in with :func:`enable`; :func:`load_matrix`
+answers from the cube when it covers the range and from Postgres otherwise::
+
+    bar_cube.enable()            # e.g. at Streamlit or bot start-up
+    matrix = bar_cube.load_matrix(None, start_ts, end_ts)
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import secret_get
+from db import engine_ohlcv
+from queries import OHLCV_FIELDS, OHLCV_INTERVAL_MS, OHLCVMatrix, fetch_ohlcv_matrix
+
+HOUR_MS = OHLCV_INTERVAL_MS["ohlcv_1h"]
+CUBE_DAYS = int(secret_get("BAR_CUBE_DAYS", "30"))
+POLL_SECONDS = float(secret_get("BAR_CUBE_POLL", "60"))
+# 每次刷新重读水位之前这么多小时，覆盖被改写的最近几根 K 线
+OVERLAP_HOURS = 3
+# 补缺口写入的旧 K 线不会推进水位，定期整窗重载一次
+RELOAD_SECONDS = float(secret_get("BAR_CUBE_RELOAD", "3600"))
+# 超过这么多个轮询周期没有刷新成功就不再用缓存作答
+STALE_POLLS = 3
+WATERMARK_SQL = text("SELECT symbol, last_ts FROM ingestion_watermarks WHERE dataset = 'ohlcv_1h'")
+
+
+def _floor_hour(ts: int) -> int:
+    return ts // HOUR_MS * HOUR_MS
+
+
+class BarCube:
+    """Rolling ``(symbols, hours, fields)`` array of the newest 1h bars."""
+
+    def __init__(self, engine=engine_ohlcv, days: int = CUBE_DAYS):
+        self.engine = engine
+        self.hours = days * 24
+        self._lock = threading.Lock()
+        self._symbols: list[str] = []
+        self._index: dict[str, int] = {}
+        self._data = np.empty((0, 0, len(OHLCV_FIELDS)))
+        self._mask = np.empty((0, 0), dtype=bool)
+        self._t0 = 0  # time of row 0 (ms)
+        self._rows = 0  # rows filled so far
+        self._marks: dict[str, int] | None = None
+        self._loaded = False
+        self._loaded_at = 0.0
+        self._reload = False
+        self._poll_seconds = POLL_SECONDS
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.stats = {"refreshes": 0, "bars": 0, "reallocations": 0, "last_refresh": None, "errors": 0}
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    def _reallocate(self, symbols: int, t0: int) -> None:
+        """Move to a fresh buffer starting at ``t0`` with room for ``symbols``."""
+        data = np.full((symbols, 2 * self.hours, len(OHLCV_FIELDS)), np.nan)
+        mask = np.zeros((symbols, 2 * self.hours), dtype=bool)
+        shift = (t0 - self._t0) // HOUR_MS
+        keep = max(0, self._rows - shift)
+        if keep:
+            n = len(self._symbols)
+            data[:n, :keep] = self._data[:n, shift:self._rows]
+            mask[:n, :keep] = self._mask[:n, shift:self._rows]
+        self._data, self._mask = data, mask
+        self._t0, self._rows = t0, keep
+        self.stats["reallocations"] += 1
+
+    def _columns(self, symbols: list[str]) -> np.ndarray:
+        """Cube rows of ``symbols``, adding new symbols as needed."""
+        new = [s for s in symbols if s not in self._index]
+        if len(self._symbols) + len(new) > self._data.shape[0]:
+            capacity = int((len(self._symbols) + len(new)) * 1.25) + 64
+            self._reallocate(capacity, self._t0)
+        for s in new:
+            self._index[s] = len(self._symbols)
+            self._symbols.append(s)
+        return np.array([self._index[s] for s in symbols], dtype=np.intp)
+
+    def _place(self, matrix: OHLCVMatrix) -> int:
+        """Write the present bars of ``matrix``; return how many."""
+        if not len(matrix.times) or not matrix.mask.any():
+            return 0
+        cols = self._columns(matrix.symbols)
+        latest = int(matrix.times[matrix.mask.any(axis=1)].max())
+        if (latest - self._t0) // HOUR_MS >= self._data.shape[1]:
+            self._reallocate(self._data.shape[0], latest - (self.hours - 1) * HOUR_MS)
+        offset = matrix.times - self._t0
+        rows = offset // HOUR_MS
+        ok = (offset % HOUR_MS == 0) & (rows >= 0) & (rows < self._data.shape[1])
+        r, c = np.nonzero(matrix.mask & ok[:, None])
+        for f, field in enumerate(OHLCV_FIELDS):
+            self._data[cols[c], rows[r], f] = matrix[field][r, c]
+        self._mask[cols[c], rows[r]] = True
+        if len(r):
+            self._rows = max(self._rows, int(rows[r].max()) + 1)
+        return len(r)
+
+    # ------------------------------------------------------------------
+    # Refresh
+    # ------------------------------------------------------------------
+
+    def _watermarks(self) -> dict[str, int] | None:
+        try:
+            with self.engine.connect() as conn:
+                marks = {sym: int(ts) for sym, ts in conn.execute(WATERMARK_SQL)}
+        except SQLAlchemyError:
+            return None
+        return marks or None
+
+    def refresh(self) -> int:
+        """Load the window on first use, afterwards only what changed."""
+        now = int(time.time() * 1000)
+        marks = self._watermarks()
+        if not self._loaded or self._reload or time.monotonic() - self._loaded_at > RELOAD_SECONDS:
+            t0 = _floor_hour(now) - (self.hours - 1) * HOUR_MS
+            matrix = fetch_ohlcv_matrix(self.engine, None, t0, now)
+            with self._lock:
+                if not self._loaded:
+                    self._t0 = t0
+                capacity = max(self._data.shape[0], int(len(matrix.symbols) * 1.25) + 64)
+                self._reallocate(capacity, max(t0, self._t0))
+                n = self._place(matrix)
+                self._marks, self._loaded = marks, True
+            self._reload = False
+            self._loaded_at = time.monotonic()
+        else:
+            if marks is None or self._marks is None:
+                # 没有水位表时重读最近几个小时的所有交易对
+                symbols = None
+                since = self._t0 + max(0, self._rows - OVERLAP_HOURS) * HOUR_MS
+            else:
+                changed = [s for s, ts in marks.items() if ts > self._marks.get(s, -1)]
+                if not changed:
+                    self.stats["last_refresh"] = now
+                    return 0
+                symbols = sorted(changed)
+                since = min(self._marks.get(s, self._t0) for s in symbols) - OVERLAP_HOURS * HOUR_MS
+            matrix = fetch_ohlcv_matrix(self.engine, symbols, max(since, self._t0), now)
+            with self._lock:
+                n = self._place(matrix)
+                if marks is not None:
+                    self._marks = marks
+        self.stats["refreshes"] += 1
+        self.stats["bars"] += n
+        self.stats["last_refresh"] = now
+        return n
+
+    def invalidate(self) -> None:
+        """Reload the whole window on the next refresh (e.g. after a gap backfill)."""
+        self._reload = True
+
+    def _poll(self, seconds: float) -> None:
+        while True:
+            try:
+                self.refresh()
+            except Exception as exc:
+                self.stats["errors"] += 1
+                print(f"[bar_cube] 刷新失败: {exc}", flush=True)
+            if self._stop.wait(seconds):
+                return
+
+    def start(self, poll: float = POLL_SECONDS) -> None:
+        """Load and keep refreshing in a daemon thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._poll_seconds = poll
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._poll, args=(poll,), name="bar-cube", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def fresh(self) -> bool:
+        """Whether the last successful refresh is recent enough to answer from."""
+        last = self.stats["last_refresh"]
+        if last is None:
+            return False
+        return time.time() * 1000 - last < STALE_POLLS * self._poll_seconds * 1000
+
+    def covers(self, start_ts: int) -> bool:
+        """Whether bars from ``start_ts`` on are held by the cube and up to date."""
+        return self._loaded and start_ts >= self._t0 and self.fresh()
+
+    def matrix(self, symbols, start_ts: int, end_ts: int) -> OHLCVMatrix:
+        """Bars of ``symbols`` in ``[start_ts, end_ts]`` like ``fetch_ohlcv_matrix``.
+
+        ``symbols=None`` returns views of every symbol in the cube; a symbol
+        list is gathered in the given order (unknown symbols are all-NaN).
+        """
+        with self._lock:
+            if not self.covers(start_ts):
+                raise ValueError("bar cube does not cover the range or is stale")
+            i0 = -((self._t0 - start_ts) // HOUR_MS)  # first row at or after start_ts
+            i1 = max(i0, min(self._rows, (end_ts - self._t0) // HOUR_MS + 1))
+            times = self._t0 + np.arange(i0, i1, dtype=np.int64) * HOUR_MS
+            if symbols is None:
+                names = list(self._symbols)
+                data = self._data[: len(names), i0:i1]
+                mask = self._mask[: len(names), i0:i1]
+            else:
+                names = list(symbols)
+                cols = np.array([self._index.get(s, -1) for s in names], dtype=np.intp)
+                known = cols >= 0
+                data = np.full((len(names), i1 - i0, len(OHLCV_FIELDS)), np.nan)
+                mask = np.zeros((len(names), i1 - i0), dtype=bool)
+                data[known] = self._data[cols[known], i0:i1]
+                mask[known] = self._mask[cols[known], i0:i1]
+        fields = {field: data[:, :, f].T for f, field in enumerate(OHLCV_FIELDS)}
+        return OHLCVMatrix(names, times, mask=mask.T, **fields)
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "symbols": len(self._symbols),
+                "hours": self.hours,
+                "start": self._t0,
+                "end": self._t0 + (self._rows - 1) * HOUR_MS if self._rows else None,
+                "bytes": self._data.nbytes + self._mask.nbytes,
+                "fresh": self.fresh(),
+                **self.stats,
+            }
+
+
+_CUBE: BarCube | None = None
+_CUBE_LOCK = threading.Lock()
+
+
+def enable(days: int = CUBE_DAYS, poll: float = POLL_SECONDS) -> BarCube | None:
+    """Start the process-wide cube (idempotent); ``BAR_CUBE_DAYS=0`` turns it off."""
+    global _CUBE
+    if days <= 0:
+        return None
+    with _CUBE_LOCK:
+        if _CUBE is None:
+            _CUBE = BarCube(days=days)
+            _CUBE.start(poll)
+        return _CUBE
+
+
+def get_cube() -> BarCube | None:
+    return _CUBE
+
+
+def load_matrix(symbols, start_ts: int, end_ts: int) -> OHLCVMatrix:
+    """1h bars from the cube when it covers ``start_ts``, else from Postgres."""
+    cube = _CUBE
+    if cube is not None and cube.covers(start_ts):
+        try:
+            return cube.matrix(symbols, start_ts, end_ts)
+        except ValueError:
+            pass  # the window moved on or the cube went stale in the meantime
+    return fetch_ohlcv_matrix(engine_ohlcv, symbols, start_ts, end_ts)
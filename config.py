@@ -44,6 +44,10 @@ OHLCV_DB_NAME = secret_get("OHLCV_DB_NAME", COIN_DB_NAME)
 
 # 业务所需 API Key
 CG_API_KEY = secret_get("CG_API_KEY")
+# 指向本地模拟服务（python -m ingestion.mockserver）即可离线测试
+CG_API_BASE = secret_get("CG_API_BASE", "https://open-api-v4.coinglass.com/api")
+# 多个 key 逗号分隔，分片采集时每个 worker 使用其中一个；第一个与 CG_API_KEY 共用限流桶
+CG_API_KEYS = [k.strip() for k in (secret_get("CG_API_KEYS") or CG_API_KEY or "").split(",") if k.strip()]
 
 # 时区常量
 TZ_NAME = "Asia/Shanghai"
@@ -1,6 +1,30 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
 from sqlalchemy import create_engine
 from sqlalchemy.engine.url import URL
-from config import DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, COIN_DB_NAME, OHLCV_DB_NAME
+from config import DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, COIN_DB_NAME, OHLCV_DB_NAME, secret_get
+
+# 逻辑库名 -> 实际数据库名，与各页面原来的环境变量保持一致
+DATABASES = {
+    "coin": COIN_DB_NAME,
+    "ohlcv": OHLCV_DB_NAME,
+    "instruments": secret_get("INSTR_DB", "postgres"),
+    "coinmarket_aggregated": secret_get(
+        "COINMARKET_DB_NAME", secret_get("DB_NAME", "coinmarket_aggregated")
+    ),
+    "tron": secret_get("TRON_DB_NAME", secret_get("DB_NAME", "tron_usd1")),
+}
+
+# 每个库最多同时打开的连接数；借不到连接时最多等待 POOL_TIMEOUT 秒
+POOL_MAX = int(secret_get("DB_POOL_MAX", "5"))
+POOL_TIMEOUT = float(secret_get("DB_POOL_TIMEOUT", "30"))
+# 空闲超过这么多秒的连接在借出前先 SELECT 1 检查
+HEALTH_CHECK_IDLE = float(secret_get("DB_POOL_CHECK_IDLE", "30"))
 
 
 def get_engine(db: str = "coin"):
@@ -22,3 +46,180 @@ def get_engine(db: str = "coin"):
 # 预实例化两个引擎
 engine_coin  = get_engine("coin")
 engine_ohlcv = get_engine("ohlcv")
+
+
+def db_config(db: str) -> dict:
+    """psycopg2.connect 参数；db 为 DATABASES 中的逻辑库名。"""
+    if db not in DATABASES:
+        raise ValueError(f"Unknown database: {db}. Choose from: {', '.join(DATABASES)}")
+    return {
+        "host": DB_HOST,
+        "port": DB_PORT,
+        "dbname": DATABASES[db],
+        "user": DB_USER,
+        "password": DB_PASSWORD,
+    }
+
+
+class ConnectionPool:
+    """有上限的 psycopg2 连接池，借出前做健康检查并统计使用情况。
+
+    psycopg2 自带的 ThreadedConnectionPool 在连接用尽时直接抛错，且会关闭
+    超出 minconn 的归还连接；这里自己维护空闲连接，用信号量让调用方排队等待，
+    超过 ``timeout`` 才报错。
+    """
+
+    def __init__(self, db: str, maxconn: int = POOL_MAX, timeout: float = POOL_TIMEOUT):
+        self.db = db
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self._cfg = db_config(db)
+        self._idle: list = []
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self.stats = {
+            "checkouts": 0,
+            "in_use": 0,
+            "max_in_use": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "timeouts": 0,
+            "health_checks": 0,
+            "connects": 0,
+            "reconnects": 0,
+        }
+
+    def _count(self, key: str, value=1) -> None:
+        with self._lock:
+            self.stats[key] += value
+
+    def _healthy(self, conn, last_used: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < HEALTH_CHECK_IDLE:
+            return True
+        self._count("health_checks")
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _checkout(self):
+        started = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            self._count("waits")
+            if not self._slots.acquire(timeout=self.timeout):
+                self._count("timeouts")
+                raise PoolError(f"{self.db}: 等待数据库连接超时（{self.timeout}s）")
+            self._count("wait_seconds", time.monotonic() - started)
+        try:
+            conn = None
+            with self._lock:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+            if conn is not None and not self._healthy(conn, last_used):
+                self._count("reconnects")
+                conn.close()
+                conn = None
+            if conn is None:
+                conn = psycopg2.connect(**self._cfg)
+                self._count("connects")
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.stats["checkouts"] += 1
+            self.stats["in_use"] += 1
+            self.stats["max_in_use"] = max(self.stats["max_in_use"], self.stats["in_use"])
+        return conn
+
+    def _checkin(self, conn) -> None:
+        close = bool(conn.closed)
+        if not close:
+            try:
+                # 归还前结束未提交的事务，恢复默认的事务模式
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if conn.autocommit:
+                    conn.autocommit = False
+            except psycopg2.Error:
+                close = True
+        with self._lock:
+            if close:
+                conn.close()
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self.stats["in_use"] -= 1
+        self._slots.release()
+
+    @contextmanager
+    def connection(self, autocommit: bool = False):
+        """借出一个连接；正常退出时提交，异常时回滚，随后归还。"""
+        conn = self._checkout()
+        try:
+            if autocommit:
+                conn.autocommit = True
+            yield conn
+            if not conn.closed and not conn.autocommit:
+                conn.commit()
+        except Exception:
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    pass
+            raise
+        finally:
+            self._checkin(conn)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "dbname": DATABASES[self.db],
+                "maxconn": self.maxconn,
+                "idle": len(self._idle),
+                **self.stats,
+            }
+
+    def close(self) -> None:
+        """关闭空闲连接；借出中的连接归还时照常进入空闲列表。"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            conn.close()
+
+
+_POOLS: dict[str, ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(db: str) -> ConnectionPool:
+    """每个逻辑库在进程内共享一个连接池。"""
+    with _POOLS_LOCK:
+        pool = _POOLS.get(db)
+        if pool is None:
+            pool = _POOLS[db] = ConnectionPool(db)
+        return pool
+
+
+def connection(db: str, autocommit: bool = False):
+    """``with connection("ohlcv") as conn:`` 从共享连接池借用连接。"""
+    return get_pool(db).connection(autocommit=autocommit)
+
+
+def pool_stats() -> dict[str, dict]:
+    """各连接池的借出次数、等待时间、重连次数等统计。"""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+    return {p.db: p.snapshot() for p in pools}
+
+
+def close_pools() -> None:
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for p in pools:
+        p.close()
@@ -1,10 +1,7 @@
 import os
 import time
-import requests
-from config import load_proxy_env, get_proxy_dict
 
-load_proxy_env()
-PROXIES = get_proxy_dict()
+import http_client
 
 API_URL = "https://api.x.ai/v1/chat/completions"
 MODEL = "grok-3-latest"
@@ -22,11 +19,10 @@ def ask_xai(prompt: str, retries: int = 1, timeout: int = 30) -> str:
     }
     for _ in range(retries + 1):
         try:
-            resp = requests.post(
+            resp = http_client.post(
                 API_URL,
                 headers=headers,
                 json=payload,
-                proxies=PROXIES or None,
                 timeout=timeout,
             )
             resp.raise_for_status()
@@ -0,0 +1,170 @@
+"""Shared HTTP client for every outbound API call.
+
+Calling ``requests.get`` / ``requests.post`` directly opens a new TCP (and
+TLS, often through the SOCKS proxy) connection per call.  This module keeps
+one :class:`requests.Session` per host with a keep-alive connection pool and
+the proxy settings from :func:`config.get_proxy_dict`, and wraps requests
+with consistent retries (exponential backoff with jitter, ``Retry-After``
+honoured) and per-endpoint latency/error counters.
+
+Usage::
+
+    import http_client
+
+    resp = http_client.get(url, params=..., timeout=10)
+    http_client.post(url, json=payload, timeout=10)
+    http_client.stats()   # {"GET api.trongrid.io/v1/...": {...}}
+"""
+
+from __future__ import annotations
+
+import random
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import get_proxy_dict
+
+# Statuses worth retrying; anything else is returned to the caller as is
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+POOL_MAXSIZE = 32
+MAX_BACKOFF = 30.0
+
+# Secrets embedded in URL paths (e.g. Telegram bot tokens) are not used as
+# counter keys
+_SECRET_PATH = re.compile(r"/bot[^/]+")
+
+_sessions: dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+_stats: dict[str, dict] = {}
+_stats_lock = threading.Lock()
+
+
+def _host_key(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def endpoint_name(method: str, url: str) -> str:
+    """Return the counter key of a request: method, host and path."""
+    parts = urlsplit(url)
+    return f"{method.upper()} {parts.netloc}{_SECRET_PATH.sub('/bot***', parts.path)}"
+
+
+def get_session(url: str) -> requests.Session:
+    """Return the pooled keep-alive session for the host of ``url``."""
+    key = _host_key(url)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.proxies.update(get_proxy_dict())
+            _sessions[key] = session
+        return session
+
+
+def _record(endpoint: str, seconds: float | None, *, error: bool = False, retry: bool = False) -> None:
+    with _stats_lock:
+        st = _stats.setdefault(
+            endpoint,
+            {"requests": 0, "errors": 0, "retries": 0, "total_seconds": 0.0, "max_seconds": 0.0},
+        )
+        if retry:
+            st["retries"] += 1
+            return
+        st["requests"] += 1
+        if error:
+            st["errors"] += 1
+        if seconds is not None:
+            st["total_seconds"] += seconds
+            st["max_seconds"] = max(st["max_seconds"], seconds)
+
+
+def _backoff(attempt: int, base: float, resp: requests.Response | None = None) -> float:
+    if resp is not None:
+        retry_after = resp.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), MAX_BACKOFF)
+    # Full jitter keeps concurrent callers from retrying in lockstep
+    return random.uniform(0, min(MAX_BACKOFF, base * 2**attempt))
+
+
+def request(
+    method: str,
+    url: str,
+    *,
+    retries: int | None = None,
+    backoff: float = 0.5,
+    endpoint: str | None = None,
+    **kwargs,
+) -> requests.Response:
+    """Send a request through the host's pooled session.
+
+    Connection errors, timeouts and :data:`RETRY_STATUS` responses are retried
+    up to ``retries`` times; by default GET requests are retried twice and
+    other methods not at all, since a POST may already have been processed.
+    The last response is returned whatever its status, so callers keep their
+    own status handling; the last exception is raised.
+    """
+    if retries is None:
+        retries = 2 if method.upper() == "GET" else 0
+    kwargs.setdefault("timeout", 30)
+    endpoint = endpoint or endpoint_name(method, url)
+    session = get_session(url)
+    for attempt in range(retries + 1):
+        started = time.monotonic()
+        try:
+            resp = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            _record(endpoint, time.monotonic() - started, error=True)
+            if attempt == retries:
+                raise
+            _record(endpoint, None, retry=True)
+            time.sleep(_backoff(attempt, backoff))
+            continue
+        failed = resp.status_code >= 400
+        _record(endpoint, time.monotonic() - started, error=failed)
+        if resp.status_code in RETRY_STATUS and attempt < retries:
+            _record(endpoint, None, retry=True)
+            time.sleep(_backoff(attempt, backoff, resp))
+            continue
+        return resp
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def stats() -> dict[str, dict]:
+    """Return a copy of the counters with the mean latency added."""
+    with _stats_lock:
+        out = {}
+        for endpoint, st in _stats.items():
+            row = dict(st)
+            row["avg_seconds"] = st["total_seconds"] / st["requests"] if st["requests"] else 0.0
+            out[endpoint] = row
+        return out
+
+
+def reset_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
+
+
+def close() -> None:
+    """Close every pooled session (e.g. at interpreter shutdown in tests)."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
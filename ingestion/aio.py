@@ -0,0 +1,314 @@
+"""asyncio fetch pipeline for the ingestion engine.
+
+The threaded engine keeps a fixed number of requests in flight, so on a slow
+link network latency rather than the API quota bounds throughput.  This module
+schedules every page of every job as a coroutine and lets an AIMD window
+decide how many requests are in flight:
+
+* a request that completes under ``target_latency`` grows the window by about
+  one slot per window's worth of requests;
+* an error, a slow response or a CoinGlass throttle response halves it, and a
+  throttle also pauses the shared token bucket.
+
+Parsed pages go through an :class:`asyncio.Queue` to a single writer task, so
+Postgres sees one COPY at a time no matter how many requests are in flight.
+
+HTTP calls go through the pooled ``http_client`` sessions on a thread pool
+sized to the window maximum; no async HTTP client is required.  A request
+takes its token from the shared bucket only once it holds a window slot, so
+the bucket paces the actual sends.  Tokens are handed out by one blocking
+``acquire`` on a separate single-thread executor, and only ``max_concurrency``
+runner tasks pull jobs at a time.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
+
+from tqdm import tqdm
+
+import http_client
+
+from ingestion.engine import IngestionEngine, merge_legs, request_pages
+from ingestion.parse import LegFrame, empty_leg, loads, parse_leg
+from ingestion.writer import ColumnBatch
+from ingestion.specs import DatasetSpec, Leg
+
+# CoinGlass reports throttling either as HTTP 429 or in the body code
+THROTTLE_CODES = {"429", "40001"}
+THROTTLE_PAUSE = 10.0
+
+
+class ThrottledError(RuntimeError):
+    """CoinGlass rejected a request because the quota was exceeded."""
+
+
+class AdaptiveWindow:
+    """Additive-increase / multiplicative-decrease limit on in-flight requests."""
+
+    def __init__(
+        self,
+        initial: int = 2,
+        minimum: int = 1,
+        maximum: int = 16,
+        target_latency: float = 2.0,
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self._cond = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def record(self, latency: float | None) -> None:
+        """Adjust the window after a request; ``None`` marks a failure."""
+        if latency is None or latency > self.target_latency:
+            self.limit = max(float(self.minimum), self.limit / 2)
+        else:
+            self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+
+
+class AsyncIngestor:
+    """Run an :class:`IngestionEngine`'s jobs on an asyncio event loop."""
+
+    def __init__(
+        self,
+        engine: IngestionEngine,
+        *,
+        max_concurrency: int = 16,
+        target_latency: float = 2.0,
+    ):
+        self.engine = engine
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+
+    async def _call(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def _take_token(self, spec: DatasetSpec, symbol: str) -> None:
+        # One thread blocks in acquire() so waiting callers queue up in order
+        # instead of polling the bucket from the request executor
+        started = time.perf_counter()
+        await asyncio.get_running_loop().run_in_executor(
+            self._limit_executor, self.engine.limiter.acquire, 1.0, self.engine.priority
+        )
+        self.engine.telemetry.add_time(spec.name, symbol, "limiter_wait", time.perf_counter() - started)
+
+    def _get(self, spec: DatasetSpec, symbol: str, params: dict, retry: bool) -> tuple[dict, float]:
+        """Send one request; return the decoded body and the HTTP latency."""
+        telemetry = self.engine.telemetry
+        started = time.perf_counter()
+        latency = None
+        ok = False
+        try:
+            resp = http_client.get(
+                self.engine.url(spec), params=params, headers=self.engine.headers, timeout=30, retries=0
+            )
+            latency = time.perf_counter() - started
+            if resp.status_code == 429:
+                raise ThrottledError("HTTP 429")
+            with telemetry.timed(spec.name, symbol, "parse"):
+                data = loads(resp.content)
+            code = str(data.get("code"))
+            if code in THROTTLE_CODES:
+                raise ThrottledError(data.get("msg"))
+            if code != "0":
+                raise RuntimeError(data.get("msg"))
+            ok = True
+            return data, latency
+        finally:
+            if latency is None:
+                latency = time.perf_counter() - started
+            telemetry.request(spec.name, symbol, latency, ok=ok, retry=retry)
+
+    async def fetch_leg(
+        self, spec: DatasetSpec, leg: Leg, symbol: str, page: tuple[int, int, int]
+    ) -> LegFrame:
+        """Fetch one page of an exchange leg inside the adaptive window."""
+        params = self.engine.build_params(spec, leg, symbol, page)
+        for attempt in range(3):
+            async with self.window:
+                await self._take_token(spec, symbol)
+                try:
+                    data, latency = await self._call(self._get, spec, symbol, params, attempt > 0)
+                except ThrottledError as exc:
+                    self.window.record(None)
+                    await self._call(self.engine.limiter.penalize, THROTTLE_PAUSE)
+                    err = exc
+                except Exception as exc:
+                    self.window.record(None)
+                    err = exc
+                else:
+                    self.window.record(latency)
+                    with self.engine.telemetry.timed(spec.name, symbol, "parse"):
+                        return parse_leg(leg, data.get("data") or [], exact=self.engine.exact)
+            if attempt == 2:
+                raise err
+            print(f"{leg.exchange} {symbol} 请求失败尝试重试: {err}", flush=True)
+            await asyncio.sleep(2**attempt)
+
+    async def fetch_records(
+        self, spec: DatasetSpec, symbol: str, page: tuple[int, int, int]
+    ) -> tuple[ColumnBatch, bool]:
+        """Async counterpart of :meth:`IngestionEngine.fetch_records`.
+
+        Shares the engine's leg cache and repair queue.
+        """
+        cache = self.engine._leg_cache
+        frames: dict[Leg, LegFrame] = {}
+        pending = []
+        for leg in spec.legs:
+            cached = cache.pop((spec.name, leg.exchange, symbol, page), None)
+            if cached is not None:
+                frames[leg] = cached
+            else:
+                pending.append(leg)
+        results = await asyncio.gather(
+            *(self.fetch_leg(spec, leg, symbol, page) for leg in pending),
+            return_exceptions=True,
+        )
+        errors = {}
+        for leg, res in zip(pending, results):
+            if isinstance(res, BaseException):
+                errors[leg] = res
+            else:
+                frames[leg] = res
+
+        required = [leg for leg in errors if leg.required]
+        if required:
+            for leg, frame in frames.items():
+                cache[(spec.name, leg.exchange, symbol, page)] = frame
+            raise errors[required[0]]
+
+        for leg, e in errors.items():
+            print(f"{leg.exchange} {symbol} 请求失败，使用 {leg.fill}，稍后单独重试: {e}", flush=True)
+            frames[leg] = empty_leg(leg, self.engine.exact)
+            self.engine.leg_repairs.append((spec, leg, symbol, page))
+        return merge_legs(spec, symbol, [frames[leg] for leg in spec.legs]), bool(errors)
+
+    async def process_symbol(
+        self, spec: DatasetSpec, symbol: str, start_ts: int, end_ts: int
+    ) -> tuple[int, bool]:
+        """Fetch the pages of one job in order and queue them for writing.
+
+        Pages are fetched sequentially so the watermark never passes an
+        unwritten page; concurrency comes from running many jobs at once.
+        Returns (queued rows, failed).
+        """
+        n = 0
+        for page in request_pages(spec, start_ts, end_ts):
+            try:
+                records, _ = await self.fetch_records(spec, symbol, page)
+            except Exception as e:
+                print(f"{spec.name} {symbol} 请求失败: {e}", flush=True)
+                return n, True
+            if len(records):
+                n += len(records)
+                self.engine.telemetry.rows(spec.name, symbol, fetched=len(records))
+                await self.queue.put((spec, records))
+        return n, False
+
+    async def _writer(self) -> None:
+        while True:
+            item = await self.queue.get()
+            try:
+                if item is None:
+                    return
+                spec, records = item
+                written = await asyncio.get_running_loop().run_in_executor(
+                    self._write_executor, self.engine.write, spec, records
+                )
+                self.totals[spec.name] = self.totals.get(spec.name, 0) + written
+            finally:
+                self.queue.task_done()
+
+    async def run_jobs(self, jobs: list[tuple[DatasetSpec, str, int, int]]) -> tuple[dict[str, int], list]:
+        """Run ``jobs`` and return (rows written per dataset, failed jobs)."""
+        self.window = AdaptiveWindow(
+            maximum=self.max_concurrency, target_latency=self.target_latency
+        )
+        # Bounded so fetchers wait for the writer instead of buffering the universe
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_concurrency * 4)
+        self.totals: dict[str, int] = {}
+        failed = []
+        writer = asyncio.create_task(self._writer())
+
+        pending = iter(jobs)
+
+        async def runner(bar):
+            # The window never admits more than max_concurrency requests, so
+            # more runners would only wait for a slot
+            for job in pending:
+                _, fail = await self.process_symbol(*job)
+                if fail:
+                    failed.append(job)
+                bar.update(1)
+                bar.set_postfix(
+                    written=sum(self.totals.values()),
+                    failed=len(failed),
+                    window=int(self.window.limit),
+                )
+
+        with tqdm(total=len(jobs)) as bar:
+            await asyncio.gather(
+                *(runner(bar) for _ in range(min(self.max_concurrency, len(jobs))))
+            )
+        await self.queue.put(None)
+        await writer
+        return self.totals, failed
+
+    def run(
+        self,
+        specs: Iterable[DatasetSpec],
+        symbols: list[str] | None = None,
+        rescan: bool = False,
+    ) -> tuple[dict[str, int], list]:
+        """Same contract as :meth:`IngestionEngine.run` on the async pipeline."""
+        engine = self.engine
+        specs = list(specs)
+        for spec in specs:
+            engine.ensure_table(spec)
+        if symbols is None:
+            symbols = engine.get_symbols()
+        if not symbols:
+            print("没有 instrument，请检查 instruments 表。", flush=True)
+            return {}, []
+
+        jobs = [job for spec in specs for job in engine.plan(spec, symbols, rescan=rescan)]
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_concurrency + 2) as self._executor, \
+                ThreadPoolExecutor(max_workers=1) as self._limit_executor, \
+                ThreadPoolExecutor(max_workers=1) as self._write_executor:
+            totals, failed = asyncio.run(self.run_jobs(jobs))
+            if failed:
+                print(f"重试失败的 symbol: {[f'{job[0].name}:{job[1]}' for job in failed]}", flush=True)
+                retry_totals, failed = asyncio.run(self.run_jobs(failed))
+                for name, n in retry_totals.items():
+                    totals[name] = totals.get(name, 0) + n
+        engine._leg_cache.clear()
+        engine.repair_legs()
+
+        elapsed = time.monotonic() - started
+        for spec in specs:
+            n_failed = sum(1 for job in failed if job[0] is spec)
+            print(
+                f"\n{spec.name} 总共写入 {totals.get(spec.name, 0)} 条数据，失败 {n_failed} 个symbol",
+                flush=True,
+            )
+        print(f"异步采集耗时 {elapsed:.1f}s", flush=True)
+        engine.report_run()
+        return totals, failed
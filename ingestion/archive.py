@@ -0,0 +1,301 @@
+"""Move old bars out of Postgres into monthly Parquet files.
+
+Interactive queries almost only read the last days, yet the bar tables hold
+years of history.  :func:`archive_month` deletes one calendar month (UTC) of
+a table with ``DELETE ... RETURNING`` and writes the rows to
+``{CG_ARCHIVE_DIR}/{table}/YYYY-MM.parquet`` (zstd, sorted by symbol and
+time, so row group statistics prune by symbol).  The transaction only
+commits once the file is written and verified, so a failure leaves the rows
+in the table.  ``_manifest.json`` next to the files keeps per-file stats and
+the archive boundary (end of the newest archived month).
+
+:func:`read_archive` reads archived bars back; ``queries.fetch_ohlcv``,
+``fetch_ohlcv_range`` and ``fetch_ohlcv_matrix`` merge them with live rows
+when a request starts before the boundary.  Not archive-aware: readers that
+query the tables directly for the latest hours only (``app_pages/monitor.py``,
+``app_pages/watchlist.py``, ``tgbot/time_vol_alert.py``).  Bars written
+into an archived month later (e.g. by ``ingestion.gaps``) stay in Postgres
+until the month is archived again, and the live row wins on read.
+
+Requires ``pyarrow``::
+
+    python -m ingestion.archive --status
+    python -m ingestion.archive ohlcv_1h --keep-days 90
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ModuleNotFoundError:
+    pa = pq = None
+
+from config import secret_get
+from ingestion.partitions import add_months, month_of, month_ms, months
+
+ARCHIVE_TABLES = ("ohlcv_1h", "ohlcv_4h", "ohlcv_1d", "ohlcv_1w", "ohlcv")
+KEEP_DAYS = 90
+ROW_GROUP_SIZE = 50_000
+MANIFEST = "_manifest.json"
+
+_manifest_cache: dict[str, tuple[float, dict]] = {}
+_manifest_lock = threading.Lock()
+
+
+# 默认目录固定在仓库下，页面、机器人和 cron 从不同工作目录启动时读到同一份归档
+DEFAULT_ARCHIVE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "archive"
+)
+
+
+def archive_dir() -> str:
+    return secret_get("CG_ARCHIVE_DIR", DEFAULT_ARCHIVE_DIR)
+
+
+def _table_dir(table: str) -> str:
+    return os.path.join(archive_dir(), table)
+
+
+def load_manifest(table: str) -> dict:
+    """Return ``{"boundary": ms, "files": {...}}``, cached until the file changes."""
+    path = os.path.join(_table_dir(table), MANIFEST)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {"boundary": 0, "files": {}}
+    with _manifest_lock:
+        cached = _manifest_cache.get(path)
+        if cached is None or cached[0] != mtime:
+            with open(path, encoding="utf-8") as f:
+                cached = (mtime, json.load(f))
+            _manifest_cache[path] = cached
+        return cached[1]
+
+
+def _save_manifest(table: str, manifest: dict) -> None:
+    path = os.path.join(_table_dir(table), MANIFEST)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def archive_boundary(table: str) -> int:
+    """Bars before this time (ms) may live in the archive; 0 if none."""
+    return load_manifest(table)["boundary"]
+
+
+# ----------------------------------------------------------------------
+# Reading
+# ----------------------------------------------------------------------
+
+
+def read_archive(table: str, symbol: str | None, start_ts: int, end_ts: int) -> pd.DataFrame:
+    """Archived bars of ``table`` with ``start_ts <= time <= end_ts``.
+
+    ``symbol=None`` reads every symbol.  Returns an empty frame when nothing
+    is archived or ``pyarrow`` is not installed.
+    """
+    manifest = load_manifest(table)
+    files = [
+        os.path.join(_table_dir(table), name)
+        for name, stats in sorted(manifest["files"].items())
+        if stats["min_time"] <= end_ts and stats["max_time"] >= start_ts
+    ]
+    if not files:
+        return pd.DataFrame()
+    if pq is None:
+        print("未安装 pyarrow，无法读取归档数据", flush=True)
+        return pd.DataFrame()
+    filters = [("time", ">=", start_ts), ("time", "<=", end_ts)]
+    if symbol is not None:
+        filters.append(("symbol", "=", symbol))
+    frames = [pq.read_table(path, filters=filters).to_pandas() for path in files]
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+def merge_archived(live: pd.DataFrame, archived: pd.DataFrame) -> pd.DataFrame:
+    """Combine archived and live bars; the live row wins on a duplicate."""
+    if archived.empty:
+        return live
+    if live.empty:
+        return archived.sort_values(["symbol", "time"], ignore_index=True)
+    merged = pd.concat([archived, live], ignore_index=True)
+    merged = merged.drop_duplicates(["symbol", "time"], keep="last")
+    return merged.sort_values(["symbol", "time"], ignore_index=True)
+
+
+# ----------------------------------------------------------------------
+# Writing
+# ----------------------------------------------------------------------
+
+
+def _value_columns(cur, table: str) -> list[str]:
+    cur.execute(
+        """
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s
+        ORDER BY ordinal_position
+        """,
+        (table,),
+    )
+    return [c for (c,) in cur.fetchall() if c not in ("symbol", "time")]
+
+
+def _write_parquet(path: str, frame: pd.DataFrame) -> int:
+    tmp = f"{path}.tmp"
+    pq.write_table(
+        pa.Table.from_pandas(frame, preserve_index=False),
+        tmp,
+        compression="zstd",
+        row_group_size=ROW_GROUP_SIZE,
+    )
+    if pq.read_metadata(tmp).num_rows != len(frame):
+        os.remove(tmp)
+        raise OSError(f"{tmp}: row count mismatch after write")
+    os.replace(tmp, path)
+    return os.path.getsize(path)
+
+
+def archive_month(conn, table: str, month: datetime) -> int:
+    """Move one month of ``table`` into its Parquet file; return rows moved.
+
+    Rows of a month that was archived before are merged into the existing
+    file (the newer row wins).
+    """
+    lo, hi = month_ms(month), month_ms(add_months(month, 1))
+    name = f"{month:%Y-%m}.parquet"
+    path = os.path.join(_table_dir(table), name)
+    with conn.cursor() as cur:
+        cols = _value_columns(cur, table)
+        returning = ", ".join(["symbol", "time", *(f"{c}::double precision" for c in cols)])
+        cur.execute(
+            f"DELETE FROM {table} WHERE time >= %s AND time < %s RETURNING {returning}",
+            (lo, hi),
+        )
+        rows = cur.fetchall()
+    if not rows:
+        conn.rollback()
+        return 0
+    try:
+        frame = pd.DataFrame(rows, columns=["symbol", "time", *cols])
+        frame["time"] = frame["time"].astype(np.int64)
+        frame[cols] = frame[cols].astype(np.float64)
+        if os.path.exists(path):
+            old = pq.read_table(path).to_pandas()
+            frame = pd.concat([old, frame], ignore_index=True).drop_duplicates(
+                ["symbol", "time"], keep="last"
+            )
+        frame = frame.sort_values(["symbol", "time"], ignore_index=True)
+        os.makedirs(_table_dir(table), exist_ok=True)
+        size = _write_parquet(path, frame)
+    except Exception:
+        conn.rollback()
+        raise
+
+    manifest = load_manifest(table)
+    manifest = {"boundary": max(manifest["boundary"], hi), "files": dict(manifest["files"])}
+    manifest["files"][name] = {
+        "rows": len(frame),
+        "symbols": int(frame["symbol"].nunique()),
+        "min_time": int(frame["time"].min()),
+        "max_time": int(frame["time"].max()),
+        "bytes": size,
+        "archived_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    _save_manifest(table, manifest)
+    conn.commit()
+    return len(rows)
+
+
+def archive_table(conn, table: str, keep_days: int = KEEP_DAYS, dry_run: bool = False) -> int:
+    """Archive every complete month of ``table`` older than ``keep_days``."""
+    now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+    # Only whole months that ended before the horizon
+    horizon = month_of(now_ms - keep_days * 24 * 3600 * 1000)
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT MIN(time) FROM {table} WHERE time < %s", (month_ms(horizon),))
+        first = cur.fetchone()[0]
+    conn.commit()
+    if first is None:
+        print(f"{table} 没有早于 {horizon:%Y-%m} 的数据需要归档", flush=True)
+        return 0
+    total = 0
+    for month in months(first, month_ms(add_months(horizon, -1))):
+        if dry_run:
+            print(f"{table} 将归档 {month:%Y-%m}", flush=True)
+            continue
+        n = archive_month(conn, table, month)
+        total += n
+        print(f"{table} {month:%Y-%m} 归档 {n} 行", flush=True)
+    return total
+
+
+def status(tables) -> None:
+    for table in tables:
+        manifest = load_manifest(table)
+        files = manifest["files"]
+        if not files:
+            print(f"{table}: 无归档", flush=True)
+            continue
+        rows = sum(f["rows"] for f in files.values())
+        size = sum(f["bytes"] for f in files.values())
+        boundary = datetime.fromtimestamp(manifest["boundary"] / 1000, tz=timezone.utc)
+        print(
+            f"{table}: {len(files)} 个文件 {rows} 行 {size / 1e6:.1f}MB，"
+            f"归档边界 {boundary:%Y-%m-%d}",
+            flush=True,
+        )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Archive old bars to monthly Parquet files")
+    parser.add_argument("tables", nargs="*", default=["ohlcv_1h"], help=f"Any of: {', '.join(ARCHIVE_TABLES)}")
+    parser.add_argument(
+        "--keep-days",
+        type=int,
+        default=int(secret_get("CG_ARCHIVE_KEEP_DAYS", str(KEEP_DAYS))),
+        help="Keep at least this many days in Postgres",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Only list the months to archive")
+    parser.add_argument("--status", action="store_true", help="Show the archive contents")
+    args = parser.parse_args(argv)
+    unknown = [t for t in args.tables if t not in ARCHIVE_TABLES]
+    if unknown:
+        print(f"Unknown table: {', '.join(unknown)}", flush=True)
+        sys.exit(2)
+    if args.status:
+        status(args.tables)
+        return
+    if pq is None:
+        print("归档需要 pyarrow，请先 pip install pyarrow", flush=True)
+        sys.exit(1)
+
+    from ingestion.engine import DB_CFG
+
+    conn = psycopg2.connect(**DB_CFG)
+    try:
+        for table in args.tables:
+            n = archive_table(conn, table, args.keep_days, args.dry_run)
+            print(f"{table} 共归档 {n} 行", flush=True)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""End-to-end ingestion benchmark against the offline CoinGlass stand-in.
+
+Starts :mod:`ingestion.mockserver` in-process, points an
+:class:`~ingestion.engine.IngestionEngine` at it and ingests a synthetic
+universe into a dedicated benchmark database, so ingestion designs can be
+compared reproducibly without API quota::
+
+    python -m ingestion.bench --symbols 200 --workers 4 --latency 0.2
+    python -m ingestion.bench --symbols 200 --async --max-concurrency 32
+
+Every round starts from empty tables, so each symbol is a new listing and
+costs one full page per dataset.  The benchmark database (``--db``, default
+``cg_bench``) is created if missing; its ingestion tables are dropped before
+each round, so it must not be the production database.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import psycopg2
+from psycopg2 import sql
+
+import http_client
+from config import COIN_DB_NAME, OHLCV_DB_NAME
+from ingestion.aio import AsyncIngestor
+from ingestion.engine import DB_CFG, IngestionEngine
+from ingestion.mockserver import add_config_args, config_from_args, serve
+from ingestion.ratelimit import FileBucketStore, TokenBucket
+from ingestion.specs import DATASETS, get_spec
+
+BENCH_KEY = "bench"
+
+
+def ensure_database(db_cfg: dict) -> None:
+    """Create the benchmark database if it does not exist."""
+    admin = psycopg2.connect(**{**db_cfg, "dbname": "postgres"})
+    admin.autocommit = True
+    try:
+        with admin.cursor() as cur:
+            cur.execute("SELECT 1 FROM pg_database WHERE datname=%s", (db_cfg["dbname"],))
+            if cur.fetchone() is None:
+                cur.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(db_cfg["dbname"])))
+    finally:
+        admin.close()
+
+
+def reset_tables(db_cfg: dict, specs) -> None:
+    """Drop the dataset tables and watermarks left by the previous round."""
+    conn = psycopg2.connect(**db_cfg)
+    try:
+        with conn.cursor() as cur:
+            for table in {spec.table for spec in specs} | {"ingestion_watermarks"}:
+                cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(table)))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def bench_symbols(n: int) -> list[str]:
+    return [f"BENCH{i:04d}USDT" for i in range(n)]
+
+
+def run_round(args, specs, db_cfg: dict, api_base: str, symbols: list[str]) -> dict:
+    """Ingest ``symbols`` once and return the throughput figures."""
+    reset_tables(db_cfg, specs)
+    # A private bucket so the benchmark never touches the real quota
+    limiter = TokenBucket(
+        "bench",
+        per_min=args.limiter_per_min,
+        capacity=max(5.0, args.limiter_per_min / 60),
+        store=FileBucketStore(os.path.join(tempfile.mkdtemp(), "bench_bucket.json")),
+    )
+    with IngestionEngine(
+        BENCH_KEY,
+        db_cfg=db_cfg,
+        max_workers=args.workers,
+        limiter=limiter,
+        exact=args.exact_decimals,
+        api_base=api_base,
+    ) as engine:
+        runner = AsyncIngestor(engine, max_concurrency=args.max_concurrency) if args.use_async else engine
+        started = time.perf_counter()
+        totals, failed = runner.run(specs, symbols=symbols)
+        elapsed = time.perf_counter() - started
+    rows = sum(totals.values())
+    jobs = len(symbols) * len(specs)
+    return {
+        "seconds": round(elapsed, 2),
+        "jobs": jobs,
+        "rows": rows,
+        "failed": len(failed),
+        "symbols_per_min": round(jobs / elapsed * 60, 1),
+        "rows_per_s": round(rows / elapsed, 1),
+    }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark ingestion against a local CoinGlass stand-in")
+    parser.add_argument(
+        "datasets",
+        nargs="*",
+        default=["ohlcv_1h", "oi_1h"],
+        help=f"Datasets to ingest, any of: {', '.join(DATASETS)}",
+    )
+    parser.add_argument("--symbols", type=int, default=100, help="Size of the synthetic universe")
+    parser.add_argument("--rounds", type=int, default=1, help="Repeat the run this many times")
+    parser.add_argument("--db", default="cg_bench", help="Benchmark database (dropped tables!)")
+    parser.add_argument("--workers", type=int, default=2, help="Concurrent worker threads")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Use the asyncio pipeline")
+    parser.add_argument("--max-concurrency", type=int, default=16, help="Upper bound for --async")
+    parser.add_argument("--exact-decimals", action="store_true", help="Parse values into Decimal")
+    parser.add_argument(
+        "--limiter-per-min",
+        type=float,
+        default=100000.0,
+        help="Client token bucket rate; lower it to benchmark under the real quota",
+    )
+    parser.add_argument("--json", dest="json_path", help="Append the results as a JSON line to this file")
+    add_config_args(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    try:
+        specs = [get_spec(name) for name in args.datasets]
+    except ValueError as exc:
+        print(exc, flush=True)
+        sys.exit(2)
+    if args.db in (OHLCV_DB_NAME, COIN_DB_NAME):
+        print(f"基准测试会删除表，不能使用生产库 {args.db}，请用 --db 指定其他数据库", flush=True)
+        sys.exit(2)
+
+    db_cfg = {**DB_CFG, "dbname": args.db}
+    ensure_database(db_cfg)
+    server, mock = serve(config_from_args(args))
+    api_base = f"http://127.0.0.1:{server.server_port}/api"
+    symbols = bench_symbols(args.symbols)
+    results = []
+    try:
+        for i in range(args.rounds):
+            http_client.reset_stats()
+            result = run_round(args, specs, db_cfg, api_base, symbols)
+            result["round"] = i + 1
+            results.append(result)
+            print(
+                f"[bench] 第{i + 1}轮: {result['jobs']} 个任务 {result['rows']} 条数据 "
+                f"{result['seconds']}s -> {result['symbols_per_min']} symbols/min, "
+                f"{result['rows_per_s']} rows/s",
+                flush=True,
+            )
+    finally:
+        server.shutdown()
+    print(f"[bench] 模拟服务统计: {mock.counters}", flush=True)
+
+    if args.json_path:
+        record = {
+            "datasets": args.datasets,
+            "symbols": args.symbols,
+            "workers": args.workers,
+            "async": args.use_async,
+            "max_concurrency": args.max_concurrency,
+            "latency": args.latency,
+            "error_rate": args.error_rate,
+            "rate_limit": args.rate_limit,
+            "results": results,
+        }
+        with open(args.json_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
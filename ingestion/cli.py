@@ -0,0 +1,193 @@
+"""Command line entry point for the ingestion engine.
+
+Example::
+
+    python -m ingestion ohlcv_1h oi_1h
+    python -m ingestion --async ohlcv_1h oi_1h
+    python -m ingestion --daemon ohlcv_1h oi_1h
+    python -m ingestion --daemon --shard ohlcv_1h oi_1h   # on every worker
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+
+from config import CG_API_KEY, CG_API_KEYS
+from ingestion.aio import AsyncIngestor
+from ingestion.daemon import IngestionDaemon
+from ingestion.engine import DB_CFG, IngestionEngine
+from ingestion.leases import DEFAULT_SHARDS, DEFAULT_TTL, ShardLeases, key_bucket_name
+from ingestion.ratelimit import get_limiter
+from ingestion.rollup import run_rollups
+from ingestion.specs import DATASETS, get_spec
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Download CoinGlass history into Postgres")
+    parser.add_argument(
+        "datasets",
+        nargs="*",
+        default=["ohlcv_1h", "oi_1h"],
+        help=f"Datasets to ingest, any of: {', '.join(DATASETS)}",
+    )
+    parser.add_argument("--workers", type=int, default=2, help="Concurrent worker threads")
+    parser.add_argument("--symbol", action="append", help="Only ingest this symbol (repeatable)")
+    parser.add_argument(
+        "--rescan-watermarks",
+        action="store_true",
+        help="Rebuild per-symbol watermarks from the data tables before running",
+    )
+    parser.add_argument(
+        "--no-rollup",
+        action="store_true",
+        help="Do not refresh ohlcv_4h/1d/1w from ohlcv_1h after ingesting it",
+    )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Use the asyncio pipeline with an adaptive number of in-flight requests",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=16,
+        help="Upper bound of in-flight requests for --async",
+    )
+    parser.add_argument(
+        "--journal",
+        action="store_true",
+        help="Checkpoint per-symbol progress in the run journal so the run can be resumed",
+    )
+    parser.add_argument(
+        "--resume",
+        nargs="?",
+        const="latest",
+        metavar="RUN_ID",
+        help="Resume a journaled run (default: the newest unfinished one); "
+        "other workers join the same run this way",
+    )
+    parser.add_argument(
+        "--worker",
+        help="Worker name recorded in the journal (default: CG_INGEST_WORKER or host name)",
+    )
+    parser.add_argument(
+        "--exact-decimals",
+        action="store_true",
+        help="Parse values into Decimal per field instead of float64 columns",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep running and refresh a few seconds after every bar close",
+    )
+    parser.add_argument(
+        "--health-port",
+        type=int,
+        default=0,
+        help="With --daemon, serve /status and /healthz on this port",
+    )
+    parser.add_argument(
+        "--shard",
+        action="store_true",
+        help="Only ingest the symbol shards this worker leases; start one such "
+        "process per worker and host",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=DEFAULT_SHARDS,
+        help="Number of symbol shards (must match on every worker)",
+    )
+    parser.add_argument(
+        "--lease-ttl",
+        type=int,
+        default=DEFAULT_TTL,
+        help="Seconds before the shards of a silent worker are taken over",
+    )
+    args = parser.parse_args(argv)
+    if args.shard and (args.journal or args.resume):
+        parser.error("--shard cannot be combined with --journal/--resume; "
+                     "journaled runs already share work between workers")
+    return args
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    if not CG_API_KEY:
+        print("请在 .env 中配置 CG_API_KEY", flush=True)
+        sys.exit(1)
+    try:
+        specs = [get_spec(name) for name in args.datasets]
+    except ValueError as exc:
+        print(exc, flush=True)
+        sys.exit(2)
+
+    api_key, limiter, leases = CG_API_KEY, None, None
+    if args.shard:
+        leases = ShardLeases(
+            DB_CFG,
+            shards=args.shards,
+            ttl=args.lease_ttl,
+            worker=args.worker,
+            key_slots=len(CG_API_KEYS),
+        )
+        leases.start()
+        api_key = CG_API_KEYS[leases.key_slot]
+        limiter = get_limiter(key_bucket_name(leases.key_slot))
+
+    try:
+        failed = _run(args, specs, api_key, limiter, leases)
+    finally:
+        if leases is not None:
+            leases.stop()
+    if args.daemon or args.shard or args.journal or args.resume:
+        return
+    # 所有 symbol 都已是最新时什么也不写，这是正常结束；只有仍失败的任务才算失败
+    if failed:
+        sys.exit(1)
+
+
+def _run(args, specs, api_key, limiter, leases) -> list:
+    """Run the selected mode; return the jobs that still failed."""
+    with IngestionEngine(
+        api_key, max_workers=args.workers, limiter=limiter, exact=args.exact_decimals
+    ) as engine:
+        if args.daemon:
+            daemon = IngestionDaemon(
+                engine, specs, symbols=args.symbol, rollup=not args.no_rollup, leases=leases
+            )
+            if args.health_port:
+                daemon.serve_health(args.health_port)
+            daemon.run_forever()
+            return []
+        failed = []
+        journaled = bool(args.journal or args.resume)
+        if journaled:
+            run_id = None if args.resume in (None, "latest") else args.resume
+            engine.run_journaled(
+                specs,
+                symbols=args.symbol,
+                resume=bool(args.resume),
+                run_id=run_id,
+                worker=args.worker,
+            )
+        else:
+            symbols = args.symbol or engine.get_symbols()
+            if not symbols:
+                print("没有 instrument，请检查 instruments 表。", flush=True)
+                sys.exit(1)
+            if leases is not None:
+                symbols = leases.filter(symbols)
+                print(f"本 worker 负责 {len(symbols)} 个symbol", flush=True)
+            runner = AsyncIngestor(engine, max_concurrency=args.max_concurrency) if args.use_async else engine
+            failed = runner.run(specs, symbols=symbols, rescan=args.rescan_watermarks)[1]
+        if "ohlcv_1h" in args.datasets and not args.no_rollup:
+            with engine.connection() as conn:
+                run_rollups(conn)
+    return failed
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""Long-running ingestion loop that wakes on bar close.
+
+Cron starts a new process for every run, which re-imports everything,
+re-opens connections and re-reads ``instruments`` before the first request.
+:class:`IngestionDaemon` keeps one :class:`~ingestion.engine.IngestionEngine`
+(connection pool, pooled HTTP sessions, rate limiter) warm and sleeps until a few
+seconds after the next bar boundary of its datasets.  Each wake only plans
+the symbols whose watermark is behind.  Symbols that only lack the bar that
+just closed (CoinGlass has not published it yet) are polled again with a
+short backoff; symbols further behind are left to the next wake so delisted
+instruments do not burn quota on every re-poll.
+
+The state of the loop is written to a JSON status file after every run and
+can optionally be served over HTTP (``/status`` and ``/healthz``).  A run
+only counts as a success when at most ``CG_INGEST_MAX_FAILED`` jobs (default
+0) still failed after the retry; otherwise ``error`` is set and ``/healthz``
+turns stale once the last success is two intervals old.
+
+Example::
+
+    python -m ingestion --daemon ohlcv_1h oi_1h --health-port 8765
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import signal
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import http_client
+from config import secret_get
+from ingestion.engine import IngestionEngine, latest_closed_ts
+from ingestion.leases import ShardLeases
+from ingestion.rollup import run_rollups
+from ingestion.specs import DatasetSpec
+
+# Seconds after a boundary before the first request, and between re-polls for
+# bars that were not published yet
+WAKE_DELAY = 5.0
+REPOLL_DELAYS = (10.0, 30.0, 60.0, 120.0)
+SYMBOLS_TTL = 3600.0
+# 一次运行中最多容忍这么多个 job 在重试后仍失败，超过则不算成功运行
+MAX_FAILED = int(secret_get("CG_INGEST_MAX_FAILED", "0"))
+
+
+def _now_ms() -> int:
+    return int(datetime.now(timezone.utc).timestamp() * 1000)
+
+
+def _iso(ts: float | None) -> str | None:
+    if ts is None:
+        return None
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+def default_status_path() -> str:
+    return secret_get(
+        "CG_INGEST_STATUS_FILE", os.path.join(tempfile.gettempdir(), "ingestion_status.json")
+    )
+
+
+class IngestionDaemon:
+    """Refresh ``specs`` shortly after every bar boundary until stopped."""
+
+    def __init__(
+        self,
+        engine: IngestionEngine,
+        specs: list[DatasetSpec],
+        *,
+        symbols: list[str] | None = None,
+        rollup: bool = True,
+        wake_delay: float = WAKE_DELAY,
+        status_path: str | None = None,
+        leases: ShardLeases | None = None,
+    ):
+        self.engine = engine
+        self.specs = list(specs)
+        self.fixed_symbols = symbols
+        self.rollup = rollup and any(s.name == "ohlcv_1h" for s in self.specs)
+        self.wake_delay = wake_delay
+        self.status_path = status_path or default_status_path()
+        self.leases = leases
+        self.stop_event = threading.Event()
+        self._symbols: list[str] = []
+        self._symbols_at = 0.0
+        self.status = {
+            "pid": os.getpid(),
+            "datasets": [s.name for s in self.specs],
+            "started": _iso(time.time()),
+            "runs": 0,
+            "last_run": None,
+            "last_success": None,
+            "next_wake": None,
+            "error": None,
+        }
+
+    # ------------------------------------------------------------------
+    # Scheduling
+    # ------------------------------------------------------------------
+
+    def next_wake(self, now_ms: int | None = None) -> float:
+        """Return the epoch seconds of the next wake-up."""
+        now_ms = _now_ms() if now_ms is None else now_ms
+        boundary = min(latest_closed_ts(s, now_ms) + s.interval_ms for s in self.specs)
+        return boundary / 1000 + self.wake_delay
+
+    def symbols(self) -> list[str]:
+        """Return the symbol list, re-reading ``instruments`` hourly.
+
+        With ``leases`` only the symbols of currently leased shards are kept.
+        """
+        if self.fixed_symbols:
+            symbols = self.fixed_symbols
+        else:
+            if not self._symbols or time.time() - self._symbols_at > SYMBOLS_TTL:
+                self._symbols = self.engine.get_symbols()
+                self._symbols_at = time.time()
+            symbols = self._symbols
+        if self.leases is not None:
+            symbols = self.leases.filter(symbols)
+        return symbols
+
+    def unpublished(self, symbols: list[str]) -> list[tuple[DatasetSpec, str, int, int]]:
+        """Jobs of symbols missing exactly the latest bar and nothing older."""
+        return [
+            job
+            for spec in self.specs
+            for job in self.engine.plan(spec, symbols)
+            if job[2] == job[3]
+        ]
+
+    # ------------------------------------------------------------------
+    # Running
+    # ------------------------------------------------------------------
+
+    def run_once(self) -> dict[str, int]:
+        """Refresh every dataset that is behind; re-poll unpublished bars."""
+        started = time.time()
+        symbols = self.symbols()
+        totals, failed = self.engine.refresh(self.specs, symbols)
+        pending = self.unpublished(symbols)
+        for delay in REPOLL_DELAYS:
+            if not pending:
+                break
+            print(f"{len(pending)} 个symbol 最新K线尚未发布，{delay:.0f}s 后重试", flush=True)
+            if self.stop_event.wait(delay):
+                break
+            written, _ = self.engine.run_jobs(pending)
+            self.engine.repair_legs()
+            for name, n in written.items():
+                totals[name] = totals.get(name, 0) + n
+            pending = self.unpublished(symbols)
+
+        telemetry = self.engine.report_run()
+
+        if self.rollup:
+            with self.engine.connection() as conn:
+                rolled = run_rollups(conn)
+            totals.update({f"rollup:{k}": v for k, v in rolled.items()})
+
+        finished = time.time()
+        self.status["runs"] += 1
+        self.status["last_run"] = {
+            "started": _iso(started),
+            "finished": _iso(finished),
+            "seconds": round(finished - started, 1),
+            "written": totals,
+            "failed": [f"{job[0].name}:{job[1]}" for job in failed],
+            "unpublished": [f"{job[0].name}:{job[1]}" for job in pending],
+        }
+        if len(failed) > MAX_FAILED:
+            self.status["error"] = f"{len(failed)} 个 job 重试后仍失败"
+        else:
+            self.status["last_success"] = _iso(finished)
+            self.status["error"] = None
+        self.status["http"] = http_client.stats()
+        self.status["telemetry"] = telemetry
+        if self.leases is not None:
+            self.status["shards"] = {
+                "worker": self.leases.worker,
+                "key_slot": self.leases.key_slot,
+                "held": sorted(self.leases.held),
+                "symbols": len(symbols),
+            }
+        return totals
+
+    def write_status(self) -> None:
+        tmp = f"{self.status_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.status, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.status_path)
+
+    def healthy(self) -> bool:
+        """True while the last successful run is at most two intervals old."""
+        last = self.status["last_success"]
+        if last is None:
+            return False
+        age = time.time() - datetime.fromisoformat(last).timestamp()
+        return age <= 2 * max(s.interval_ms for s in self.specs) / 1000 + 60
+
+    def serve_health(self, port: int) -> ThreadingHTTPServer:
+        """Serve ``/status`` (JSON) and ``/healthz`` (200/503) on ``port``."""
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/healthz":
+                    ok = daemon.healthy()
+                    body = b"ok" if ok else b"stale"
+                    self.send_response(200 if ok else 503)
+                elif self.path in ("/", "/status"):
+                    body = json.dumps(daemon.status, ensure_ascii=False).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                else:
+                    body = b"not found"
+                    self.send_response(404)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"健康检查服务已启动: http://0.0.0.0:{port}/healthz", flush=True)
+        return server
+
+    def stop(self, *_) -> None:
+        self.stop_event.set()
+
+    def run_forever(self) -> None:
+        """Catch up once, then run after every bar boundary until stopped."""
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, self.stop)
+        for spec in self.specs:
+            self.engine.ensure_table(spec)
+
+        while not self.stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                self.status["error"] = f"{type(e).__name__}: {e}"
+                print(f"采集失败: {e}", flush=True)
+            wake = self.next_wake()
+            self.status["next_wake"] = _iso(wake)
+            try:
+                self.write_status()
+            except OSError as e:
+                print(f"状态文件写入失败: {e}", flush=True)
+            print(f"下次运行时间 {_iso(wake)}", flush=True)
+            self.stop_event.wait(max(0.0, wake - time.time()))
+        print("采集守护进程已退出", flush=True)
@@ -0,0 +1,581 @@
+"""Interval-parameterised CoinGlass ingestion engine.
+
+One :class:`IngestionEngine` owns a Postgres connection pool and a rate
+limiter, and sends requests through the pooled sessions of ``http_client``.
+Any :class:`~ingestion.specs.DatasetSpec` can be run through it, and several
+datasets can share one run so they draw from the same API quota instead of
+competing from separate cron jobs.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime, timezone, timedelta
+from typing import Callable, Iterable
+
+import numpy as np
+from psycopg2.pool import ThreadedConnectionPool
+from tqdm import tqdm
+
+import http_client
+from config import DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, OHLCV_DB_NAME
+from ingestion.journal import STALE_AFTER, RunJournal, ensure_journal_tables
+from ingestion.parse import LegFrame, empty_leg, loads, parse_leg
+from ingestion.partitions import ensure_partitions, is_partitioned
+from ingestion.ratelimit import TokenBucket, get_limiter
+from ingestion.specs import API_BASE, DatasetSpec, Leg
+from ingestion.telemetry import RunTelemetry, prometheus_path
+from ingestion.watermarks import (
+    advance_watermark,
+    ensure_watermark_table,
+    load_watermarks,
+    missing_window,
+)
+from ingestion.writer import ColumnBatch, copy_insert, copy_update
+
+DB_CFG = {
+    "host": DB_HOST,
+    "port": DB_PORT,
+    "dbname": OHLCV_DB_NAME,
+    "user": DB_USER,
+    "password": DB_PASSWORD,
+}
+
+TZ8 = timezone(timedelta(hours=8))
+
+
+def merge_legs(spec: DatasetSpec, symbol: str, frames: list[LegFrame]) -> ColumnBatch:
+    """Align the legs of one page on the first leg's timestamps.
+
+    Each further leg is matched with one ``searchsorted`` over its sorted
+    timestamps; bars it lacks get its ``fill`` value.
+    """
+    base_ts, base_values = frames[0]
+    columns = [base_values]
+    for leg, (ts, values) in zip(spec.legs[1:], frames[1:]):
+        if values.dtype == object:
+            fill = leg.fill
+        else:
+            fill = np.nan if leg.fill is None else float(leg.fill)
+        out = np.full((len(base_ts), len(leg.columns)), fill, dtype=values.dtype)
+        if len(ts) and len(base_ts):
+            idx = np.searchsorted(ts, base_ts).clip(max=len(ts) - 1)
+            hit = ts[idx] == base_ts
+            out[hit] = values[idx[hit]]
+        columns.append(out)
+    dtype = object if any(c.dtype == object for c in columns) else np.float64
+    return ColumnBatch(symbol, base_ts, np.hstack([c.astype(dtype) for c in columns]))
+
+
+def latest_closed_ts(spec: DatasetSpec, now_ms: int | None = None) -> int:
+    """Return ``now`` aligned down to the dataset interval."""
+    if now_ms is None:
+        now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+    return (now_ms // spec.interval_ms) * spec.interval_ms
+
+
+def request_pages(spec: DatasetSpec, start_ts: int, end_ts: int) -> list[tuple[int, int, int]]:
+    """Split the missing window into ``(start_time, end_time, limit)`` requests.
+
+    A symbol that is a few bars behind costs one request sized to exactly
+    those bars.  Only windows longer than ``spec.limit`` bars are paged, oldest
+    page first so the watermark never jumps over an unfetched page.  A new
+    symbol (``start_ts == 0``) gets one full page ending at ``end_ts``.
+    """
+    step = spec.interval_ms
+    if start_ts <= 0:
+        start_ts = end_ts - (spec.limit - 1) * step
+    pages = []
+    page_start = start_ts
+    while page_start <= end_ts:
+        page_end = min(page_start + (spec.limit - 1) * step, end_ts)
+        pages.append((page_start, page_end, (page_end - page_start) // step + 1))
+        page_start = page_end + step
+    return pages
+
+
+class IngestionEngine:
+    """Fetch CoinGlass history for any dataset and bulk write it."""
+
+    def __init__(
+        self,
+        api_key: str,
+        *,
+        db_cfg: dict | None = None,
+        max_workers: int = 2,
+        limiter: TokenBucket | None = None,
+        priority: str = "normal",
+        exact: bool = False,
+        api_base: str | None = None,
+    ):
+        self.max_workers = max_workers
+        # CoinGlass or a stand-in such as ingestion.mockserver
+        self.api_base = (api_base or API_BASE).rstrip("/")
+        # Decimal per field instead of float64 columns
+        self.exact = exact
+        # One connection per worker, plus the caller's and the journal heartbeat's
+        self.pool = ThreadedConnectionPool(1, max_workers + 2, **(db_cfg or DB_CFG))
+        # Exchange legs of a page are fetched concurrently on their own pool
+        self.leg_executor = ThreadPoolExecutor(max_workers=max_workers * 4)
+        self._lock = threading.Lock()
+        # Legs fetched for a page that failed overall, reused on retry
+        self._leg_cache: dict[tuple, LegFrame] = {}
+        # Optional legs stored with their fill value, repaired after the run
+        self.leg_repairs: list[tuple[DatasetSpec, Leg, str, tuple[int, int, int]]] = []
+        # Set during journaled runs; every written page is checkpointed in it
+        self.journal: RunJournal | None = None
+        # Stage timings and counters since the last report_run()
+        self.telemetry = RunTelemetry()
+        self.limiter = limiter or get_limiter()
+        self.priority = priority
+        self.headers = {"CG-API-KEY": api_key, "accept": "application/json"}
+
+    def close(self) -> None:
+        self.leg_executor.shutdown(wait=False)
+        self.pool.closeall()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @contextmanager
+    def connection(self):
+        conn = self.pool.getconn()
+        if conn.closed:
+            # Long-lived pools can hold connections the server has dropped
+            self.pool.putconn(conn, close=True)
+            conn = self.pool.getconn()
+        try:
+            yield conn
+        finally:
+            self.pool.putconn(conn)
+
+    # ------------------------------------------------------------------
+    # Database helpers
+    # ------------------------------------------------------------------
+
+    def ensure_table(self, spec: DatasetSpec) -> None:
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(spec.ddl())
+                partitioned = is_partitioned(cur, spec.table)
+                for stmt in spec.migrations("DOUBLE PRECISION" if partitioned else "NUMERIC"):
+                    cur.execute(stmt)
+                if partitioned:
+                    ensure_partitions(cur, spec.table)
+            conn.commit()
+        print(f"{spec.table} 表结构已确保", flush=True)
+
+    def get_symbols(self) -> list[str]:
+        """Return every ``instrument_id`` from the ``instruments`` table."""
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT instrument_id FROM instruments")
+                symbols = [row[0] for row in cur.fetchall()]
+            conn.commit()
+        return symbols
+
+    def load_watermarks(self, spec: DatasetSpec, rescan: bool = False) -> dict[str, int]:
+        """Return the newest stored bar of every symbol in one query."""
+        with self.connection() as conn:
+            ensure_watermark_table(conn)
+            return load_watermarks(conn, spec, rescan=rescan)
+
+    def write(self, spec: DatasetSpec, records: ColumnBatch) -> int:
+        """Bulk insert ``records`` and return the number of new rows.
+
+        The symbol's watermark (and run journal, if any) is advanced in the
+        same transaction.
+        """
+        with self.connection() as conn, self.telemetry.timed(spec.name, records.symbol, "write"):
+            try:
+                count = copy_insert(conn, spec.table, spec.columns, records)
+                with conn.cursor() as cur:
+                    advance_watermark(cur, spec, records.symbol, records.last_ts)
+                    if self.journal is not None:
+                        self.journal.record_page(cur, spec, records.symbol, count, records.last_ts)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"{spec.name} {records.symbol} 插入失败: {e}", flush=True)
+                count = 0
+        self.telemetry.rows(spec.name, records.symbol, written=count)
+        return count
+
+    # ------------------------------------------------------------------
+    # API helpers
+    # ------------------------------------------------------------------
+
+    def build_params(
+        self, spec: DatasetSpec, leg: Leg, symbol: str, page: tuple[int, int, int]
+    ) -> dict:
+        start_ts, end_ts, limit = page
+        params = {
+            "exchange": leg.exchange,
+            "symbol": symbol,
+            "interval": spec.interval,
+            "limit": limit,
+            "start_time": start_ts,
+            "end_time": end_ts,
+        }
+        params.update(spec.params)
+        return params
+
+    def url(self, spec: DatasetSpec) -> str:
+        return f"{self.api_base}/{spec.endpoint}"
+
+    def fetch_leg(
+        self, spec: DatasetSpec, leg: Leg, symbol: str, page: tuple[int, int, int]
+    ) -> LegFrame:
+        """Fetch one page of an exchange leg with rate limiting and retries."""
+        params = self.build_params(spec, leg, symbol, page)
+        telemetry = self.telemetry
+        for attempt in range(3):
+            with telemetry.timed(spec.name, symbol, "limiter_wait"):
+                self.limiter.acquire(priority=self.priority)
+            started = time.perf_counter()
+            latency = None
+            try:
+                # Retries are paced by the limiter below, not by http_client
+                resp = http_client.get(
+                    self.url(spec), params=params, headers=self.headers, timeout=30, retries=0
+                )
+                latency = time.perf_counter() - started
+                with telemetry.timed(spec.name, symbol, "parse"):
+                    data = loads(resp.content)
+                    if data.get("code") != "0":
+                        raise RuntimeError(data.get("msg"))
+                    frame = parse_leg(leg, data.get("data") or [], exact=self.exact)
+                telemetry.request(spec.name, symbol, latency, ok=True, retry=attempt > 0)
+                return frame
+            except Exception as exc:
+                if latency is None:
+                    latency = time.perf_counter() - started
+                telemetry.request(spec.name, symbol, latency, ok=False, retry=attempt > 0)
+                if attempt == 2:
+                    raise
+                print(f"{leg.exchange} {symbol} 请求失败尝试重试: {exc}", flush=True)
+                time.sleep(1)
+
+    def fetch_records(
+        self, spec: DatasetSpec, symbol: str, page: tuple[int, int, int]
+    ) -> tuple[ColumnBatch, bool]:
+        """Fetch one page of every leg of ``spec`` and merge them into rows.
+
+        Legs are requested concurrently.  If a required leg fails, the legs
+        that succeeded are kept so a retry only requests the failed one.  An
+        optional leg that fails is filled with its default and queued in
+        :attr:`leg_repairs`.  Returns the rows and whether a leg was filled.
+        """
+        futures = {}
+        frames: dict[Leg, LegFrame] = {}
+        for leg in spec.legs:
+            cached = self._leg_cache.pop((spec.name, leg.exchange, symbol, page), None)
+            if cached is not None:
+                frames[leg] = cached
+            else:
+                futures[leg] = self.leg_executor.submit(self.fetch_leg, spec, leg, symbol, page)
+
+        errors = {}
+        for leg, fut in futures.items():
+            try:
+                frames[leg] = fut.result()
+            except Exception as e:
+                errors[leg] = e
+
+        required = [leg for leg in errors if leg.required]
+        if required:
+            with self._lock:
+                for leg, frame in frames.items():
+                    self._leg_cache[(spec.name, leg.exchange, symbol, page)] = frame
+            raise errors[required[0]]
+
+        for leg, e in errors.items():
+            print(f"{leg.exchange} {symbol} 请求失败，使用 {leg.fill}，稍后单独重试: {e}", flush=True)
+            frames[leg] = empty_leg(leg, self.exact)
+            with self._lock:
+                self.leg_repairs.append((spec, leg, symbol, page))
+        return merge_legs(spec, symbol, [frames[leg] for leg in spec.legs]), bool(errors)
+
+    def repair_leg(self, spec: DatasetSpec, leg: Leg, symbol: str, page: tuple[int, int, int]) -> int:
+        """Refetch one failed leg and overwrite its filled columns."""
+        records = ColumnBatch(symbol, *self.fetch_leg(spec, leg, symbol, page))
+        with self.connection() as conn:
+            try:
+                count = copy_update(conn, spec.table, ("symbol", "time", *leg.columns), records)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return count
+
+    def repair_legs(self) -> list:
+        """Retry every queued leg repair once; return those still failing."""
+        repairs, self.leg_repairs = self.leg_repairs, []
+        if not repairs:
+            return []
+        print(f"单独重试 {len(repairs)} 个失败的交易所请求", flush=True)
+        failed = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.repair_leg, *r): r for r in repairs}
+            for fut in as_completed(futures):
+                spec, leg, symbol, _ = futures[fut]
+                try:
+                    n = fut.result()
+                    print(f"{spec.name} {symbol} {leg.exchange} 修复 {n} 条数据", flush=True)
+                except Exception as e:
+                    print(f"{spec.name} {symbol} {leg.exchange} 修复失败: {e}", flush=True)
+                    failed.append(futures[fut])
+        return failed
+
+    # ------------------------------------------------------------------
+    # Orchestration
+    # ------------------------------------------------------------------
+
+    def process_symbol(
+        self, spec: DatasetSpec, symbol: str, start_ts: int, end_ts: int
+    ) -> tuple[int, bool]:
+        """Download and store the missing bars of ``symbol``.
+
+        ``start_ts`` is the first missing bar (``0`` for a new symbol).  Each
+        page is written as soon as it arrives.  Returns (written, failed);
+        only a required leg failing fails the symbol, optional legs are
+        repaired separately.
+        """
+        n = 0
+        written = 0
+        last_ts = None
+        for page in request_pages(spec, start_ts, end_ts):
+            try:
+                records, _ = self.fetch_records(spec, symbol, page)
+            except Exception as e:
+                print(f"{spec.name} {symbol} 请求失败: {e}", flush=True)
+                return written, True
+            if len(records):
+                n += len(records)
+                self.telemetry.rows(spec.name, symbol, fetched=len(records))
+                written += self.write(spec, records)
+                last_ts = records.last_ts
+
+        if last_ts is None:
+            print(f"{spec.name} {symbol} 请求0条数据 写入0条数据", flush=True)
+            return 0, False
+
+        last_dt = datetime.fromtimestamp(last_ts / 1000, tz=timezone.utc).astimezone(TZ8)
+        last_str = last_dt.strftime("%Y-%m-%d %H:%M:%S")
+        print(
+            f"{spec.name} {symbol} 请求{n}条数据 成功写入{written}条数据 最新时间为{last_str}",
+            flush=True,
+        )
+        return written, False
+
+    def plan(
+        self, spec: DatasetSpec, symbols: list[str], rescan: bool = False
+    ) -> list[tuple[DatasetSpec, str, int, int]]:
+        """Return one job per symbol that is behind the latest closed bar.
+
+        Up-to-date symbols are dropped here, before any worker is used.
+        """
+        end_ts = latest_closed_ts(spec)
+        marks = self.load_watermarks(spec, rescan=rescan)
+        jobs = []
+        for sym in symbols:
+            window = missing_window(spec, marks.get(sym), end_ts)
+            if window is not None:
+                jobs.append((spec, sym, *window))
+        skipped = len(symbols) - len(jobs)
+        if skipped:
+            print(f"{spec.name} {skipped} 个symbol 数据已是最新，跳过", flush=True)
+        return jobs
+
+    def run_jobs(
+        self,
+        jobs: list[tuple[DatasetSpec, str, int, int]],
+        on_done: Callable[[tuple, int, bool], None] | None = None,
+    ) -> tuple[dict[str, int], list]:
+        """Run ``(spec, symbol, start_ts, end_ts)`` jobs on the worker pool.
+
+        ``on_done(job, written, failed)`` is called as each job finishes.
+        Returns rows written per dataset and the failed jobs.
+        """
+        totals: dict[str, int] = {}
+        failed = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.process_symbol, *job): job for job in jobs}
+            with tqdm(total=len(jobs)) as bar:
+                for fut in as_completed(futures):
+                    spec = futures[fut][0]
+                    written, fail = fut.result()
+                    if on_done is not None:
+                        on_done(futures[fut], written, fail)
+                    totals[spec.name] = totals.get(spec.name, 0) + written
+                    if fail:
+                        failed.append(futures[fut])
+                    bar.update(1)
+                    bar.set_postfix(written=sum(totals.values()), failed=len(failed))
+        return totals, failed
+
+    def run(
+        self,
+        specs: Iterable[DatasetSpec],
+        symbols: list[str] | None = None,
+        rescan: bool = False,
+    ) -> tuple[dict[str, int], list]:
+        """Ingest every dataset in ``specs`` for ``symbols`` in one pass.
+
+        Jobs of all datasets share the worker pool and the rate limiter.
+        Failed symbols are retried once.  ``rescan`` rebuilds the watermarks
+        from the data tables first.  Returns rows written per dataset and the
+        jobs that still failed; both are empty when every symbol was current.
+        """
+        specs = list(specs)
+        for spec in specs:
+            self.ensure_table(spec)
+        if symbols is None:
+            symbols = self.get_symbols()
+        if not symbols:
+            print("没有 instrument，请检查 instruments 表。", flush=True)
+            return {}, []
+        totals, failed = self.refresh(specs, symbols, rescan=rescan)
+        self.report_run()
+        return totals, failed
+
+    def report_run(self, run_id: str | None = None) -> dict[str, dict]:
+        """Summarise the metrics collected since the last report and reset them.
+
+        The summary is printed, stored in the telemetry tables under
+        ``run_id`` (a new id if omitted) and written to ``CG_INGEST_PROM_FILE``
+        when that is set.  Storing or exporting failures are only printed.
+        """
+        telemetry, self.telemetry = self.telemetry, RunTelemetry()
+        telemetry.run_id = run_id
+        summary = telemetry.report()
+        if not summary:
+            return summary
+        with self.connection() as conn:
+            try:
+                telemetry.persist(conn)
+            except Exception as e:
+                conn.rollback()
+                print(f"采集指标写入失败: {e}", flush=True)
+        path = prometheus_path()
+        if path:
+            try:
+                telemetry.write_prometheus(path)
+            except OSError as e:
+                print(f"Prometheus 指标文件写入失败: {e}", flush=True)
+        return summary
+
+    def refresh(
+        self,
+        specs: list[DatasetSpec],
+        symbols: list[str],
+        rescan: bool = False,
+    ) -> tuple[dict[str, int], list]:
+        """Fetch whatever ``symbols`` are missing, assuming tables exist.
+
+        Returns rows written per dataset and the jobs that still failed.
+        """
+        jobs = [job for spec in specs for job in self.plan(spec, symbols, rescan=rescan)]
+        totals, failed = self.run_jobs(jobs)
+        if failed:
+            print(f"重试失败的 symbol: {[f'{job[0].name}:{job[1]}' for job in failed]}", flush=True)
+            retry_totals, failed = self.run_jobs(failed)
+            for name, n in retry_totals.items():
+                totals[name] = totals.get(name, 0) + n
+        self._leg_cache.clear()
+        self.repair_legs()
+
+        for spec in specs:
+            n_failed = sum(1 for job in failed if job[0] is spec)
+            print(
+                f"\n{spec.name} 总共写入 {totals.get(spec.name, 0)} 条数据，失败 {n_failed} 个symbol",
+                flush=True,
+            )
+        return totals, failed
+
+    def run_journaled(
+        self,
+        specs: Iterable[DatasetSpec],
+        symbols: list[str] | None = None,
+        *,
+        resume: bool = False,
+        run_id: str | None = None,
+        worker: str | None = None,
+    ) -> dict[str, int]:
+        """Run like :meth:`run` but checkpoint progress in the run journal.
+
+        With ``resume`` the given (or newest unfinished) run is continued
+        instead of planning a new one; any number of workers may resume the
+        same run and will claim disjoint symbols.  Returns rows written per
+        dataset by this worker.
+        """
+        specs = list(specs)
+        by_name = {spec.name: spec for spec in specs}
+        for spec in specs:
+            self.ensure_table(spec)
+        with self.connection() as conn:
+            ensure_journal_tables(conn)
+            if resume:
+                journal = RunJournal.resume(conn, run_id, worker)
+                if journal is None:
+                    print("没有未完成的采集任务可恢复", flush=True)
+                    return {}
+                print(f"恢复采集任务 {journal.run_id}: {journal.summary(conn)}", flush=True)
+            else:
+                if symbols is None:
+                    symbols = self.get_symbols()
+                jobs = [job for spec in specs for job in self.plan(spec, symbols)]
+                journal = RunJournal.create(conn, jobs, worker)
+                print(f"新建采集任务 {journal.run_id}，共 {len(jobs)} 个symbol", flush=True)
+
+        def on_done(job, written, failed):
+            with self.connection() as conn:
+                journal.finish(conn, job[0], job[1], ok=not failed)
+
+        self.journal = journal
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(STALE_AFTER / 5):
+                try:
+                    with self.connection() as conn:
+                        journal.heartbeat(conn)
+                except Exception as e:
+                    print(f"采集任务心跳失败: {e}", flush=True)
+
+        beat = threading.Thread(target=heartbeat, name="journal-heartbeat", daemon=True)
+        beat.start()
+        totals: dict[str, int] = {}
+        try:
+            batch = max(self.max_workers * 8, 16)
+            while True:
+                with self.connection() as conn:
+                    jobs = journal.claim(conn, by_name, batch)
+                    # Failed symbols get one more attempt once the plan is drained
+                    if not jobs and not journal.retry_failed(conn):
+                        break
+                if not jobs:
+                    continue
+                written, _ = self.run_jobs(jobs, on_done=on_done)
+                for name, n in written.items():
+                    totals[name] = totals.get(name, 0) + n
+            self.repair_legs()
+        finally:
+            stop.set()
+            beat.join()
+            self.journal = None
+
+        with self.connection() as conn:
+            closed = journal.close_if_complete(conn)
+            summary = journal.summary(conn)
+        state = "已完成" if closed else "仍有其他worker处理中或失败"
+        print(f"采集任务 {journal.run_id} {state}: {summary}，本worker写入 {totals}", flush=True)
+        # Several workers may share a journaled run, so the metrics are per worker
+        self.report_run(f"{journal.run_id}:{journal.worker}")
+        return totals
@@ -0,0 +1,177 @@
+"""Find holes in stored bar history and plan the requests that fill them.
+
+Watermarks only tell how far each symbol has been ingested; a bar missing in
+the middle of the history (a failed page, a manual delete) is never fetched
+again and silently skews period metrics and rankings.  This module scans a
+dataset's table with one window-function query for every pair of consecutive
+bars that are more than one interval apart, then turns those gaps into the
+fewest ``(start_time, end_time)`` requests of at most ``spec.limit`` bars.
+Months moved to the Parquet archive (``ingestion.archive``) are not scanned.
+
+Example::
+
+    python -m ingestion.gaps ohlcv_1h oi_1h --days 30 --dry-run
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from datetime import datetime, timezone
+
+from config import CG_API_KEY
+from ingestion.archive import archive_boundary
+from ingestion.engine import IngestionEngine
+from ingestion.ranks import rewind_ranks
+from ingestion.rollup import rewind_watermarks, run_rollups
+from ingestion.specs import DATASETS, DatasetSpec, get_spec
+
+Gap = tuple[str, int, int]
+
+GAPS_SQL = """
+SELECT symbol, prev + %(interval)s AS gap_start, time - %(interval)s AS gap_end
+FROM (
+    SELECT symbol, time, LAG(time) OVER (PARTITION BY symbol ORDER BY time) AS prev
+    FROM {table}
+    WHERE time >= %(since)s
+) t
+WHERE time - prev > %(interval)s
+ORDER BY symbol, gap_start
+"""
+
+
+def find_gaps(conn, spec: DatasetSpec, since_ts: int = 0) -> list[Gap]:
+    """Return ``(symbol, first_missing, last_missing)`` for every hole.
+
+    Only bars at or after ``since_ts`` and the archive boundary are scanned,
+    so archived months are neither reported nor refetched.  Missing bars
+    before a symbol's first or after its last stored bar are not gaps; the
+    tail is handled by the watermarks.
+    """
+    since_ts = max(since_ts, archive_boundary(spec.table))
+    with conn.cursor() as cur:
+        cur.execute(
+            GAPS_SQL.format(table=spec.table),
+            {"interval": spec.interval_ms, "since": since_ts},
+        )
+        rows = cur.fetchall()
+    conn.commit()
+    return [(sym, int(start), int(end)) for sym, start, end in rows]
+
+
+def plan_backfill(spec: DatasetSpec, gaps: list[Gap]) -> list[tuple[DatasetSpec, str, int, int]]:
+    """Cover ``gaps`` with the fewest request windows, newest first.
+
+    Per symbol, a window starts at the first uncovered missing bar and spans
+    ``spec.limit`` bars, swallowing every later gap that ends inside it.  Bars
+    already stored inside a window are re-sent by the API and ignored by the
+    writer.  The result uses the engine's job tuple so it can be run directly.
+    """
+    span = (spec.limit - 1) * spec.interval_ms
+    jobs = []
+    by_symbol: dict[str, list[tuple[int, int]]] = {}
+    for sym, start, end in gaps:
+        by_symbol.setdefault(sym, []).append((start, end))
+
+    for sym, holes in by_symbol.items():
+        window = None
+        for start, end in sorted(holes):
+            while start <= end:
+                if window is not None and start > window[0] + span:
+                    jobs.append((spec, sym, *window))
+                    window = None
+                if window is None:
+                    window = [start, start]
+                covered = min(end, window[0] + span)
+                window[1] = covered
+                start = covered + spec.interval_ms
+        if window is not None:
+            jobs.append((spec, sym, *window))
+
+    jobs.sort(key=lambda job: job[3], reverse=True)
+    return jobs
+
+
+def summarize(gaps: list[Gap], spec: DatasetSpec) -> tuple[int, int]:
+    """Return (affected symbols, missing bars)."""
+    bars = sum((end - start) // spec.interval_ms + 1 for _, start, end in gaps)
+    return len({g[0] for g in gaps}), bars
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Detect and backfill holes in stored history")
+    parser.add_argument(
+        "datasets",
+        nargs="*",
+        default=["ohlcv_1h", "oi_1h"],
+        help=f"Datasets to scan, any of: {', '.join(DATASETS)}; ohlcv_4h is rolled "
+        "up from ohlcv_1h and re-rolled when ohlcv_1h gaps are filled",
+    )
+    parser.add_argument("--days", type=int, default=0, help="Only scan the last N days (0 = all)")
+    parser.add_argument("--workers", type=int, default=2, help="Concurrent worker threads")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Report gaps and planned requests only"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    if not CG_API_KEY:
+        print("请在 .env 中配置 CG_API_KEY", flush=True)
+        sys.exit(1)
+    try:
+        specs = [get_spec(name) for name in args.datasets]
+    except ValueError as exc:
+        print(exc, flush=True)
+        sys.exit(2)
+
+    since_ts = 0
+    if args.days:
+        now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+        since_ts = now_ms - args.days * 24 * 3600 * 1000
+
+    with IngestionEngine(CG_API_KEY, max_workers=args.workers) as engine:
+        jobs = []
+        for spec in specs:
+            started = time.monotonic()
+            with engine.connection() as conn:
+                gaps = find_gaps(conn, spec, since_ts)
+            n_sym, n_bars = summarize(gaps, spec)
+            planned = plan_backfill(spec, gaps)
+            print(
+                f"{spec.name} 发现 {len(gaps)} 处缺口，{n_sym} 个symbol 缺 {n_bars} 根K线，"
+                f"计划 {len(planned)} 次请求 ({time.monotonic() - started:.1f}s)",
+                flush=True,
+            )
+            jobs.extend(planned)
+
+        if args.dry_run or not jobs:
+            for spec, sym, start, end in jobs:
+                print(f"  {spec.name} {sym} {start} -> {end}", flush=True)
+            return
+        totals, failed = engine.run_jobs(jobs)
+        engine.report_run()
+
+        # Re-roll the 4h/1d/1w buckets that contain backfilled hours
+        first_ts: dict[str, int] = {}
+        for job in jobs:
+            spec, sym, start, _ = job
+            if spec.name == "ohlcv_1h" and job not in failed:
+                first_ts[sym] = min(start, first_ts.get(sym, start))
+        if first_ts:
+            with engine.connection() as conn:
+                rewind_watermarks(conn, first_ts)
+                rewind_ranks(conn, min(first_ts.values()))
+                run_rollups(conn)
+    for spec in specs:
+        n_failed = sum(1 for job in failed if job[0] is spec)
+        print(
+            f"\n{spec.name} 补齐写入 {totals.get(spec.name, 0)} 条数据，失败 {n_failed} 个请求",
+            flush=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
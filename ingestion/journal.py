@@ -0,0 +1,264 @@
+"""Run journal for checkpointed, resumable ingestion runs.
+
+A journaled run stores its plan in ``ingestion_journal``: one row per
+``(dataset, symbol)`` with the window to fetch, its status and its progress
+(pages written, rows written, last committed bar).  Progress is recorded in
+the same transaction that writes each page, so after a crash or kill the run
+is resumed exactly where its last commit left it; finished symbols are not
+re-checked and committed pages are not fetched again.
+
+Workers take ``pending`` rows with ``FOR UPDATE SKIP LOCKED``, so several
+processes can work through one run on disjoint symbol sets.  A worker touches
+its ``running`` rows every few seconds (:meth:`RunJournal.heartbeat`); rows
+not touched for :data:`STALE_AFTER` seconds belong to a dead worker and are
+claimed again by any other one.
+
+Statuses: ``pending`` -> ``running`` -> ``done`` | ``failed``.
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+import uuid
+from datetime import datetime, timezone
+
+from config import secret_get
+from ingestion.specs import DatasetSpec
+from ingestion.writer import copy_insert
+
+JOURNAL_DDL = """
+CREATE TABLE IF NOT EXISTS ingestion_runs (
+    run_id TEXT PRIMARY KEY,
+    datasets TEXT NOT NULL,
+    started TIMESTAMPTZ NOT NULL DEFAULT now(),
+    finished TIMESTAMPTZ
+);
+CREATE TABLE IF NOT EXISTS ingestion_journal (
+    run_id TEXT NOT NULL,
+    dataset TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    start_ts BIGINT NOT NULL,
+    end_ts BIGINT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    attempts INT NOT NULL DEFAULT 0,
+    pages_done INT NOT NULL DEFAULT 0,
+    rows_written BIGINT NOT NULL DEFAULT 0,
+    last_ts BIGINT,
+    error TEXT,
+    updated TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY(run_id, dataset, symbol)
+);
+CREATE INDEX IF NOT EXISTS ingestion_journal_pending
+    ON ingestion_journal(run_id, status);
+"""
+
+JOURNAL_COLUMNS = ("run_id", "dataset", "symbol", "start_ts", "end_ts")
+
+Job = tuple[DatasetSpec, str, int, int]
+
+# Seconds without a heartbeat after which a running row is taken over, the
+# same as the shard lease TTL
+STALE_AFTER = 300
+
+
+def worker_name(name: str | None = None) -> str:
+    """``name`` or ``CG_INGEST_WORKER`` or the host name."""
+    return name or secret_get("CG_INGEST_WORKER", socket.gethostname())
+
+
+def ensure_journal_tables(conn) -> None:
+    with conn.cursor() as cur:
+        cur.execute(JOURNAL_DDL)
+    conn.commit()
+
+
+class RunJournal:
+    """Progress of one run as seen by one worker."""
+
+    def __init__(self, run_id: str, worker: str | None = None):
+        self.run_id = run_id
+        # Several workers per host need distinct names
+        self.worker = f"{worker_name(worker)}:{os.getpid()}"
+
+    # ------------------------------------------------------------------
+    # Run lifecycle
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def create(cls, conn, jobs: list[Job], worker: str | None = None) -> "RunJournal":
+        """Start a run whose plan is ``jobs``."""
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        journal = cls(f"{stamp}-{uuid.uuid4().hex[:6]}", worker)
+        datasets = ",".join(sorted({job[0].name for job in jobs}))
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO ingestion_runs(run_id, datasets) VALUES(%s, %s)",
+                (journal.run_id, datasets),
+            )
+        copy_insert(
+            conn,
+            "ingestion_journal",
+            JOURNAL_COLUMNS,
+            [(journal.run_id, spec.name, sym, start, end) for spec, sym, start, end in jobs],
+            key=("run_id", "dataset", "symbol"),
+        )
+        conn.commit()
+        return journal
+
+    @classmethod
+    def resume(cls, conn, run_id: str | None = None, worker: str | None = None) -> "RunJournal | None":
+        """Continue ``run_id`` (default: the newest unfinished run).
+
+        ``running`` rows whose worker stopped sending heartbeats go back to
+        ``pending``, and failed rows get a fresh set of attempts; rows of
+        live workers are left to them.
+        """
+        with conn.cursor() as cur:
+            if run_id is None:
+                cur.execute(
+                    "SELECT run_id FROM ingestion_runs WHERE finished IS NULL "
+                    "ORDER BY started DESC LIMIT 1"
+                )
+                row = cur.fetchone()
+                if row is None:
+                    conn.commit()
+                    return None
+                run_id = row[0]
+            journal = cls(run_id, worker)
+            cur.execute(
+                """
+                UPDATE ingestion_journal SET status='pending', updated=now()
+                WHERE run_id=%s AND status='running'
+                  AND updated < now() - %s * interval '1 second'
+                """,
+                (run_id, STALE_AFTER),
+            )
+            cur.execute(
+                """
+                UPDATE ingestion_journal SET status='pending', attempts=0, updated=now()
+                WHERE run_id=%s AND status='failed'
+                """,
+                (run_id,),
+            )
+        conn.commit()
+        return journal
+
+    def claim(self, conn, specs: dict[str, DatasetSpec], limit: int) -> list[Job]:
+        """Take up to ``limit`` pending symbols and return their jobs.
+
+        Each job starts after the last bar already committed for it.
+        Symbols whose window is already complete are marked done instead.
+        """
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE ingestion_journal j
+                SET status='running', worker=%s, attempts=attempts+1, updated=now()
+                FROM (
+                    SELECT dataset, symbol FROM ingestion_journal
+                    WHERE run_id=%s AND dataset = ANY(%s)
+                      AND (status='pending'
+                           OR (status='running' AND updated < now() - %s * interval '1 second'))
+                    ORDER BY dataset, symbol
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                ) c
+                WHERE j.run_id=%s AND j.dataset=c.dataset AND j.symbol=c.symbol
+                RETURNING j.dataset, j.symbol, j.start_ts, j.end_ts, j.last_ts
+                """,
+                (self.worker, self.run_id, list(specs), STALE_AFTER, limit, self.run_id),
+            )
+            rows = cur.fetchall()
+        conn.commit()
+
+        jobs = []
+        for dataset, symbol, start_ts, end_ts, last_ts in rows:
+            spec = specs[dataset]
+            if last_ts is not None:
+                if last_ts >= end_ts:
+                    self.finish(conn, spec, symbol, ok=True)
+                    continue
+                start_ts = max(start_ts, last_ts + spec.interval_ms)
+            jobs.append((spec, symbol, start_ts, end_ts))
+        return jobs
+
+    def heartbeat(self, conn) -> None:
+        """Mark this worker's running rows as still alive."""
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE ingestion_journal SET updated=now()
+                WHERE run_id=%s AND worker=%s AND status='running'
+                """,
+                (self.run_id, self.worker),
+            )
+        conn.commit()
+
+    def record_page(self, cur, spec: DatasetSpec, symbol: str, rows: int, last_ts: int) -> None:
+        """Checkpoint one written page on the caller's cursor."""
+        cur.execute(
+            """
+            UPDATE ingestion_journal
+            SET pages_done = pages_done + 1,
+                rows_written = rows_written + %s,
+                last_ts = GREATEST(COALESCE(last_ts, 0), %s),
+                updated = now()
+            WHERE run_id=%s AND dataset=%s AND symbol=%s
+            """,
+            (rows, last_ts, self.run_id, spec.name, symbol),
+        )
+
+    def finish(self, conn, spec: DatasetSpec, symbol: str, ok: bool, error: str | None = None) -> None:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE ingestion_journal SET status=%s, error=%s, updated=now()
+                WHERE run_id=%s AND dataset=%s AND symbol=%s
+                """,
+                ("done" if ok else "failed", error, self.run_id, spec.name, symbol),
+            )
+        conn.commit()
+
+    def retry_failed(self, conn, max_attempts: int = 2) -> int:
+        """Put failed symbols with attempts left back to ``pending``."""
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE ingestion_journal SET status='pending', updated=now()
+                WHERE run_id=%s AND status='failed' AND attempts < %s
+                """,
+                (self.run_id, max_attempts),
+            )
+            n = cur.rowcount
+        conn.commit()
+        return n
+
+    def summary(self, conn) -> dict[str, int]:
+        """Return ``{status: symbols}`` for the run."""
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT status, COUNT(*) FROM ingestion_journal WHERE run_id=%s GROUP BY status",
+                (self.run_id,),
+            )
+            counts = dict(cur.fetchall())
+        conn.commit()
+        return counts
+
+    def close_if_complete(self, conn) -> bool:
+        """Mark the run finished once no symbol is pending or running."""
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE ingestion_runs SET finished=now()
+                WHERE run_id=%s AND finished IS NULL AND NOT EXISTS (
+                    SELECT 1 FROM ingestion_journal
+                    WHERE run_id=%s AND status IN ('pending', 'running')
+                )
+                """,
+                (self.run_id, self.run_id),
+            )
+            done = cur.rowcount > 0
+        conn.commit()
+        return done
@@ -0,0 +1,258 @@
+"""Split the instrument universe across worker processes with DB leases.
+
+Symbols are hashed into a fixed number of shards.  Each shard is a row in
+``ingestion_leases`` that a worker holds until ``expires``; workers take free
+or expired shards with ``SELECT ... FOR UPDATE SKIP LOCKED`` and renew their
+leases from a heartbeat thread.  A worker that dies stops renewing, its
+leases expire after ``ttl`` seconds and the remaining workers pick its shards
+up.  Live workers register in ``ingestion_workers``; each aims for an equal
+share of the shards and releases the surplus when another worker joins.
+
+Every worker is also assigned one of the API keys in ``CG_API_KEYS`` (the key
+with the fewest live workers) and draws from that key's token bucket, so the
+combined quota of several keys can be used.  Use the ``postgres`` rate
+limit backend when workers run on more than one host.
+
+A lease may briefly be held by two workers (e.g. a stalled worker whose lease
+expired); writes are idempotent, so this only costs duplicate requests.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import threading
+import zlib
+
+import psycopg2
+
+from ingestion.journal import worker_name
+
+LEASE_DDL = """
+CREATE TABLE IF NOT EXISTS ingestion_leases (
+    pool TEXT NOT NULL,
+    shard INT NOT NULL,
+    worker TEXT,
+    expires TIMESTAMPTZ NOT NULL DEFAULT '-infinity',
+    PRIMARY KEY(pool, shard)
+);
+CREATE TABLE IF NOT EXISTS ingestion_workers (
+    pool TEXT NOT NULL,
+    worker TEXT NOT NULL,
+    key_slot INT NOT NULL DEFAULT 0,
+    heartbeat TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY(pool, worker)
+);
+"""
+
+DEFAULT_SHARDS = 64
+DEFAULT_TTL = 300
+
+
+def shard_of(symbol: str, shards: int) -> int:
+    """Stable shard number of ``symbol`` (same in every process)."""
+    return zlib.crc32(symbol.encode()) % shards
+
+
+def key_bucket_name(slot: int) -> str:
+    """Token bucket of API key ``slot``; slot 0 shares the default bucket."""
+    return "coinglass" if slot == 0 else f"coinglass:{slot}"
+
+
+class ShardLeases:
+    """Lease a fair share of symbol shards for one worker."""
+
+    def __init__(
+        self,
+        db_cfg: dict,
+        *,
+        pool: str = "ingestion",
+        shards: int = DEFAULT_SHARDS,
+        ttl: int = DEFAULT_TTL,
+        worker: str | None = None,
+        key_slots: int = 1,
+    ):
+        self.pool = pool
+        self.shards = shards
+        self.ttl = ttl
+        # Several workers per host need distinct names
+        self.worker = f"{worker_name(worker)}:{os.getpid()}"
+        self.key_slots = key_slots
+        self.key_slot = 0
+        self.held: set[int] = set()
+        self._conn = psycopg2.connect(**db_cfg)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    # ------------------------------------------------------------------
+    # Registration
+    # ------------------------------------------------------------------
+
+    def _execute(self, sql: str, params=None, fetch: bool = False):
+        with self._lock:
+            try:
+                with self._conn.cursor() as cur:
+                    cur.execute(sql, params)
+                    rows = cur.fetchall() if fetch else None
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return rows
+
+    def register(self) -> int:
+        """Create the tables and shards, join the pool and pick an API key.
+
+        Returns the key slot this worker should use.
+        """
+        self._execute(LEASE_DDL)
+        self._execute(
+            """
+            INSERT INTO ingestion_leases(pool, shard)
+            SELECT %s, s FROM generate_series(0, %s - 1) s
+            ON CONFLICT DO NOTHING
+            """,
+            (self.pool, self.shards),
+        )
+        rows = self._execute(
+            """
+            SELECT key_slot, COUNT(*) FROM ingestion_workers
+            WHERE pool=%s AND heartbeat > now() - %s * interval '1 second'
+            GROUP BY key_slot
+            """,
+            (self.pool, self.ttl),
+            fetch=True,
+        )
+        load = dict(rows)
+        self.key_slot = min(range(self.key_slots), key=lambda s: (load.get(s, 0), s))
+        self._execute(
+            """
+            INSERT INTO ingestion_workers(pool, worker, key_slot, heartbeat)
+            VALUES(%s, %s, %s, now())
+            ON CONFLICT(pool, worker)
+            DO UPDATE SET key_slot=EXCLUDED.key_slot, heartbeat=now()
+            """,
+            (self.pool, self.worker, self.key_slot),
+        )
+        return self.key_slot
+
+    # ------------------------------------------------------------------
+    # Leasing
+    # ------------------------------------------------------------------
+
+    def target(self) -> int:
+        """Fair number of shards per live worker."""
+        rows = self._execute(
+            """
+            SELECT COUNT(*) FROM ingestion_workers
+            WHERE pool=%s AND heartbeat > now() - %s * interval '1 second'
+            """,
+            (self.pool, self.ttl),
+            fetch=True,
+        )
+        return math.ceil(self.shards / max(1, rows[0][0]))
+
+    def renew(self) -> set[int]:
+        """Heartbeat, extend held leases, shed surplus and take free shards."""
+        self._execute(
+            "UPDATE ingestion_workers SET heartbeat=now() WHERE pool=%s AND worker=%s",
+            (self.pool, self.worker),
+        )
+        target = self.target()
+        held = {
+            r[0]
+            for r in self._execute(
+                """
+                UPDATE ingestion_leases
+                SET expires = now() + %s * interval '1 second'
+                WHERE pool=%s AND worker=%s AND expires > now()
+                RETURNING shard
+                """,
+                (self.ttl, self.pool, self.worker),
+                fetch=True,
+            )
+        }
+        if len(held) > target:
+            surplus = sorted(held)[target:]
+            self._release(surplus)
+            held -= set(surplus)
+        elif len(held) < target:
+            rows = self._execute(
+                """
+                UPDATE ingestion_leases l
+                SET worker=%s, expires = now() + %s * interval '1 second'
+                FROM (
+                    SELECT shard FROM ingestion_leases
+                    WHERE pool=%s AND expires <= now()
+                    ORDER BY shard
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                ) c
+                WHERE l.pool=%s AND l.shard=c.shard
+                RETURNING l.shard
+                """,
+                (self.worker, self.ttl, self.pool, target - len(held), self.pool),
+                fetch=True,
+            )
+            held |= {r[0] for r in rows}
+        self.held = held
+        return held
+
+    def _release(self, shards) -> None:
+        self._execute(
+            """
+            UPDATE ingestion_leases SET worker=NULL, expires='-infinity'
+            WHERE pool=%s AND worker=%s AND shard = ANY(%s)
+            """,
+            (self.pool, self.worker, list(shards)),
+        )
+
+    def filter(self, symbols: list[str]) -> list[str]:
+        """Return the symbols whose shard this worker currently holds."""
+        held = self.held
+        return [s for s in symbols if shard_of(s, self.shards) in held]
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self) -> None:
+        """Register, take the first leases and renew them in the background."""
+        self.register()
+        self.renew()
+        print(
+            f"worker {self.worker} 使用 API key #{self.key_slot}，持有 {len(self.held)}/{self.shards} 个分片",
+            flush=True,
+        )
+
+        def heartbeat():
+            while not self._stop.wait(self.ttl / 3):
+                try:
+                    self.renew()
+                except Exception as e:
+                    print(f"租约续期失败: {e}", flush=True)
+
+        self._thread = threading.Thread(target=heartbeat, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Release every lease and leave the pool."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        try:
+            self._release(self.held)
+            self._execute(
+                "DELETE FROM ingestion_workers WHERE pool=%s AND worker=%s",
+                (self.pool, self.worker),
+            )
+        finally:
+            self._conn.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,303 @@
+"""Offline stand-in for the CoinGlass endpoints used by this repository.
+
+Serves deterministic synthetic data for
+
+* ``/api/futures/price/history`` - OHLCV bars,
+* ``/api/futures/open-interest/history`` - open interest bars,
+* ``/api/hyperliquid/whale-alert`` - whale position alerts,
+
+so the ingestion engine and the alert bot can be benchmarked and tested
+without spending API quota.  A bar's values depend only on the symbol,
+exchange and bar time, so repeated runs fetch identical data.  Each symbol
+has a listing date within ``history_days``; bars before it are not served.
+
+Latency, error rate and a per-key rate limit are configurable.  Throttled
+requests get HTTP 429 with ``{"code": "429"}``, failed ones HTTP 500 or a
+non-zero body code, as CoinGlass does.  ``/stats`` returns the counters.
+
+Point the code at it with ``CG_API_BASE``::
+
+    python -m ingestion.mockserver --port 8799 --latency 0.2 --rate-limit 80
+    CG_API_BASE=http://127.0.0.1:8799/api python -m ingestion ohlcv_1h
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+INTERVALS = {"m": 60 * 1000, "h": 3600 * 1000, "d": 24 * 3600 * 1000, "w": 7 * 24 * 3600 * 1000}
+DAY_MS = 24 * 3600 * 1000
+MAX_LIMIT = 4500
+
+
+@dataclass
+class MockConfig:
+    """Behaviour of the stand-in server."""
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    # Requests per minute per API key; 0 disables throttling
+    rate_limit: float = 0.0
+    history_days: int = 365
+    seed: int = 0
+
+
+def interval_ms(interval: str) -> int:
+    try:
+        return int(interval[:-1]) * INTERVALS[interval[-1]]
+    except (KeyError, ValueError):
+        raise ValueError(f"invalid interval: {interval}") from None
+
+
+def _seed(*parts: str) -> int:
+    return zlib.crc32("|".join(parts).encode())
+
+
+def _uniform(seed: int, ts: np.ndarray, salt: int) -> np.ndarray:
+    """Deterministic uniforms in [0, 1) per timestamp (splitmix64)."""
+    with np.errstate(over="ignore"):
+        x = ts.astype(np.uint64) + np.uint64((seed << 8) + salt) * np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        x = x ^ (x >> np.uint64(31))
+    return (x >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def _wave(seed: int, ts: np.ndarray) -> np.ndarray:
+    """Smooth positive curve around 1 with a little per-bar noise."""
+    days = ts / DAY_MS
+    phase = seed % 360
+    wave = 0.25 * np.sin(days / 30 + phase) + 0.08 * np.sin(days / 3 + phase / 2)
+    return np.exp(wave + 0.01 * (_uniform(seed, ts, 0) - 0.5))
+
+
+def _level(seed: int, ts: np.ndarray) -> np.ndarray:
+    """Price-like curve of a symbol at ``ts``."""
+    return 10.0 ** (seed % 6 - 2) * (1 + seed % 97 / 10) * _wave(seed, ts)
+
+
+def bar_times(config: MockConfig, symbol: str, step: int, start: int, end: int, limit: int, now_ms: int) -> np.ndarray:
+    """Times of the bars served for one request, oldest first."""
+    horizon = now_ms // step * step
+    listed = horizon - (_seed(symbol) % config.history_days + 1) * DAY_MS
+    listed = -(-listed // step) * step
+    end = min(end or horizon, horizon)
+    start = max(start, listed)
+    if start > end:
+        return np.empty(0, dtype=np.int64)
+    first = max(-(-start // step) * step, end // step * step - (limit - 1) * step)
+    return np.arange(first, end // step * step + 1, step, dtype=np.int64)
+
+
+def price_bars(config: MockConfig, symbol: str, exchange: str, ts: np.ndarray, step: int) -> list[dict]:
+    seed = _seed(symbol, exchange) ^ config.seed
+    opens = _level(seed, ts)
+    closes = _level(seed, ts + step)
+    spread = 1 + 0.01 * _uniform(seed, ts, 1)
+    highs = np.maximum(opens, closes) * spread
+    lows = np.minimum(opens, closes) / (1 + 0.01 * _uniform(seed, ts, 2))
+    volume = 1e6 * (1 + seed % 50) * (0.5 + _uniform(seed, ts, 3))
+    return [
+        {"time": int(t), "open": f"{o:.8g}", "high": f"{h:.8g}", "low": f"{l:.8g}",
+         "close": f"{c:.8g}", "volume_usd": f"{v:.2f}"}
+        for t, o, h, l, c, v in zip(ts.tolist(), opens.tolist(), highs.tolist(),
+                                    lows.tolist(), closes.tolist(), volume.tolist())
+    ]
+
+
+def oi_bars(config: MockConfig, symbol: str, exchange: str, ts: np.ndarray, step: int) -> list[dict]:
+    seed = _seed(symbol, exchange, "oi") ^ config.seed
+    scale = 1e7 * (1 + seed % 200)
+    opens = scale * _wave(seed, ts)
+    closes = scale * _wave(seed, ts + step)
+    return [
+        {"time": int(t), "open": f"{o:.2f}", "high": f"{max(o, c):.2f}",
+         "low": f"{min(o, c):.2f}", "close": f"{c:.2f}", "openInterest": f"{c:.2f}"}
+        for t, o, c in zip(ts.tolist(), opens.tolist(), closes.tolist())
+    ]
+
+
+def whale_alerts(config: MockConfig, now_ms: int, count: int = 20) -> list[dict]:
+    """Recent whale positions; a new one appears every minute."""
+    minute = now_ms // 60000
+    out = []
+    for i in range(count):
+        ts = (minute - i) * 60000
+        seed = _seed("whale", str(ts)) ^ config.seed
+        rng = random.Random(seed)
+        symbol = rng.choice(("BTC", "ETH", "SOL", "HYPE", "XRP", "DOGE"))
+        entry = float(_level(_seed(symbol, "Binance"), np.array([ts]))[0])
+        size = rng.uniform(-1, 1) * 2e7 / entry
+        liq = entry * (1 - 0.2 if size > 0 else 1 + 0.2)
+        out.append(
+            {
+                "user": f"0x{seed:08x}{rng.getrandbits(128):032x}",
+                "symbol": symbol,
+                "position_size": round(size, 4),
+                "entry_price": round(entry, 6),
+                "liq_price": round(liq, 6),
+                "position_value_usd": round(abs(size) * entry, 2),
+                "position_action": rng.choice((1, 2)),
+                "create_time": ts,
+            }
+        )
+    return out
+
+
+class MockCoinGlass:
+    """Request handling state: config, per-key buckets and counters."""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self.counters = {"requests": 0, "ok": 0, "throttled": 0, "errors": 0, "rows": 0}
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[key] += n
+
+    def _throttled(self, api_key: str) -> bool:
+        rate = self.config.rate_limit / 60.0
+        if rate <= 0:
+            return False
+        now = time.monotonic()
+        capacity = max(1.0, rate * 5)
+        with self._lock:
+            tokens, updated = self._buckets.get(api_key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens < 1:
+                self._buckets[api_key] = (tokens, now)
+                return True
+            self._buckets[api_key] = (tokens - 1, now)
+        return False
+
+    def _fails(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.config.error_rate
+
+    def _delay(self) -> None:
+        cfg = self.config
+        if cfg.latency or cfg.jitter:
+            with self._lock:
+                jitter = self._rng.uniform(-cfg.jitter, cfg.jitter)
+            time.sleep(max(0.0, cfg.latency + jitter))
+
+    def handle(self, path: str, query: dict[str, str], api_key: str | None) -> tuple[int, dict]:
+        """Return ``(status, body)`` for one GET request."""
+        if path == "/stats":
+            with self._lock:
+                return 200, dict(self.counters)
+        self._count("requests")
+        self._delay()
+        if not api_key:
+            return 401, {"code": "401", "msg": "API key missing"}
+        if self._throttled(api_key):
+            self._count("throttled")
+            return 429, {"code": "429", "msg": "Too Many Requests"}
+        if self._fails():
+            self._count("errors")
+            if self._rng.random() < 0.5:
+                return 500, {"code": "500", "msg": "Internal Server Error"}
+            return 200, {"code": "50001", "msg": "Server busy"}
+
+        now_ms = int(time.time() * 1000)
+        if path == "/api/hyperliquid/whale-alert":
+            self._count("ok")
+            return 200, {"code": "0", "msg": "success", "data": whale_alerts(self.config, now_ms)}
+        if path not in ("/api/futures/price/history", "/api/futures/open-interest/history"):
+            return 404, {"code": "404", "msg": "Not Found"}
+        try:
+            step = interval_ms(query.get("interval", "1h"))
+            limit = min(int(query.get("limit", 1000)), MAX_LIMIT)
+            start = int(query.get("start_time", 0))
+            end = int(query.get("end_time", 0))
+        except ValueError as exc:
+            return 200, {"code": "400", "msg": str(exc)}
+        symbol = query.get("symbol", "")
+        exchange = query.get("exchange", "Binance")
+        ts = bar_times(self.config, symbol, step, start, end, limit, now_ms)
+        make = price_bars if path.endswith("price/history") else oi_bars
+        data = make(self.config, symbol, exchange, ts, step)
+        self._count("ok")
+        self._count("rows", len(data))
+        return 200, {"code": "0", "msg": "success", "data": data}
+
+
+def serve(config: MockConfig, host: str = "127.0.0.1", port: int = 0) -> tuple[ThreadingHTTPServer, MockCoinGlass]:
+    """Start the server on a background thread; ``port=0`` picks a free port."""
+    mock = MockCoinGlass(config)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+            status, body = mock.handle(parts.path, query, self.headers.get("CG-API-KEY"))
+            payload = json.dumps(body, separators=(",", ":")).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, mock
+
+
+def add_config_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- jitter on the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument(
+        "--rate-limit", type=float, default=0.0, help="Requests per minute per API key (0: unlimited)"
+    )
+    parser.add_argument("--history-days", type=int, default=365, help="Oldest listing date of a symbol")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic data and errors")
+
+
+def config_from_args(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        history_days=args.history_days,
+        seed=args.seed,
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve synthetic CoinGlass data locally")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8799)
+    add_config_args(parser)
+    args = parser.parse_args(argv)
+    server, _ = serve(config_from_args(args), args.host, args.port)
+    print(f"CoinGlass 模拟服务已启动: CG_API_BASE=http://{args.host}:{server.server_port}/api", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+"""Monthly range partitioning of the OHLCV tables.
+
+With the default layout every bar table is one heap with NUMERIC columns and
+a ``(symbol, time)`` primary key, so a cross-symbol scan of the last few hours
+walks the whole index.  The partitioned layout splits a table by calendar
+month (UTC) of ``time``:
+
+* ``{table}_pYYYYMM`` children plus ``{table}_pdefault`` for anything outside
+  them; ``time >= ...`` filters only touch the newest partitions;
+* a BRIN index on ``time`` next to the primary key;
+* ``DOUBLE PRECISION`` value columns.
+
+Tables listed in ``CG_PARTITIONED_TABLES`` are created partitioned on a fresh
+database; existing tables are converted online with ``migrate``.  The engine
+and the rollups create the partitions around the current month themselves;
+``maintain`` also splits rows out of the default partition and drops months
+past the retention::
+
+    python -m ingestion.partitions status
+    python -m ingestion.partitions migrate ohlcv_1h ohlcv_4h ohlcv
+    python -m ingestion.partitions maintain --retain ohlcv=6 --retain ohlcv_1h=36
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from datetime import datetime, timezone
+from typing import Iterable, Sequence
+
+import psycopg2
+
+from config import secret_get
+
+DEFAULT_TABLES = ("ohlcv_1h", "ohlcv_4h", "ohlcv")
+# Months created before and after the current one by ensure_partitions
+MONTHS_BEHIND = 3
+MONTHS_AHEAD = 2
+
+# Tables created with the partitioned layout when they do not exist yet
+PARTITIONED_TABLES = {
+    t.strip() for t in secret_get("CG_PARTITIONED_TABLES", "").split(",") if t.strip()
+}
+
+
+def month_of(ts_ms: int) -> datetime:
+    dt = datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc)
+    return dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, n: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + n
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def month_ms(dt: datetime) -> int:
+    return int(dt.timestamp() * 1000)
+
+
+def months(start_ms: int, end_ms: int) -> list[datetime]:
+    """First days of every month from ``start_ms`` through ``end_ms``."""
+    out = []
+    month, last = month_of(start_ms), month_of(end_ms)
+    while month <= last:
+        out.append(month)
+        month = add_months(month, 1)
+    return out
+
+
+def _now_ms() -> int:
+    return int(datetime.now(timezone.utc).timestamp() * 1000)
+
+
+# ----------------------------------------------------------------------
+# DDL
+# ----------------------------------------------------------------------
+
+
+def heap_ddl(table: str, value_columns: Sequence[str]) -> str:
+    value_cols = "".join(f"    {c} NUMERIC,\n" for c in value_columns)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {table} (\n"
+        "    symbol TEXT NOT NULL,\n"
+        "    time BIGINT NOT NULL,\n"
+        f"{value_cols}"
+        "    PRIMARY KEY(symbol, time)\n"
+        ");"
+    )
+
+
+def partitioned_ddl(table: str, value_columns: Sequence[str], prefix: str | None = None) -> str:
+    """Partitioned parent, default partition and BRIN index of ``table``.
+
+    Child objects are named after ``prefix`` (default ``table``), which lets
+    :func:`migrate` build the new table under a temporary name.
+    """
+    prefix = prefix or table
+    value_cols = "".join(f"    {c} DOUBLE PRECISION,\n" for c in value_columns)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {table} (\n"
+        "    symbol TEXT NOT NULL,\n"
+        "    time BIGINT NOT NULL,\n"
+        f"{value_cols}"
+        "    PRIMARY KEY(symbol, time)\n"
+        ") PARTITION BY RANGE (time);\n"
+        f"CREATE TABLE IF NOT EXISTS {prefix}_pdefault PARTITION OF {table} DEFAULT;\n"
+        f"CREATE INDEX IF NOT EXISTS {prefix}_time_brin ON {table} USING BRIN (time);"
+    )
+
+
+def table_ddl(table: str, value_columns: Sequence[str]) -> str:
+    """DDL of a bar table in the layout configured for it."""
+    if table in PARTITIONED_TABLES:
+        return partitioned_ddl(table, value_columns)
+    return heap_ddl(table, value_columns)
+
+
+# ----------------------------------------------------------------------
+# Partitions
+# ----------------------------------------------------------------------
+
+
+def is_partitioned(cur, table: str) -> bool:
+    cur.execute(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", (table,)
+    )
+    return cur.fetchone() is not None
+
+
+def partition_months(cur, prefix: str) -> list[datetime]:
+    """Months that already have a ``{prefix}_pYYYYMM`` partition."""
+    cur.execute(
+        "SELECT relname FROM pg_class WHERE relkind IN ('r', 'p') AND relname ~ %s",
+        (f"^{prefix}_p[0-9]{{6}}$",),
+    )
+    out = []
+    for (name,) in cur.fetchall():
+        suffix = name[-6:]
+        out.append(datetime(int(suffix[:4]), int(suffix[4:]), 1, tzinfo=timezone.utc))
+    return sorted(out)
+
+
+def create_partition(cur, table: str, month: datetime, prefix: str | None = None) -> bool:
+    """Attach the partition of ``month`` unless it exists.
+
+    Rows of that month already in the default partition are moved into it
+    first, otherwise the attach would be rejected.
+    """
+    prefix = prefix or table
+    name = f"{prefix}_p{month:%Y%m}"
+    cur.execute("SELECT to_regclass(%s)", (name,))
+    if cur.fetchone()[0] is not None:
+        return False
+    lo, hi = month_ms(month), month_ms(add_months(month, 1))
+    cur.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)")
+    cur.execute(
+        f"""
+        WITH moved AS (
+            DELETE FROM {prefix}_pdefault WHERE time >= %s AND time < %s RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+        """,
+        (lo, hi),
+    )
+    cur.execute(
+        f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)",
+        (lo, hi),
+    )
+    return True
+
+
+def ensure_partitions(
+    cur,
+    table: str,
+    *,
+    behind: int = MONTHS_BEHIND,
+    ahead: int = MONTHS_AHEAD,
+    now_ms: int | None = None,
+) -> int:
+    """Create the partitions around the current month of a partitioned table.
+
+    Does nothing for heap tables.  Returns the number of partitions created.
+    """
+    if not is_partitioned(cur, table):
+        return 0
+    current = month_of(_now_ms() if now_ms is None else now_ms)
+    return sum(
+        create_partition(cur, table, add_months(current, n)) for n in range(-behind, ahead + 1)
+    )
+
+
+def split_default(cur, table: str) -> int:
+    """Move rows of the default partition into monthly partitions."""
+    cur.execute(f"SELECT MIN(time), MAX(time) FROM {table}_pdefault")
+    lo, hi = cur.fetchone()
+    if lo is None:
+        return 0
+    return sum(create_partition(cur, table, month) for month in months(lo, hi))
+
+
+def drop_before(cur, table: str, keep_months: int, now_ms: int | None = None) -> list[str]:
+    """Drop partitions (and default rows) older than ``keep_months`` months."""
+    cutoff = add_months(month_of(_now_ms() if now_ms is None else now_ms), -keep_months)
+    dropped = []
+    for month in partition_months(cur, table):
+        if month < cutoff:
+            name = f"{table}_p{month:%Y%m}"
+            cur.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+            cur.execute(f"DROP TABLE {name}")
+            dropped.append(name)
+    cur.execute(f"DELETE FROM {table}_pdefault WHERE time < %s", (month_ms(cutoff),))
+    return dropped
+
+
+# ----------------------------------------------------------------------
+# Online migration
+# ----------------------------------------------------------------------
+
+
+def _value_columns(cur, table: str) -> list[str]:
+    cur.execute(
+        """
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s
+        ORDER BY ordinal_position
+        """,
+        (table,),
+    )
+    return [c for (c,) in cur.fetchall() if c not in ("symbol", "time")]
+
+
+def migrate(conn, table: str, *, drop_old: bool = False) -> None:
+    """Convert heap ``table`` into the partitioned layout while it is in use.
+
+    A trigger mirrors every write to ``table`` into the new table while the
+    existing rows are copied month by month in separate transactions.  The
+    tables are then swapped under a short exclusive lock; the old one is kept
+    as ``{table}_unpartitioned`` unless ``drop_old`` is set.
+    """
+    new = f"{table}_partitioned"
+    with conn.cursor() as cur:
+        if is_partitioned(cur, table):
+            print(f"{table} 已是分区表，跳过", flush=True)
+            conn.commit()
+            return
+        cols = _value_columns(cur, table)
+        if not cols:
+            raise ValueError(f"Unknown table: {table}")
+        all_cols = ", ".join(("symbol", "time", *cols))
+        updates = ", ".join(f"{c}=EXCLUDED.{c}" for c in cols)
+        cur.execute(partitioned_ddl(new, cols, prefix=table))
+        cur.execute(f"SELECT MIN(time), MAX(time) FROM {table}")
+        lo, hi = cur.fetchone()
+        now = _now_ms()
+        span = months(min(lo or now, now), max(hi or now, now))
+        span += [add_months(span[-1], n) for n in range(1, MONTHS_AHEAD + 1)]
+        for month in span:
+            create_partition(cur, new, month, prefix=table)
+        cur.execute(
+            f"""
+            CREATE OR REPLACE FUNCTION {table}_mirror() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    DELETE FROM {new} WHERE symbol = OLD.symbol AND time = OLD.time;
+                    RETURN NULL;
+                END IF;
+                INSERT INTO {new} ({all_cols}) SELECT {all_cols} FROM (SELECT NEW.*) n
+                ON CONFLICT (symbol, time) DO UPDATE SET {updates};
+                RETURN NULL;
+            END $$;
+            DROP TRIGGER IF EXISTS {table}_mirror ON {table};
+            CREATE TRIGGER {table}_mirror AFTER INSERT OR UPDATE OR DELETE ON {table}
+                FOR EACH ROW EXECUTE FUNCTION {table}_mirror();
+            """
+        )
+    conn.commit()
+    print(f"{table} 开始迁移，共 {len(span)} 个月分区", flush=True)
+
+    for month in span:
+        lo_ms, hi_ms = month_ms(month), month_ms(add_months(month, 1))
+        with conn.cursor() as cur:
+            # Rows the trigger already mirrored are newer than this copy
+            cur.execute(
+                f"""
+                INSERT INTO {new} ({all_cols})
+                SELECT {all_cols} FROM {table} WHERE time >= %s AND time < %s
+                ON CONFLICT DO NOTHING
+                """,
+                (lo_ms, hi_ms),
+            )
+            copied = cur.rowcount
+        conn.commit()
+        print(f"{table} {month:%Y-%m} 复制 {copied} 行", flush=True)
+
+    old = f"{table}_unpartitioned"
+    with conn.cursor() as cur:
+        cur.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+        cur.execute(f"DROP TRIGGER {table}_mirror ON {table}")
+        cur.execute(f"DROP FUNCTION {table}_mirror()")
+        cur.execute(f"ALTER TABLE {table} RENAME TO {old}")
+        cur.execute(f"ALTER INDEX IF EXISTS {table}_pkey RENAME TO {old}_pkey")
+        cur.execute(f"ALTER TABLE {new} RENAME TO {table}")
+        cur.execute(f"ALTER INDEX IF EXISTS {new}_pkey RENAME TO {table}_pkey")
+        cur.execute(f"ANALYZE {table}")
+        if drop_old:
+            cur.execute(f"DROP TABLE {old}")
+    conn.commit()
+    kept = "已删除" if drop_old else f"保留为 {old}"
+    print(f"{table} 已切换为分区表，旧表{kept}", flush=True)
+
+
+# ----------------------------------------------------------------------
+# Command line
+# ----------------------------------------------------------------------
+
+
+def status(conn, tables: Iterable[str]) -> None:
+    with conn.cursor() as cur:
+        for table in tables:
+            cur.execute("SELECT to_regclass(%s)", (table,))
+            if cur.fetchone()[0] is None:
+                print(f"{table}: 不存在", flush=True)
+                continue
+            if not is_partitioned(cur, table):
+                cur.execute("SELECT pg_size_pretty(pg_total_relation_size(%s))", (table,))
+                print(f"{table}: 普通表 {cur.fetchone()[0]}", flush=True)
+                continue
+            parts = partition_months(cur, table)
+            cur.execute(f"SELECT COUNT(*) FROM {table}_pdefault")
+            n_default = cur.fetchone()[0]
+            span = f"{parts[0]:%Y-%m} ~ {parts[-1]:%Y-%m}" if parts else "-"
+            print(f"{table}: 分区表 {len(parts)} 个月分区 ({span})，默认分区 {n_default} 行", flush=True)
+    conn.commit()
+
+
+def parse_retain(values: list[str]) -> dict[str, int]:
+    """``["ohlcv=6", ...]`` (or ``CG_OHLCV_RETENTION``) to months per table."""
+    items = values or [v for v in secret_get("CG_OHLCV_RETENTION", "").split(",") if v.strip()]
+    out = {}
+    for item in items:
+        table, _, n = item.partition("=")
+        if not n.strip().isdigit():
+            raise ValueError(f"Invalid retention: {item} (expected TABLE=MONTHS)")
+        out[table.strip()] = int(n)
+    return out
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Manage monthly partitions of the OHLCV tables")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_status = sub.add_parser("status", help="Show the layout of each table")
+    p_status.add_argument("tables", nargs="*", default=list(DEFAULT_TABLES))
+    p_migrate = sub.add_parser("migrate", help="Convert heap tables to the partitioned layout online")
+    p_migrate.add_argument("tables", nargs="*", default=list(DEFAULT_TABLES))
+    p_migrate.add_argument("--drop-old", action="store_true", help="Drop the old table after the swap")
+    p_maintain = sub.add_parser("maintain", help="Create upcoming partitions and apply retention")
+    p_maintain.add_argument("tables", nargs="*", default=list(DEFAULT_TABLES))
+    p_maintain.add_argument("--ahead", type=int, default=MONTHS_AHEAD, help="Months to create ahead")
+    p_maintain.add_argument(
+        "--retain",
+        action="append",
+        default=[],
+        metavar="TABLE=MONTHS",
+        help="Drop partitions older than MONTHS for TABLE (default: CG_OHLCV_RETENTION)",
+    )
+    args = parser.parse_args(argv)
+
+    from ingestion.engine import DB_CFG
+
+    conn = psycopg2.connect(**DB_CFG)
+    try:
+        if args.command == "status":
+            status(conn, args.tables)
+        elif args.command == "migrate":
+            for table in args.tables:
+                migrate(conn, table, drop_old=args.drop_old)
+        else:
+            try:
+                retain = parse_retain(args.retain)
+            except ValueError as exc:
+                print(exc, flush=True)
+                sys.exit(2)
+            for table in args.tables:
+                with conn.cursor() as cur:
+                    if not is_partitioned(cur, table):
+                        print(f"{table} 不是分区表，跳过", flush=True)
+                        conn.commit()
+                        continue
+                    created = ensure_partitions(cur, table, ahead=args.ahead)
+                    created += split_default(cur, table)
+                    dropped = drop_before(cur, table, retain[table]) if table in retain else []
+                conn.commit()
+                print(f"{table} 新建 {created} 个分区，删除 {len(dropped)} 个分区 {dropped}", flush=True)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
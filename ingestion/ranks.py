@@ -0,0 +1,141 @@
+"""Hourly cross-sectional ranks of ``ohlcv_1h`` kept in ``rank_1h``.
+
+The ranking pages and bots rank every symbol by its hourly change
+``(close - open) / open * 100`` and aggregate the ranks over 4h to 168h
+windows.  Instead of pulling the whole window and re-ranking it on every
+request, each ingest run ranks the newly closed hours once inside Postgres:
+
+* ``rank`` - competition rank among the symbols with a bar in that hour
+  (``RANK()``, the same as pandas ``rank(method="min")``),
+* ``percentile`` - ``(n - pos) / (n - 1)`` where ``pos`` breaks ties by
+  symbol, 1 for the best and 0 for the worst of the hour's ``n`` symbols.
+
+Progress is kept in ``ingestion_watermarks`` (dataset ``rank_1h``, symbol
+``*``).  Every run re-ranks the last :data:`LOOKBACK_HOURS` hours as well so
+symbols published late move into place; ``ingestion.gaps`` rewinds the mark
+after backfilling older hours.  ``strategies.rankings`` reads the table.
+
+    python -m ingestion.ranks            # rank the hours closed since the last run
+    python -m ingestion.ranks --rescan   # rebuild from the full hourly history
+"""
+
+from __future__ import annotations
+
+import argparse
+from datetime import datetime, timezone
+
+import psycopg2
+
+from ingestion.engine import DB_CFG
+from ingestion.specs import HOUR_MS
+from ingestion.watermarks import ensure_watermark_table
+
+RANK_TABLE = "rank_1h"
+MARK_SYMBOL = "*"
+LOOKBACK_HOURS = 3
+
+RANK_DDL = """
+CREATE TABLE IF NOT EXISTS rank_1h (
+    time BIGINT NOT NULL,
+    symbol TEXT NOT NULL,
+    pct DOUBLE PRECISION NOT NULL,
+    rank INTEGER NOT NULL,
+    percentile DOUBLE PRECISION,
+    PRIMARY KEY(time, symbol)
+);
+"""
+
+RANK_SQL = """
+WITH src AS (
+    SELECT time, symbol,
+           (close::double precision - open::double precision)
+             / NULLIF(open::double precision, 0) * 100 AS pct
+    FROM ohlcv_1h
+    WHERE time >= %(since)s AND time < %(until)s
+), ranked AS (
+    SELECT time, symbol, pct,
+           RANK() OVER (PARTITION BY time ORDER BY pct DESC) AS rank,
+           ROW_NUMBER() OVER (PARTITION BY time ORDER BY pct DESC, symbol COLLATE "C") AS pos,
+           COUNT(*) OVER (PARTITION BY time) AS n
+    FROM src
+    WHERE pct IS NOT NULL
+), written AS (
+    INSERT INTO rank_1h (time, symbol, pct, rank, percentile)
+    SELECT time, symbol, pct, rank,
+           CASE WHEN n > 1 THEN (n - pos)::double precision / (n - 1) END
+    FROM ranked
+    ON CONFLICT (time, symbol) DO UPDATE
+      SET pct = EXCLUDED.pct, rank = EXCLUDED.rank, percentile = EXCLUDED.percentile
+    RETURNING time
+)
+SELECT COUNT(*), MAX(time) FROM written
+"""
+
+
+def rank_watermark(cur) -> int | None:
+    """Start of the newest ranked hour, ``None`` before the first run."""
+    cur.execute(
+        "SELECT last_ts FROM ingestion_watermarks WHERE dataset=%s AND symbol=%s",
+        (RANK_TABLE, MARK_SYMBOL),
+    )
+    row = cur.fetchone()
+    return None if row is None else int(row[0])
+
+
+def update_ranks(conn, *, rescan: bool = False, now_ms: int | None = None) -> int:
+    """Rank every closed hour since the watermark; return the rows written."""
+    if now_ms is None:
+        now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+    # The bar starting at ``until`` is still open
+    until = (now_ms // HOUR_MS) * HOUR_MS
+    with conn.cursor() as cur:
+        cur.execute(RANK_DDL)
+        mark = None if rescan else rank_watermark(cur)
+        since = 0 if mark is None else mark - (LOOKBACK_HOURS - 1) * HOUR_MS
+        cur.execute(RANK_SQL, {"since": since, "until": until})
+        written, last = cur.fetchone()
+        if last is not None:
+            cur.execute(
+                """
+                INSERT INTO ingestion_watermarks(dataset, symbol, last_ts)
+                VALUES(%s, %s, %s)
+                ON CONFLICT(dataset, symbol)
+                DO UPDATE SET last_ts = GREATEST(ingestion_watermarks.last_ts, EXCLUDED.last_ts)
+                """,
+                (RANK_TABLE, MARK_SYMBOL, last),
+            )
+    conn.commit()
+    print(f"{RANK_TABLE} 排名写入 {written} 行", flush=True)
+    return written
+
+
+def rewind_ranks(conn, first_ts: int) -> None:
+    """Make the next run re-rank the hours from ``first_ts`` on."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE ingestion_watermarks SET last_ts = LEAST(last_ts, %s)
+            WHERE dataset=%s AND symbol=%s
+            """,
+            (first_ts + (LOOKBACK_HOURS - 1) * HOUR_MS, RANK_TABLE, MARK_SYMBOL),
+        )
+    conn.commit()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Rank ohlcv_1h hours into rank_1h")
+    parser.add_argument(
+        "--rescan", action="store_true", help="Rebuild from the full hourly history"
+    )
+    args = parser.parse_args(argv)
+
+    conn = psycopg2.connect(**DB_CFG)
+    try:
+        ensure_watermark_table(conn)
+        update_ranks(conn, rescan=args.rescan)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
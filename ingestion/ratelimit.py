@@ -0,0 +1,254 @@
+"""CoinGlass request rate limiting shared across processes.
+
+Every CoinGlass caller (the ingestion engine, the whale alert bot and the
+Hyperliquid page) draws from one token bucket.  The bucket state lives outside
+the process so separate cron jobs and the Streamlit app no longer each assume
+they own the full quota:
+
+* ``file`` (default) - a JSON file guarded by ``fcntl.flock``; shared by all
+  processes on one host.
+* ``postgres`` - a row in ``rate_limit_buckets`` locked with
+  ``SELECT ... FOR UPDATE``; shared by every host using the database.
+
+Tokens refill continuously at ``rate`` per second, so requests are paced
+smoothly instead of bursting until the minute cap and then stalling.  Callers
+pass a priority; lower priorities must leave a reserve of tokens in the bucket
+so alerts and interactive pages are served first.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Callable
+
+import requests
+
+import http_client
+from config import secret_get
+
+MAX_REQS_PER_MIN = 79
+
+# Tokens a caller of each priority must leave in the bucket
+PRIORITY_RESERVE = {
+    "high": 0.0,
+    "normal": 1.0,
+    "low": 2.0,
+}
+
+BUCKET_DDL = """
+CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+    name TEXT PRIMARY KEY,
+    tokens DOUBLE PRECISION NOT NULL,
+    updated DOUBLE PRECISION NOT NULL
+);
+"""
+
+State = dict
+Update = Callable[[State | None, float], tuple[State, float]]
+
+
+class FileBucketStore:
+    """Bucket state in a JSON file locked with ``flock``."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def transact(self, name: str, update: Update) -> float:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a+", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    buckets = json.loads(f.read() or "{}")
+                except json.JSONDecodeError:
+                    buckets = {}
+                state, result = update(buckets.get(name), time.time())
+                buckets[name] = state
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(buckets))
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return result
+
+
+class PgBucketStore:
+    """Bucket state in a ``rate_limit_buckets`` row locked per update."""
+
+    def __init__(self, db_cfg: dict):
+        import psycopg2
+
+        self._connect = lambda: psycopg2.connect(**db_cfg)
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or conn.closed:
+            conn = self._connect()
+            with conn.cursor() as cur:
+                cur.execute(BUCKET_DDL)
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def transact(self, name: str, update: Update) -> float:
+        conn = self._conn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT tokens, updated FROM rate_limit_buckets WHERE name=%s FOR UPDATE",
+                    (name,),
+                )
+                row = cur.fetchone()
+                old = {"tokens": row[0], "updated": row[1]} if row else None
+                state, result = update(old, time.time())
+                cur.execute(
+                    """
+                    INSERT INTO rate_limit_buckets(name, tokens, updated)
+                    VALUES(%s, %s, %s)
+                    ON CONFLICT(name) DO UPDATE
+                      SET tokens=EXCLUDED.tokens, updated=EXCLUDED.updated
+                    """,
+                    (name, state["tokens"], state["updated"]),
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return result
+
+
+class TokenBucket:
+    """Token bucket whose state is kept in a shared ``store``."""
+
+    def __init__(
+        self,
+        name: str = "coinglass",
+        *,
+        per_min: float = MAX_REQS_PER_MIN,
+        capacity: float = 5.0,
+        store=None,
+    ):
+        self.name = name
+        self.rate = per_min / 60.0
+        self.capacity = capacity
+        self.store = store or FileBucketStore(default_bucket_path())
+
+    def _refill(self, state: State | None, now: float) -> float:
+        if state is None:
+            return self.capacity
+        elapsed = max(0.0, now - state["updated"])
+        return min(self.capacity, state["tokens"] + elapsed * self.rate)
+
+    def try_acquire(self, cost: float = 1.0, priority: str = "normal") -> float:
+        """Take ``cost`` tokens if available.
+
+        Returns ``0`` on success, otherwise the number of seconds until enough
+        tokens will have accumulated.
+        """
+        reserve = PRIORITY_RESERVE[priority]
+
+        def update(state, now):
+            tokens = self._refill(state, now)
+            need = cost + min(reserve, self.capacity - cost)
+            if tokens >= need:
+                return {"tokens": tokens - cost, "updated": now}, 0.0
+            return {"tokens": tokens, "updated": now}, (need - tokens) / self.rate
+
+        return self.store.transact(self.name, update)
+
+    def acquire(self, cost: float = 1.0, priority: str = "normal") -> float:
+        """Block until ``cost`` tokens are taken; return seconds waited."""
+        waited = 0.0
+        while True:
+            delay = self.try_acquire(cost, priority)
+            if delay <= 0:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    def wait(self, priority: str = "normal") -> float:
+        """Acquire a single request token."""
+        return self.acquire(1.0, priority)
+
+    def penalize(self, seconds: float) -> None:
+        """Empty the bucket so every caller pauses for about ``seconds``.
+
+        Used when CoinGlass reports throttling despite local pacing, e.g.
+        because another key holder shares the quota.
+        """
+
+        def update(state, now):
+            tokens = min(self._refill(state, now), -seconds * self.rate)
+            return {"tokens": tokens, "updated": now}, 0.0
+
+        self.store.transact(self.name, update)
+
+
+def default_bucket_path() -> str:
+    return secret_get(
+        "CG_RATE_LIMIT_FILE", os.path.join(tempfile.gettempdir(), "coinglass_ratelimit.json")
+    )
+
+
+_LIMITERS: dict[str, TokenBucket] = {}
+_LIMITER_LOCK = threading.Lock()
+
+
+def get_limiter(name: str = "coinglass") -> TokenBucket:
+    """Return the process-wide CoinGlass limiter configured from the env.
+
+    ``CG_RATE_LIMIT_BACKEND`` selects ``file`` (default) or ``postgres`` and
+    ``CG_RATE_LIMIT_PER_MIN`` overrides the quota of 79 requests per minute.
+    Each API key has its own bucket ``name`` in the same store.
+    """
+    with _LIMITER_LOCK:
+        limiter = _LIMITERS.get(name)
+        if limiter is None:
+            backend = secret_get("CG_RATE_LIMIT_BACKEND", "file")
+            if backend == "postgres":
+                from config import DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, OHLCV_DB_NAME
+
+                store = PgBucketStore(
+                    {
+                        "host": DB_HOST,
+                        "port": DB_PORT,
+                        "dbname": OHLCV_DB_NAME,
+                        "user": DB_USER,
+                        "password": DB_PASSWORD,
+                    }
+                )
+            else:
+                store = FileBucketStore(default_bucket_path())
+            per_min = float(secret_get("CG_RATE_LIMIT_PER_MIN", str(MAX_REQS_PER_MIN)))
+            limiter = _LIMITERS[name] = TokenBucket(name, per_min=per_min, store=store)
+        return limiter
+
+
+def limited_get(url: str, *, priority: str = "normal", attempts: int = 3, **kwargs):
+    """GET a CoinGlass ``url`` taking one token from the shared bucket per attempt.
+
+    ``http_client``'s own retries would bypass the bucket, so they are turned
+    off and connection errors and :data:`http_client.RETRY_STATUS` responses
+    are retried here instead.  Returns the last response; the last exception
+    is raised.
+    """
+    limiter = get_limiter()
+    for attempt in range(attempts):
+        limiter.acquire(priority=priority)
+        try:
+            resp = http_client.get(url, retries=0, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == attempts - 1:
+                raise
+        else:
+            if resp.status_code not in http_client.RETRY_STATUS or attempt == attempts - 1:
+                return resp
+        time.sleep(2**attempt)
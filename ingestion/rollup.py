@@ -0,0 +1,260 @@
+"""Roll ``ohlcv_1h`` bars up into longer intervals inside Postgres.
+
+4h, daily and weekly candles are derived exactly from the hourly table instead
+of being downloaded or resampled in pandas on every page view.  Each rollup is
+one ``INSERT ... SELECT ... GROUP BY`` over the hourly rows newer than the
+rollup's watermark, so a run only touches the bars ingested since the last
+one.
+
+Alignment rules (all boundaries in UTC+8, the timezone used by the app):
+
+* ``ohlcv_4h`` - 00:00/04:00/08:00/... local time.  Because 8h is a multiple
+  of 4h these are the same boundaries as CoinGlass' own 4h candles, so bars
+  previously downloaded into ``ohlcv_4h`` line up with rolled ones.
+* ``ohlcv_1d`` - local midnight.
+* ``ohlcv_1w`` - Monday 00:00 local time.
+
+A bar's ``time`` is the start of its interval.  A bar is only written once
+every hourly bar of the interval exists and the interval has fully closed.
+Rollup watermarks live in ``ingestion_watermarks`` under ``rollup:<name>`` so
+they never mix with the downloadable dataset of the same name.  A symbol's
+watermark moves past every written bar, and past every closed interval its
+hourly watermark has already left behind: an hourly hole there leaves the bar
+out until ``ingestion.gaps`` repairs it and rewinds the watermark (or
+``--rescan`` is used).
+
+Each run starts from the hourly watermarks, skips symbols that cannot have
+completed a new interval and reads the others' new hours through the
+``(symbol, time)`` key, so a run costs the hours ingested since the last one.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import psycopg2
+
+from ingestion.engine import DB_CFG
+from ingestion.partitions import ensure_partitions, table_ddl
+from ingestion.ranks import RANK_TABLE, update_ranks
+from ingestion.specs import HOUR_MS, OHLCV_COLUMNS, get_spec
+from ingestion.watermarks import ensure_watermark_table, load_watermarks
+
+DAY_MS = 24 * HOUR_MS
+UTC8_OFFSET_MS = 8 * HOUR_MS
+# 1970-01-01 was a Thursday; shifting by three days puts week starts on Monday
+MONDAY_OFFSET_MS = 3 * DAY_MS
+
+
+@dataclass(frozen=True)
+class RollupSpec:
+    """A table of ``interval_ms`` bars built from ``source`` bars.
+
+    Bucket starts are ``floor((time + offset_ms) / interval_ms) * interval_ms
+    - offset_ms``.
+    """
+
+    name: str
+    table: str
+    interval_ms: int
+    offset_ms: int = UTC8_OFFSET_MS
+    source: str = "ohlcv_1h"
+    source_interval_ms: int = HOUR_MS
+
+    @property
+    def bars(self) -> int:
+        """Number of source bars in a complete bucket."""
+        return self.interval_ms // self.source_interval_ms
+
+    @property
+    def mark(self) -> str:
+        """Dataset name of the rollup's rows in ``ingestion_watermarks``."""
+        return f"rollup:{self.name}"
+
+    def bucket_start(self, ts: int) -> int:
+        off = self.offset_ms
+        return ((ts + off) // self.interval_ms) * self.interval_ms - off
+
+    def ddl(self) -> str:
+        return table_ddl(self.table, OHLCV_COLUMNS)
+
+
+ROLLUPS: dict[str, RollupSpec] = {
+    spec.name: spec
+    for spec in (
+        RollupSpec("ohlcv_4h", "ohlcv_4h", 4 * HOUR_MS),
+        RollupSpec("ohlcv_1d", "ohlcv_1d", DAY_MS),
+        RollupSpec("ohlcv_1w", "ohlcv_1w", 7 * DAY_MS, UTC8_OFFSET_MS + MONDAY_OFFSET_MS),
+    )
+}
+
+ROLLUP_SQL = """
+WITH sym AS (
+    -- ``covered``: start of the last closed bucket the hourly watermark has passed
+    SELECT s.symbol, w.last_ts AS mark,
+           ((LEAST(s.last_ts + %(source_interval)s, %(until)s) + %(offset)s) / %(interval)s)
+             * %(interval)s - %(offset)s - %(interval)s AS covered
+    FROM ingestion_watermarks s
+    LEFT JOIN ingestion_watermarks w
+      ON w.dataset = %(mark)s AND w.symbol = s.symbol
+    WHERE s.dataset = %(source)s
+      AND (w.last_ts IS NULL
+           OR s.last_ts >= w.last_ts + 2 * %(interval)s - %(source_interval)s)
+), src AS (
+    SELECT sym.symbol, o.time, o.open, o.high, o.low, o.close, o.volume_usd,
+           ((o.time + %(offset)s) / %(interval)s) * %(interval)s - %(offset)s AS bucket
+    FROM sym
+    CROSS JOIN LATERAL (
+        SELECT time, open, high, low, close, volume_usd FROM {source}
+        WHERE symbol = sym.symbol
+          AND time >= COALESCE(sym.mark + %(interval)s, 0)
+          AND time < %(until)s
+    ) o
+), bars AS (
+    SELECT symbol, bucket AS time,
+           (array_agg(open ORDER BY time))[1] AS open,
+           MAX(high) AS high,
+           MIN(low) AS low,
+           (array_agg(close ORDER BY time DESC))[1] AS close,
+           SUM(volume_usd) AS volume_usd
+    FROM src
+    GROUP BY symbol, bucket
+    HAVING COUNT(*) = %(bars)s
+), written AS (
+    INSERT INTO {table} (symbol, time, open, high, low, close, volume_usd)
+    SELECT symbol, time, open, high, low, close, volume_usd FROM bars
+    ON CONFLICT (symbol, time) DO UPDATE
+      SET open = EXCLUDED.open, high = EXCLUDED.high, low = EXCLUDED.low,
+          close = EXCLUDED.close, volume_usd = EXCLUDED.volume_usd
+    RETURNING symbol, time
+), newest AS (
+    SELECT symbol, MAX(time) AS last_ts FROM written GROUP BY symbol
+), marks AS (
+    INSERT INTO ingestion_watermarks(dataset, symbol, last_ts)
+    SELECT %(mark)s, sym.symbol, GREATEST(sym.covered, newest.last_ts)
+    FROM sym LEFT JOIN newest ON newest.symbol = sym.symbol
+    WHERE GREATEST(sym.covered, newest.last_ts) > COALESCE(sym.mark, -1)
+    ON CONFLICT(dataset, symbol)
+    DO UPDATE SET last_ts = GREATEST(ingestion_watermarks.last_ts, EXCLUDED.last_ts)
+    RETURNING 1
+)
+SELECT (SELECT COUNT(*) FROM written), (SELECT COUNT(*) FROM newest)
+"""
+
+
+def get_rollup(name: str) -> RollupSpec:
+    """Return the rollup called ``name`` or raise ``ValueError``."""
+    try:
+        return ROLLUPS[name]
+    except KeyError:
+        raise ValueError(f"Unknown rollup: {name}") from None
+
+
+def rollup(conn, spec: RollupSpec, *, rescan: bool = False, now_ms: int | None = None) -> int:
+    """Write every newly completed bar of ``spec`` and return how many.
+
+    ``rescan`` drops the rollup's watermarks first so the whole source history
+    is rolled up again (existing bars are overwritten).
+    """
+    if now_ms is None:
+        now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+    # The source bar starting at ``until`` is still open
+    until = (now_ms // spec.source_interval_ms) * spec.source_interval_ms
+    # 只有 rollup、还没采集过时从 1h 表建立水位
+    load_watermarks(conn, get_spec(spec.source))
+    with conn.cursor() as cur:
+        cur.execute(spec.ddl())
+        ensure_partitions(cur, spec.table)
+        if rescan:
+            cur.execute("DELETE FROM ingestion_watermarks WHERE dataset=%s", (spec.mark,))
+        cur.execute(
+            ROLLUP_SQL.format(source=spec.source, table=spec.table),
+            {
+                "mark": spec.mark,
+                "source": spec.source,
+                "source_interval": spec.source_interval_ms,
+                "offset": spec.offset_ms,
+                "interval": spec.interval_ms,
+                "bars": spec.bars,
+                "until": until,
+            },
+        )
+        written, symbols = cur.fetchone()
+    conn.commit()
+    print(f"{spec.name} 聚合写入 {written} 根K线，涉及 {symbols} 个symbol", flush=True)
+    return written
+
+
+def rewind_watermarks(conn, first_ts: dict[str, int], names=None) -> None:
+    """Make the next rollup run rebuild buckets from ``first_ts`` per symbol.
+
+    Used after hourly bars older than a rollup's watermark were backfilled.
+    """
+    specs = [get_rollup(n) for n in (names or ROLLUPS)]
+    with conn.cursor() as cur:
+        for spec in specs:
+            cur.executemany(
+                """
+                UPDATE ingestion_watermarks SET last_ts = LEAST(last_ts, %s)
+                WHERE dataset=%s AND symbol=%s
+                """,
+                [
+                    (spec.bucket_start(ts) - spec.interval_ms, spec.mark, sym)
+                    for sym, ts in first_ts.items()
+                ],
+            )
+    conn.commit()
+
+
+def run_rollups(conn, names=None, *, rescan: bool = False) -> dict[str, int]:
+    """Run the rollups in ``names`` (all by default), shortest interval first.
+
+    Running all of them also ranks the new hours into ``rank_1h``.
+    """
+    specs = sorted((get_rollup(n) for n in (names or ROLLUPS)), key=lambda s: s.interval_ms)
+    ensure_watermark_table(conn)
+    totals = {}
+    for spec in specs:
+        try:
+            totals[spec.name] = rollup(conn, spec, rescan=rescan)
+        except Exception as e:
+            conn.rollback()
+            print(f"{spec.name} 聚合失败: {e}", flush=True)
+    if not names:
+        try:
+            totals[RANK_TABLE] = update_ranks(conn, rescan=rescan)
+        except Exception as e:
+            conn.rollback()
+            print(f"{RANK_TABLE} 排名失败: {e}", flush=True)
+    return totals
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Roll ohlcv_1h up into longer intervals")
+    parser.add_argument(
+        "rollups",
+        nargs="*",
+        help=f"Rollups to run, any of: {', '.join(ROLLUPS)} (default: all)",
+    )
+    parser.add_argument(
+        "--rescan", action="store_true", help="Rebuild from the full hourly history"
+    )
+    args = parser.parse_args(argv)
+    try:
+        names = [get_rollup(name).name for name in args.rollups]
+    except ValueError as exc:
+        print(exc, flush=True)
+        sys.exit(2)
+
+    conn = psycopg2.connect(**DB_CFG)
+    try:
+        run_rollups(conn, names, rescan=args.rescan)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Dataset descriptions for the CoinGlass ingestion engine.
+
+Each :class:`DatasetSpec` names the API endpoint, bar interval, target table
+and the columns that are filled from one or more exchange "legs".  Adding a
+dataset is a matter of adding an entry to :data:`DATASETS`.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from config import CG_API_BASE, secret_get
+from ingestion.partitions import table_ddl
+
+API_BASE = CG_API_BASE
+
+# Candidate keys for the bar timestamp in CoinGlass responses
+TIME_FIELDS = ("time", "t", "timestamp")
+
+
+@dataclass(frozen=True)
+class Leg:
+    """One exchange request that fills ``columns`` of the target table.
+
+    ``fields`` lists, per column, the response keys to try in order.  When it
+    is omitted each column is read from the key of the same name.  A leg that
+    is not ``required`` may fail without failing the symbol; its columns are
+    then filled with ``fill``.
+    """
+
+    exchange: str
+    columns: tuple[str, ...]
+    fields: tuple[tuple[str, ...], ...] = ()
+    required: bool = True
+    fill: Decimal | None = None
+
+    def field_keys(self) -> tuple[tuple[str, ...], ...]:
+        return self.fields or tuple((c,) for c in self.columns)
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    """Endpoint, interval and storage layout of one ingested dataset."""
+
+    name: str
+    endpoint: str
+    interval: str
+    interval_ms: int
+    table: str
+    legs: tuple[Leg, ...]
+    limit: int = 2000
+    params: dict = field(default_factory=dict)
+
+    @property
+    def columns(self) -> tuple[str, ...]:
+        """All table columns in write order."""
+        cols = ["symbol", "time"]
+        for leg in self.legs:
+            cols.extend(leg.columns)
+        return tuple(cols)
+
+    @property
+    def url(self) -> str:
+        return f"{API_BASE}/{self.endpoint}"
+
+    def ddl(self) -> str:
+        return table_ddl(self.table, self.columns[2:])
+
+    def migrations(self, column_type: str = "NUMERIC") -> list[str]:
+        """Statements adding value columns missing from an older table."""
+        return [
+            f"ALTER TABLE {self.table} ADD COLUMN IF NOT EXISTS {c} {column_type}"
+            for c in self.columns
+            if c not in ("symbol", "time")
+        ]
+
+
+OHLCV_COLUMNS = ("open", "high", "low", "close", "volume_usd")
+OI_FIELDS = (("sumOpenInterest", "openInterest", "value"),)
+
+HOUR_MS = 3600 * 1000
+
+
+def oi_legs(exchanges: str) -> tuple[Leg, ...]:
+    """Open interest legs for a comma separated list of exchanges.
+
+    Each exchange fills the column of its lower-cased name.  The first one
+    defines the bar timestamps and is required; the others are filled with
+    ``0`` while they fail and repaired on their own afterwards.
+    """
+    legs = []
+    for i, exchange in enumerate(e.strip() for e in exchanges.split(",") if e.strip()):
+        column = exchange.lower()
+        if not column.isidentifier():
+            raise ValueError(f"Invalid exchange name: {exchange}")
+        legs.append(
+            Leg(
+                exchange,
+                (column,),
+                OI_FIELDS,
+                required=i == 0,
+                fill=None if i == 0 else Decimal("0"),
+            )
+        )
+    return tuple(legs)
+
+
+# Adding an exchange (e.g. "Binance,Bybit,OKX") adds a column to the OI table
+OI_EXCHANGES = secret_get("CG_OI_EXCHANGES", "Binance,Bybit")
+
+DATASETS: dict[str, DatasetSpec] = {
+    spec.name: spec
+    for spec in (
+        DatasetSpec(
+            name="ohlcv_15m",
+            endpoint="futures/price/history",
+            interval="15m",
+            interval_ms=15 * 60 * 1000,
+            table="ohlcv",
+            legs=(Leg("Binance", OHLCV_COLUMNS),),
+            limit=4500,
+        ),
+        DatasetSpec(
+            name="ohlcv_1h",
+            endpoint="futures/price/history",
+            interval="1h",
+            interval_ms=HOUR_MS,
+            table="ohlcv_1h",
+            legs=(Leg("Binance", OHLCV_COLUMNS),),
+        ),
+        DatasetSpec(
+            name="ohlcv_4h",
+            endpoint="futures/price/history",
+            interval="4h",
+            interval_ms=4 * HOUR_MS,
+            table="ohlcv_4h",
+            legs=(Leg("Binance", OHLCV_COLUMNS),),
+            limit=1500,
+        ),
+        DatasetSpec(
+            name="oi_1h",
+            endpoint="futures/open-interest/history",
+            interval="1h",
+            interval_ms=HOUR_MS,
+            table="oi_binance_bybit_1h",
+            legs=oi_legs(OI_EXCHANGES),
+            params={"unit": "usd"},
+        ),
+    )
+}
+
+
+def get_spec(name: str) -> DatasetSpec:
+    """Return the dataset called ``name`` or raise ``ValueError``."""
+    try:
+        return DATASETS[name]
+    except KeyError:
+        raise ValueError(f"Unknown dataset: {name}") from None
@@ -0,0 +1,299 @@
+"""Per-run performance metrics of the ingestion engine.
+
+:class:`RunTelemetry` collects, per dataset and symbol, the time spent in each
+stage of a page — waiting for the rate limiter, the HTTP request, decoding and
+parsing the response, and the COPY into Postgres — together with request,
+retry and failure counts and rows fetched vs. written.  At the end of a run
+:meth:`RunTelemetry.report` prints a summary that names the slowest stage,
+:meth:`RunTelemetry.persist` stores it in ``ingestion_run_metrics`` and
+``ingestion_symbol_metrics``, and :meth:`RunTelemetry.write_prometheus`
+writes a node-exporter textfile when ``CG_INGEST_PROM_FILE`` is set.
+
+Stage times are summed over all worker threads, so with several workers they
+exceed the wall-clock time; their proportions show the bottleneck.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+import numpy as np
+
+from config import secret_get
+from ingestion.writer import copy_insert
+
+# Busy-time stages in the order of a page's life
+STAGES = ("limiter_wait", "request", "parse", "write")
+QUANTILES = (0.5, 0.9, 0.99)
+
+TELEMETRY_DDL = """
+CREATE TABLE IF NOT EXISTS ingestion_run_metrics (
+    run_id TEXT NOT NULL,
+    dataset TEXT NOT NULL,
+    started TIMESTAMPTZ NOT NULL,
+    finished TIMESTAMPTZ NOT NULL,
+    symbols INT NOT NULL,
+    requests INT NOT NULL,
+    retries INT NOT NULL,
+    failures INT NOT NULL,
+    rows_fetched BIGINT NOT NULL,
+    rows_written BIGINT NOT NULL,
+    latency_p50 DOUBLE PRECISION,
+    latency_p90 DOUBLE PRECISION,
+    latency_p99 DOUBLE PRECISION,
+    latency_max DOUBLE PRECISION,
+    limiter_wait_s DOUBLE PRECISION NOT NULL,
+    request_s DOUBLE PRECISION NOT NULL,
+    parse_s DOUBLE PRECISION NOT NULL,
+    write_s DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY(run_id, dataset)
+);
+CREATE TABLE IF NOT EXISTS ingestion_symbol_metrics (
+    run_id TEXT NOT NULL,
+    dataset TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    requests INT NOT NULL,
+    retries INT NOT NULL,
+    failures INT NOT NULL,
+    rows_fetched BIGINT NOT NULL,
+    rows_written BIGINT NOT NULL,
+    latency_p50 DOUBLE PRECISION,
+    latency_max DOUBLE PRECISION,
+    limiter_wait_s DOUBLE PRECISION NOT NULL,
+    request_s DOUBLE PRECISION NOT NULL,
+    parse_s DOUBLE PRECISION NOT NULL,
+    write_s DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY(run_id, dataset, symbol)
+);
+"""
+
+SYMBOL_COLUMNS = (
+    "run_id", "dataset", "symbol", "requests", "retries", "failures",
+    "rows_fetched", "rows_written", "latency_p50", "latency_max",
+    "limiter_wait_s", "request_s", "parse_s", "write_s",
+)
+
+
+@dataclass
+class SymbolMetrics:
+    requests: int = 0
+    retries: int = 0
+    failures: int = 0
+    rows_fetched: int = 0
+    rows_written: int = 0
+    latencies: list[float] = field(default_factory=list)
+    seconds: dict[str, float] = field(default_factory=lambda: dict.fromkeys(STAGES, 0.0))
+
+
+def _quantiles(values: list[float]) -> list[float | None]:
+    if not values:
+        return [None] * len(QUANTILES)
+    return [float(q) for q in np.quantile(np.asarray(values), QUANTILES)]
+
+
+class RunTelemetry:
+    """Thread-safe collector of one run's metrics."""
+
+    def __init__(self, run_id: str | None = None):
+        self.run_id = run_id
+        self.started = datetime.now(timezone.utc)
+        self._clock = time.monotonic()
+        self._lock = threading.Lock()
+        self.symbols: dict[tuple[str, str], SymbolMetrics] = {}
+
+    def _metrics(self, dataset: str, symbol: str) -> SymbolMetrics:
+        m = self.symbols.get((dataset, symbol))
+        if m is None:
+            m = self.symbols[(dataset, symbol)] = SymbolMetrics()
+        return m
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def add_time(self, dataset: str, symbol: str, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._metrics(dataset, symbol).seconds[stage] += seconds
+
+    @contextmanager
+    def timed(self, dataset: str, symbol: str, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(dataset, symbol, stage, time.perf_counter() - started)
+
+    def request(self, dataset: str, symbol: str, seconds: float, *, ok: bool, retry: bool) -> None:
+        """Record one HTTP request; ``retry`` marks a repeated attempt."""
+        with self._lock:
+            m = self._metrics(dataset, symbol)
+            m.requests += 1
+            m.retries += retry
+            m.failures += not ok
+            m.latencies.append(seconds)
+            m.seconds["request"] += seconds
+
+    def rows(self, dataset: str, symbol: str, *, fetched: int = 0, written: int = 0) -> None:
+        with self._lock:
+            m = self._metrics(dataset, symbol)
+            m.rows_fetched += fetched
+            m.rows_written += written
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+
+    def datasets(self) -> dict[str, dict]:
+        """Aggregate the symbol metrics into one row per dataset."""
+        out: dict[str, dict] = {}
+        with self._lock:
+            items = list(self.symbols.items())
+        latencies: dict[str, list[float]] = {}
+        for (dataset, _), m in items:
+            row = out.setdefault(
+                dataset,
+                {
+                    "symbols": 0, "requests": 0, "retries": 0, "failures": 0,
+                    "rows_fetched": 0, "rows_written": 0,
+                    "seconds": dict.fromkeys(STAGES, 0.0),
+                },
+            )
+            row["symbols"] += 1
+            for key in ("requests", "retries", "failures", "rows_fetched", "rows_written"):
+                row[key] += getattr(m, key)
+            for stage, s in m.seconds.items():
+                row["seconds"][stage] += s
+            latencies.setdefault(dataset, []).extend(m.latencies)
+        for dataset, row in out.items():
+            lat = latencies[dataset]
+            row["latency"] = dict(zip(("p50", "p90", "p99"), _quantiles(lat)))
+            row["latency"]["max"] = max(lat) if lat else None
+        return out
+
+    def report(self) -> dict[str, dict]:
+        """Print the per-dataset summary and return it."""
+        wall = time.monotonic() - self._clock
+        summary = self.datasets()
+        for dataset, row in summary.items():
+            lat = row["latency"]
+            secs = row["seconds"]
+            busy = sum(secs.values()) or 1.0
+            stages = "  ".join(f"{s} {secs[s]:.1f}s ({secs[s] / busy:.0%})" for s in STAGES)
+            lat_str = (
+                "  ".join(f"{k} {v * 1000:.0f}ms" for k, v in lat.items())
+                if lat["max"] is not None
+                else "-"
+            )
+            print(
+                f"[telemetry] {dataset}: {row['symbols']} 个symbol，请求 {row['requests']} 次"
+                f"（重试 {row['retries']}，失败 {row['failures']}），"
+                f"获取 {row['rows_fetched']} 条，写入 {row['rows_written']} 条\n"
+                f"[telemetry]   延迟 {lat_str}\n"
+                f"[telemetry]   耗时 {stages}，瓶颈: {max(secs, key=secs.get)}",
+                flush=True,
+            )
+        if summary:
+            print(f"[telemetry] 运行耗时 {wall:.1f}s", flush=True)
+        return summary
+
+    def persist(self, conn) -> str:
+        """Store the run and symbol metrics; return the run id used."""
+        run_id = self.run_id or f"{self.started:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+        finished = datetime.now(timezone.utc)
+        summary = self.datasets()
+        with self._lock:
+            items = list(self.symbols.items())
+        with conn.cursor() as cur:
+            cur.execute(TELEMETRY_DDL)
+            for dataset, row in summary.items():
+                lat, secs = row["latency"], row["seconds"]
+                cur.execute(
+                    """
+                    INSERT INTO ingestion_run_metrics VALUES
+                    (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (run_id, dataset) DO NOTHING
+                    """,
+                    (
+                        run_id, dataset, self.started, finished, row["symbols"],
+                        row["requests"], row["retries"], row["failures"],
+                        row["rows_fetched"], row["rows_written"],
+                        lat["p50"], lat["p90"], lat["p99"], lat["max"],
+                        *(secs[s] for s in STAGES),
+                    ),
+                )
+        rows = []
+        for (dataset, symbol), m in items:
+            p50 = _quantiles(m.latencies)[0]
+            rows.append(
+                (
+                    run_id, dataset, symbol, m.requests, m.retries, m.failures,
+                    m.rows_fetched, m.rows_written, p50,
+                    max(m.latencies) if m.latencies else None,
+                    *(m.seconds[s] for s in STAGES),
+                )
+            )
+        copy_insert(conn, "ingestion_symbol_metrics", SYMBOL_COLUMNS, rows,
+                    key=("run_id", "dataset", "symbol"))
+        conn.commit()
+        return run_id
+
+    def write_prometheus(self, path: str) -> None:
+        """Write the run summary in the Prometheus textfile format."""
+        summary = self.datasets()
+        lines = [
+            "# HELP coinglass_ingest_requests_total Requests sent in the last run.",
+            "# TYPE coinglass_ingest_requests_total gauge",
+        ]
+        for dataset, row in summary.items():
+            lines.append(f'coinglass_ingest_requests_total{{dataset="{dataset}"}} {row["requests"]}')
+        for key, help_ in (
+            ("retries", "Retried requests in the last run."),
+            ("failures", "Failed requests in the last run."),
+            ("rows_fetched", "Rows received from the API in the last run."),
+            ("rows_written", "New rows written to Postgres in the last run."),
+        ):
+            lines += [f"# HELP coinglass_ingest_{key} {help_}", f"# TYPE coinglass_ingest_{key} gauge"]
+            for dataset, row in summary.items():
+                lines.append(f'coinglass_ingest_{key}{{dataset="{dataset}"}} {row[key]}')
+        lines += [
+            "# HELP coinglass_ingest_request_latency_seconds Request latency quantiles of the last run.",
+            "# TYPE coinglass_ingest_request_latency_seconds gauge",
+        ]
+        for dataset, row in summary.items():
+            for q, name in zip(QUANTILES, ("p50", "p90", "p99")):
+                value = row["latency"][name]
+                if value is not None:
+                    lines.append(
+                        f'coinglass_ingest_request_latency_seconds{{dataset="{dataset}",quantile="{q}"}} {value:.6f}'
+                    )
+        lines += [
+            "# HELP coinglass_ingest_stage_seconds Busy time per stage in the last run.",
+            "# TYPE coinglass_ingest_stage_seconds gauge",
+        ]
+        for dataset, row in summary.items():
+            for stage in STAGES:
+                lines.append(
+                    f'coinglass_ingest_stage_seconds{{dataset="{dataset}",stage="{stage}"}} '
+                    f'{row["seconds"][stage]:.6f}'
+                )
+        lines += [
+            "# HELP coinglass_ingest_last_run_timestamp_seconds End of the last run.",
+            "# TYPE coinglass_ingest_last_run_timestamp_seconds gauge",
+            f"coinglass_ingest_last_run_timestamp_seconds {time.time():.0f}",
+        ]
+        # Written atomically so node-exporter never reads half a file
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, path)
+
+
+def prometheus_path() -> str:
+    """Textfile path from ``CG_INGEST_PROM_FILE`` (empty: disabled)."""
+    return secret_get("CG_INGEST_PROM_FILE", "")
@@ -0,0 +1,98 @@
+"""Per-symbol ingestion watermarks.
+
+The newest stored bar of every symbol is kept in ``ingestion_watermarks`` and
+advanced in the same transaction that writes the bars.  A run therefore loads
+all watermarks of a dataset with one query instead of issuing a
+``SELECT MAX(time)`` per symbol.  The first time a dataset is seen the table is
+seeded from a single ``GROUP BY symbol`` scan of the data table.
+"""
+
+from __future__ import annotations
+
+from ingestion.specs import DatasetSpec
+
+WATERMARK_DDL = """
+CREATE TABLE IF NOT EXISTS ingestion_watermarks (
+    dataset TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    last_ts BIGINT NOT NULL,
+    PRIMARY KEY(dataset, symbol)
+);
+"""
+
+
+def ensure_watermark_table(conn) -> None:
+    with conn.cursor() as cur:
+        cur.execute(WATERMARK_DDL)
+    conn.commit()
+
+
+def seed_watermarks(conn, spec: DatasetSpec) -> None:
+    """Rebuild the watermarks of ``spec`` from its data table."""
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM ingestion_watermarks WHERE dataset=%s", (spec.name,))
+        cur.execute(
+            f"""
+            INSERT INTO ingestion_watermarks(dataset, symbol, last_ts)
+            SELECT %s, symbol, MAX(time) FROM {spec.table} GROUP BY symbol
+            """,
+            (spec.name,),
+        )
+    conn.commit()
+
+
+def load_watermarks(conn, spec: DatasetSpec, rescan: bool = False) -> dict[str, int]:
+    """Return ``{symbol: last_ts}`` for every symbol stored for ``spec``.
+
+    The table is seeded from the data table when it holds nothing for the
+    dataset yet, or when ``rescan`` is true.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT symbol, last_ts FROM ingestion_watermarks WHERE dataset=%s",
+            (spec.name,),
+        )
+        rows = cur.fetchall()
+    conn.commit()
+    if rows and not rescan:
+        return {sym: int(ts) for sym, ts in rows}
+
+    seed_watermarks(conn, spec)
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT symbol, last_ts FROM ingestion_watermarks WHERE dataset=%s",
+            (spec.name,),
+        )
+        rows = cur.fetchall()
+    conn.commit()
+    return {sym: int(ts) for sym, ts in rows}
+
+
+def advance_watermark(cur, spec: DatasetSpec, symbol: str, last_ts: int) -> None:
+    """Move the watermark of ``symbol`` forward to ``last_ts``.
+
+    Runs on the caller's cursor so it commits together with the bars.
+    """
+    cur.execute(
+        """
+        INSERT INTO ingestion_watermarks(dataset, symbol, last_ts)
+        VALUES(%s, %s, %s)
+        ON CONFLICT(dataset, symbol)
+        DO UPDATE SET last_ts = GREATEST(ingestion_watermarks.last_ts, EXCLUDED.last_ts)
+        """,
+        (spec.name, symbol, last_ts),
+    )
+
+
+def missing_window(spec: DatasetSpec, watermark: int | None, end_ts: int) -> tuple[int, int] | None:
+    """Return the ``(start_ts, end_ts)`` bars still missing, or ``None``.
+
+    ``start_ts`` is the first bar after the watermark.  A symbol without a
+    watermark has never been ingested, which is signalled by ``start_ts``
+    being ``0``.
+    """
+    if watermark is None:
+        return 0, end_ts
+    if watermark >= end_ts:
+        return None
+    return watermark + spec.interval_ms, end_ts
@@ -0,0 +1,167 @@
+"""Bulk writer shared by the CoinGlass ingestion scripts.
+
+A batch of rows is streamed into a temporary staging table with ``COPY`` and
+then merged into the target table with a single
+``INSERT ... SELECT ... ON CONFLICT DO NOTHING`` (or an ``UPDATE ... FROM``
+for column repairs).  Whatever the batch size this costs a fixed number of
+round trips instead of one ``execute`` per row.
+
+Batches can be given as row tuples or as a :class:`ColumnBatch`, whose COPY
+text is produced column by column from numpy arrays.
+"""
+
+from __future__ import annotations
+
+import io
+from dataclasses import dataclass
+from typing import Iterable, Sequence
+
+import numpy as np
+
+
+def _copy_value(val) -> str:
+    """Return ``val`` encoded for the ``COPY ... FROM STDIN`` text format."""
+    if val is None:
+        return r"\N"
+    text = str(val)
+    return (
+        text.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def copy_buffer(records: Iterable[Sequence]) -> io.StringIO:
+    """Serialise ``records`` into an in-memory COPY text stream."""
+    buf = io.StringIO()
+    for rec in records:
+        buf.write("\t".join(_copy_value(v) for v in rec))
+        buf.write("\n")
+    buf.seek(0)
+    return buf
+
+
+def _format_column(col: np.ndarray) -> list[str]:
+    if col.dtype == object:
+        return [_copy_value(v) for v in col]
+    text = col.astype(str)
+    missing = np.isnan(col)
+    if missing.any():
+        text[missing] = r"\N"
+    return text.tolist()
+
+
+@dataclass
+class ColumnBatch:
+    """Rows of one symbol stored as columns.
+
+    ``time`` is an ``int64`` array sorted ascending and ``values`` an
+    ``(n, k)`` array of the remaining columns in table order, either
+    ``float64`` (``NaN`` for NULL) or ``object`` holding ``Decimal``/``None``.
+    """
+
+    symbol: str
+    time: np.ndarray
+    values: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    @property
+    def last_ts(self) -> int:
+        return int(self.time[-1])
+
+    def rows(self) -> list[tuple]:
+        return [
+            (self.symbol, ts, *vals)
+            for ts, vals in zip(self.time.tolist(), self.values.tolist())
+        ]
+
+    def copy_buffer(self) -> io.StringIO:
+        """Serialise the batch into COPY text without per-row tuples."""
+        cols = [self.time.astype(str).tolist()]
+        cols.extend(_format_column(self.values[:, j]) for j in range(self.values.shape[1]))
+        prefix = _copy_value(self.symbol) + "\t"
+        buf = io.StringIO()
+        buf.write("".join(prefix + "\t".join(row) + "\n" for row in zip(*cols)))
+        buf.seek(0)
+        return buf
+
+
+def _records_buffer(records) -> io.StringIO:
+    if isinstance(records, ColumnBatch):
+        return records.copy_buffer()
+    return copy_buffer(records)
+
+
+def copy_insert(
+    conn,
+    table: str,
+    columns: Sequence[str],
+    records: Sequence[Sequence],
+    key: Sequence[str] = ("symbol", "time"),
+) -> int:
+    """Bulk insert ``records`` into ``table`` and return the number written.
+
+    ``records`` are tuples ordered like ``columns`` or a
+    :class:`ColumnBatch`.  Rows whose ``key``
+    already exists in ``table`` are skipped, as are duplicate keys inside the
+    batch itself, so the returned count matches what the old per-row
+    ``ON CONFLICT DO NOTHING`` loop reported.  The caller owns the
+    transaction and must commit.
+    """
+    if not len(records):
+        return 0
+
+    cols = ", ".join(columns)
+    keys = ", ".join(key)
+    stage = f"_stage_{table}"
+    with conn.cursor() as cur:
+        # The staging table lives for the whole session so pooled connections
+        # reuse it; rows are cleared after every merge.
+        cur.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {stage} "
+            f"(LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+        )
+        cur.copy_expert(f"COPY {stage} ({cols}) FROM STDIN", _records_buffer(records))
+        cur.execute(
+            f"INSERT INTO {table} ({cols}) "
+            f"SELECT DISTINCT ON ({keys}) {cols} FROM {stage} "
+            f"ON CONFLICT ({keys}) DO NOTHING"
+        )
+        written = cur.rowcount
+        cur.execute(f"TRUNCATE {stage}")
+    return max(written, 0)
+
+
+def copy_update(
+    conn,
+    table: str,
+    columns: Sequence[str],
+    records: Sequence[Sequence],
+    key: Sequence[str] = ("symbol", "time"),
+) -> int:
+    """Overwrite the non-key ``columns`` of existing rows from ``records``.
+
+    Used to repair columns that were stored with a placeholder, e.g. an
+    exchange leg that failed while the other legs were written.  Rows not yet
+    in ``table`` are ignored.  The caller owns the transaction.
+    """
+    if not len(records):
+        return 0
+
+    cols = ", ".join(columns)
+    stage = f"_stage_{table}"
+    assign = ", ".join(f"{c} = s.{c}" for c in columns if c not in key)
+    match = " AND ".join(f"t.{k} = s.{k}" for k in key)
+    with conn.cursor() as cur:
+        cur.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {stage} "
+            f"(LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+        )
+        cur.copy_expert(f"COPY {stage} ({cols}) FROM STDIN", _records_buffer(records))
+        cur.execute(f"UPDATE {table} t SET {assign} FROM {stage} s WHERE {match}")
+        updated = cur.rowcount
+        cur.execute(f"TRUNCATE {stage}")
+    return max(updated, 0)
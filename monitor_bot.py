@@ -3,19 +3,19 @@
 
 import time
 import pandas as pd
-import requests
 from sqlalchemy import text
 from datetime import datetime, timedelta
 import pytz
 import unicodedata
 
+import bar_cube
+import http_client
 from db import engine_ohlcv
-from strategies.strong_assets import compute_period_metrics
+from strategies.strong_assets import compute_universe_period_metrics
 from config import (
     TELEGRAM_BOT_TOKEN,
     TELEGRAM_CHAT_ID,
     TZ_NAME,
-    get_proxy_dict,
 )
 
 
@@ -34,7 +34,7 @@ def send_message(text_msg: str, chat_id: int | str | None = None, parse_mode: st
     if parse_mode:
         payload["parse_mode"] = parse_mode
     try:
-        requests.post(url, json=payload, timeout=10, proxies=get_proxy_dict())
+        http_client.post(url, json=payload, timeout=10)
     except Exception as exc:
         print("Failed to send telegram message:", exc)
 
@@ -72,23 +72,13 @@ def _latest_range(hours: int) -> tuple[int, int, str]:
 def strong_assets_command(chat_id: int, hours: int) -> None:
     start_ts, end_ts, label = _latest_range(hours)
     with engine_ohlcv.begin() as conn:
-        symbols = [r[0] for r in conn.execute(text("SELECT DISTINCT symbol FROM ohlcv_1h"))]
         label_map = {r[0]: r[1] for r in conn.execute(text("SELECT instrument_id, labels FROM instruments"))}
 
-    records = []
-    for sym in symbols:
-        try:
-            metrics = compute_period_metrics(sym, start_ts, end_ts)
-        except ValueError:
-            continue
-        metrics["symbol"] = sym
-        records.append(metrics)
-
-    if not records:
+    df = compute_universe_period_metrics(start_ts, end_ts)
+    if df.empty:
         send_message("无有效数据", chat_id)
         return
 
-    df = pd.DataFrame(records)
     df["标签"] = df["symbol"].map(lambda s: "，".join(label_map.get(s, [])) if label_map.get(s) else "")
     df["期间收益"] = (df["period_return"] * 100).map(lambda x: f"{x:.2f}%")
     df = df.sort_values("period_return", ascending=False).reset_index(drop=True)
@@ -109,11 +99,11 @@ def strong_assets_command(chat_id: int, hours: int) -> None:
 def fetch_updates(offset: int) -> list[dict]:
     url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/getUpdates"
     try:
-        resp = requests.get(
+        resp = http_client.get(
             url,
             params={"timeout": 10, "offset": offset},
             timeout=15,
-            proxies=get_proxy_dict(),
+            retries=0,
         )
         data = resp.json()
         if not data.get("ok"):
@@ -147,6 +137,7 @@ def handle_update(upd: dict) -> int:
 
 def main() -> None:
     send_message("monitor bot started")
+    bar_cube.enable()
     last_update = 0
     while True:
         updates = fetch_updates(last_update + 1)
@@ -1,6 +1,10 @@
+from dataclasses import dataclass
+
+import numpy as np
 import pandas as pd
 from sqlalchemy import text
 from config import TZ_NAME
+from ingestion.archive import archive_boundary, merge_archived, read_archive
 
 # CoinMarkets 表接口
 
@@ -41,6 +45,16 @@ def fetch_instruments(engine):
 
 # OHLCV 表接口
 
+OHLCV_TABLES = {"ohlcv_1h", "ohlcv_4h", "ohlcv_1d", "ohlcv_1w"}
+OHLCV_FIELDS = ("open", "high", "low", "close", "volume_usd")
+_HOUR_MS = 3600 * 1000
+OHLCV_INTERVAL_MS = {
+    "ohlcv_1h": _HOUR_MS,
+    "ohlcv_4h": 4 * _HOUR_MS,
+    "ohlcv_1d": 24 * _HOUR_MS,
+    "ohlcv_1w": 7 * 24 * _HOUR_MS,
+}
+
 def fetch_ohlcv(engine, symbol, start_ts, end_ts, table="ohlcv_1h"):
     """Fetch OHLCV records from the specified table.
 
@@ -55,27 +69,164 @@ def fetch_ohlcv(engine, symbol, start_ts, end_ts, table="ohlcv_1h"):
     end_ts : int
         End timestamp in milliseconds.
     table : str, optional
-        Table name to query, defaults to ``"ohlcv_1h"``.
+        Table name to query, defaults to ``"ohlcv_1h"``.  ``ohlcv_4h``,
+        ``ohlcv_1d`` and ``ohlcv_1w`` hold bars rolled up from it.
+
+    Bars moved to the Parquet archive (``ingestion.archive``) are merged in
+    when the range starts before the archive boundary.  Prices and volume are
+    ``float64`` on both sides of the boundary.
     """
 
-    if table not in {"ohlcv_1h", "ohlcv_4h"}:
+    if table not in OHLCV_TABLES:
         raise ValueError("Invalid OHLCV table name")
 
+    # 与归档的 Parquet 一样取 float64，跨越归档边界时各列仍是同一种类型
+    cols = ", ".join(f"{c}::double precision AS {c}" for c in OHLCV_FIELDS)
     sql = text(
-        f"SELECT * FROM {table} WHERE symbol=:symbol AND time BETWEEN :start AND :end ORDER BY time"
+        f"SELECT symbol, time, {cols} FROM {table} "
+        "WHERE symbol=:symbol AND time BETWEEN :start AND :end ORDER BY time"
     )
-    return pd.read_sql(
+    live = pd.read_sql(
         sql,
         engine,
         params={"symbol": symbol, "start": start_ts, "end": end_ts},
     )
+    if start_ts >= archive_boundary(table):
+        return live
+    archived = read_archive(table, symbol, start_ts, end_ts)
+    return merge_archived(live, archived)
+
+
+def fetch_ohlcv_range(conn, start_ts, end_ts, fields=OHLCV_FIELDS, table="ohlcv_1h") -> pd.DataFrame:
+    """Bars of every symbol in ``[start_ts, end_ts]`` as ``symbol, time, *fields`` rows.
+
+    ``conn`` may be an engine or a pooled psycopg2 connection
+    (``db.connection("ohlcv")``).  Values are ``float64`` and archived bars are
+    merged in like :func:`fetch_ohlcv`.
+    """
+
+    if table not in OHLCV_TABLES:
+        raise ValueError("Invalid OHLCV table name")
+    if any(f not in OHLCV_FIELDS for f in fields):
+        raise ValueError("Invalid OHLCV field")
+
+    cols = ", ".join(f"{c}::double precision AS {c}" for c in fields)
+    sql = f"SELECT symbol, time, {cols} FROM {table} WHERE time BETWEEN %(start)s AND %(end)s"
+    live = pd.read_sql(sql, conn, params={"start": start_ts, "end": end_ts})
+    if start_ts >= archive_boundary(table):
+        return live
+    archived = read_archive(table, None, start_ts, end_ts)
+    if not archived.empty:
+        archived = archived[["symbol", "time", *fields]]
+    return merge_archived(live, archived)
 
 
 def fetch_distinct_ohlcv_symbols(engine, table="ohlcv_1h") -> list[str]:
     """Return all distinct symbols from the specified OHLCV table."""
 
-    if table not in {"ohlcv_1h", "ohlcv_4h"}:
+    if table not in OHLCV_TABLES:
         raise ValueError("Invalid OHLCV table name")
 
     df = pd.read_sql(f"SELECT DISTINCT symbol FROM {table}", engine)
     return df["symbol"].tolist()
+
+
+@dataclass
+class OHLCVMatrix:
+    """Bars of many symbols aligned on one time grid.
+
+    Every field array has shape ``(len(times), len(symbols))``; missing bars
+    are ``NaN`` and ``False`` in ``mask``.
+    """
+
+    symbols: list[str]
+    times: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume_usd: np.ndarray
+    mask: np.ndarray
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        if field not in OHLCV_FIELDS:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def column(self, symbol: str) -> int:
+        """Column index of ``symbol``."""
+        return self.symbols.index(symbol)
+
+    def to_frame(self, field: str = "close") -> pd.DataFrame:
+        """``field`` as a DataFrame indexed by local time, one column per symbol."""
+        index = pd.to_datetime(self.times, unit="ms", utc=True).tz_convert(TZ_NAME)
+        return pd.DataFrame(self[field], index=index, columns=self.symbols)
+
+
+def fetch_ohlcv_matrix(engine, symbols, start_ts, end_ts, table="ohlcv_1h") -> OHLCVMatrix:
+    """Fetch the bars of ``symbols`` in ``[start_ts, end_ts]`` in one query.
+
+    Parameters
+    ----------
+    engine : sqlalchemy.engine.Engine
+        Database engine to execute the query against.
+    symbols : list[str] or None
+        Symbols to fetch; ``None`` fetches every symbol in the table.  The
+        matrix columns follow this order (sorted when ``None``).
+    start_ts, end_ts : int
+        Time range in milliseconds, inclusive.
+    table : str, optional
+        One of :data:`OHLCV_TABLES`, defaults to ``"ohlcv_1h"``.
+
+    The time axis is the regular grid of the table's interval covering the
+    range (aligned on the stored bars), so a bar missing for every symbol is
+    still a row.  Archived bars are merged in like :func:`fetch_ohlcv`.
+    """
+
+    if table not in OHLCV_TABLES:
+        raise ValueError("Invalid OHLCV table name")
+
+    cols = ", ".join(f"{c}::double precision AS {c}" for c in OHLCV_FIELDS)
+    where = "time BETWEEN :start AND :end"
+    params = {"start": start_ts, "end": end_ts}
+    if symbols is not None:
+        symbols = list(symbols)
+        if not symbols:
+            empty = np.empty((0, 0))
+            return OHLCVMatrix([], np.empty(0, dtype=np.int64), *([empty] * 5), mask=empty.astype(bool))
+        where += " AND symbol = ANY(:symbols)"
+        params["symbols"] = symbols
+    df = pd.read_sql(text(f"SELECT symbol, time, {cols} FROM {table} WHERE {where}"), engine, params=params)
+    if start_ts < archive_boundary(table):
+        archived = read_archive(table, None, start_ts, end_ts)
+        if not archived.empty and symbols is not None:
+            archived = archived[archived["symbol"].isin(symbols)]
+        df = merge_archived(df, archived)
+    if symbols is None:
+        symbols = sorted(df["symbol"].unique())
+
+    step = OHLCV_INTERVAL_MS[table]
+    if df.empty:
+        times = np.empty(0, dtype=np.int64)
+    else:
+        first = int(df["time"].min())
+        first -= (first - start_ts) // step * step
+        times = np.arange(first, end_ts + 1, step, dtype=np.int64)
+
+    shape = (len(times), len(symbols))
+    mask = np.zeros(shape, dtype=bool)
+    fields = {f: np.full(shape, np.nan) for f in OHLCV_FIELDS}
+    if len(times):
+        order = np.argsort(symbols)
+        sorted_syms = np.asarray(symbols, dtype=object)[order]
+        sym = df["symbol"].to_numpy(dtype=object)
+        pos = np.searchsorted(sorted_syms, sym).clip(max=len(symbols) - 1)
+        keep = sorted_syms[pos] == sym
+        ts = df["time"].to_numpy(dtype=np.int64)
+        row = (ts - times[0]) // step
+        keep &= ((ts - times[0]) % step == 0) & (row >= 0) & (row < len(times))
+        row, col = row[keep], order[pos[keep]]
+        mask[row, col] = True
+        for f in OHLCV_FIELDS:
+            fields[f][row, col] = df[f].to_numpy(dtype=np.float64)[keep]
+    return OHLCVMatrix(list(symbols), times, mask=mask, **fields)
@@ -2,7 +2,91 @@
 import pandas as pd
 import numpy as np
 import pytz
+from sqlalchemy import text
 from db import engine_ohlcv
+from ingestion.archive import archive_boundary, merge_archived, read_archive
+
+
+def _window_bounds(t, bars: int) -> tuple[int, int]:
+    """t 前后各 bars 根 15 分钟 K 线的窗口，返回 Unix 毫秒 (start_ts, end_ts)。"""
+    tz = pytz.timezone("Asia/Shanghai")
+    if t.tzinfo is None:
+        t = tz.localize(t)
+    window = pd.Timedelta(minutes=15 * bars)
+    return int((t - window).timestamp() * 1000), int((t + window).timestamp() * 1000)
+
+
+def window_lows(windows: list[tuple[int, int]]) -> list[pd.DataFrame]:
+    """
+    一次查询取出所有窗口内 instruments 中交易对的 low，并按窗口分组求最低价。
+
+    返回与 windows 一一对应的 DataFrame，索引为 symbol，列为 time, low；
+    最低价出现多次时取最早的一根。
+    """
+    instruments = pd.read_sql("SELECT instrument_id AS symbol FROM instruments", engine_ohlcv)
+    symbols = instruments["symbol"].tolist()
+    starts = [s for s, _ in windows]
+    ends = [e for _, e in windows]
+    lo, hi = min(starts), max(ends)
+    # 只取落在某个窗口内的行，扫描多组日期时不会把窗口之间的数据也读出来
+    sql = text(
+        "SELECT o.symbol, o.time, o.low::double precision AS low FROM ohlcv_1h o "
+        "WHERE o.symbol = ANY(:symbols) AND o.time BETWEEN :lo AND :hi "
+        "AND EXISTS (SELECT 1 FROM unnest(CAST(:starts AS bigint[]), CAST(:ends AS bigint[])) AS w(s, e) "
+        "WHERE o.time BETWEEN w.s AND w.e)"
+    )
+    df = pd.read_sql(
+        sql,
+        engine_ohlcv,
+        params={"symbols": symbols, "lo": lo, "hi": hi, "starts": starts, "ends": ends},
+    )
+    if lo < archive_boundary("ohlcv_1h"):
+        archived = read_archive("ohlcv_1h", None, lo, hi)
+        if not archived.empty:
+            archived = archived.loc[archived["symbol"].isin(symbols), ["symbol", "time", "low"]]
+        df = merge_archived(df, archived)
+    df = df.dropna(subset=["low"]).sort_values(["symbol", "time"], ignore_index=True)
+
+    times = df["time"].to_numpy()
+    lows = []
+    for start_ts, end_ts in windows:
+        w = df[(times >= start_ts) & (times <= end_ts)]
+        idx = w.groupby("symbol", sort=True)["low"].idxmin()
+        lows.append(w.loc[idx.to_numpy()].set_index("symbol")[["time", "low"]])
+    return lows
+
+
+def _lift_frame(l1: pd.DataFrame, l2: pd.DataFrame, factor: float) -> pd.DataFrame:
+    both = l1.join(l2, how="inner", lsuffix="1", rsuffix="2")
+    if both.empty:
+        return pd.DataFrame()
+    # 计算对数收益斜率：ln(L2_low / L1_low) * factor，L1_low 非正时为空
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = (np.log(both["low2"] / both["low1"]) * factor).where(both["low1"] > 0)
+    return pd.DataFrame({
+        "L1_time": pd.to_datetime(both["time1"], unit="ms", utc=True).dt.tz_convert("Asia/Shanghai"),
+        "L1_low": both["low1"],
+        "L2_time": pd.to_datetime(both["time2"], unit="ms", utc=True).dt.tz_convert("Asia/Shanghai"),
+        "L2_low": both["low2"],
+        "slope": slope,
+    })
+
+
+def analyze_bottom_lift_grid(pairs, bars: int = 4, factor: float = 100.0) -> list[pd.DataFrame]:
+    """
+    对多组 (t1, t2) 同时做底部抬升分析，所有窗口共用一次查询。
+
+    返回与 pairs 一一对应的 DataFrame，每个与 analyze_bottom_lift(t1, t2)
+    的结果相同，适合扫描一组日期组合。
+    """
+    pairs = list(pairs)
+    if not pairs:
+        return []
+    windows = []
+    for t1, t2 in pairs:
+        windows += [_window_bounds(t1, bars), _window_bounds(t2, bars)]
+    lows = window_lows(windows)
+    return [_lift_frame(lows[2 * i], lows[2 * i + 1], factor) for i in range(len(pairs))]
 
 
 def analyze_bottom_lift(t1, t2, bars: int = 4, factor: float = 100.0) -> pd.DataFrame:
@@ -22,80 +106,4 @@ def analyze_bottom_lift(t1, t2, bars: int = 4, factor: float = 100.0) -> pd.Data
       其中 L1_time、L2_time 已转换为 Asia/Shanghai 时区的 datetime，
       slope 表示对数收益 ln(L2_low / L1_low) * factor
     """
-    # 本地化时区
-    tz = pytz.timezone("Asia/Shanghai")
-    if t1.tzinfo is None:
-        t1 = tz.localize(t1)
-    if t2.tzinfo is None:
-        t2 = tz.localize(t2)
-
-    # 时间窗口偏移
-    window = pd.Timedelta(minutes=15 * bars)
-    t1_start, t1_end = t1 - window, t1 + window
-    t2_start, t2_end = t2 - window, t2 + window
-
-    # 转为 Unix 毫秒时间戳
-    t1_start_ts = int(t1_start.timestamp() * 1000)
-    t1_end_ts = int(t1_end.timestamp() * 1000)
-    t2_start_ts = int(t2_start.timestamp() * 1000)
-    t2_end_ts = int(t2_end.timestamp() * 1000)
-
-    # 获取所有交易符号
-    instruments_sql = "SELECT instrument_id AS symbol FROM instruments"
-    instruments = pd.read_sql(instruments_sql, engine_ohlcv)
-    symbols = instruments['symbol'].tolist()
-
-    records = []
-    # 统一 SQL 模板，使用时间戳比较
-    sql = (
-        "SELECT time, low FROM ohlcv_1h "
-        "WHERE symbol = %(sym)s AND time BETWEEN %(start_ts)s AND %(end_ts)s"
-    )
-
-    for sym in symbols:
-        # 查询 t1 窗口
-        df1 = pd.read_sql(sql, engine_ohlcv, params={
-            'sym': sym,
-            'start_ts': t1_start_ts,
-            'end_ts': t1_end_ts
-        })
-        if df1.empty:
-            continue
-        l1 = df1.loc[df1['low'].idxmin()]
-        # 转换 L1_time 为 Asia/Shanghai 时区 datetime
-        L1_time = pd.to_datetime(l1['time'], unit='ms', utc=True).tz_convert('Asia/Shanghai')
-        L1_low = l1['low']
-
-        # 查询 t2 窗口
-        df2 = pd.read_sql(sql, engine_ohlcv, params={
-            'sym': sym,
-            'start_ts': t2_start_ts,
-            'end_ts': t2_end_ts
-        })
-        if df2.empty:
-            continue
-        l2 = df2.loc[df2['low'].idxmin()]
-        # 转换 L2_time 为 Asia/Shanghai 时区 datetime
-        L2_time = pd.to_datetime(l2['time'], unit='ms', utc=True).tz_convert('Asia/Shanghai')
-        L2_low = l2['low']
-
-        # 计算对数收益斜率：ln(L2_low / L1_low) * factor
-        if L1_low > 0:
-            slope = np.log(L2_low / L1_low) * factor
-        else:
-            slope = None
-
-        records.append({
-            'symbol': sym,
-            'L1_time': L1_time,
-            'L1_low': L1_low,
-            'L2_time': L2_time,
-            'L2_low': L2_low,
-            'slope': slope
-        })
-
-    result = pd.DataFrame(records)
-    if not result.empty:
-        result.set_index('symbol', inplace=True)
-    return result
-
+    return analyze_bottom_lift_grid([(t1, t2)], bars=bars, factor=factor)[0]
@@ -0,0 +1,146 @@
+"""Hourly change rankings aggregated over a window.
+
+``rank_1h`` (filled by ``ingestion.ranks`` during ingestion) holds every
+symbol's hourly change and rank.  :func:`fetch_rank_stats` aggregates a
+window of it with one grouped query; :func:`hourly_rank` and
+:func:`aggregate_stats` compute the same table in memory from raw bars when
+``rank_1h`` is behind:
+
+* ``times`` - hours ranked within the top ``top_n``,
+* ``avg_percentile`` - mean hourly percentile among all symbols of the
+  window; a symbol without a bar in an hour sits below every symbol that has
+  one (ordered by symbol),
+* ``median_rank`` - median hourly rank, a missing hour counting as one worse
+  than that hour's worst rank.
+"""
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from db import engine_ohlcv
+
+STATS_COLUMNS = ["symbol", "times", "avg_percentile", "median_rank"]
+RANK_COLUMNS = ["time", "symbol", "pct", "rank"]
+
+RANK_STATS_SQL = text("""
+WITH r AS (
+    SELECT time, symbol, pct, rank FROM rank_1h
+    WHERE time BETWEEN :start AND :end
+), hours AS (
+    SELECT time, MAX(rank) AS max_rank FROM r GROUP BY time
+), symbols AS (
+    SELECT DISTINCT symbol FROM r
+), universe AS (
+    SELECT COUNT(*) AS n FROM symbols
+), grid AS (
+    SELECT s.symbol, r.rank,
+           COALESCE(r.rank, h.max_rank + 1) AS filled_rank,
+           ROW_NUMBER() OVER (
+               PARTITION BY h.time ORDER BY r.pct DESC NULLS LAST, s.symbol COLLATE "C"
+           ) AS pos
+    FROM hours h
+    CROSS JOIN symbols s
+    LEFT JOIN r ON r.time = h.time AND r.symbol = s.symbol
+)
+SELECT g.symbol,
+       COUNT(*) FILTER (WHERE g.rank <= :top_n) AS times,
+       AVG((u.n - g.pos)::double precision / NULLIF(u.n - 1, 0)) AS avg_percentile,
+       percentile_cont(0.5) WITHIN GROUP (ORDER BY g.filled_rank) AS median_rank
+FROM grid g CROSS JOIN universe u
+GROUP BY g.symbol
+""")
+
+RANK_MARK_SQL = text(
+    "SELECT last_ts FROM ingestion_watermarks WHERE dataset = 'rank_1h' AND symbol = '*'"
+)
+
+
+def fetch_rank_stats(start_ts: int, end_ts: int, top_n: int = 40) -> pd.DataFrame | None:
+    """
+    从 rank_1h 一次分组查询得到 [start_ts, end_ts] 的排名统计。
+    rank_1h 尚未排到 end_ts（或表不存在）时返回 None，由调用方现场计算。
+    """
+    try:
+        with engine_ohlcv.connect() as conn:
+            mark = conn.execute(RANK_MARK_SQL).scalar()
+            if mark is None or mark < end_ts:
+                return None
+            df = pd.read_sql(
+                RANK_STATS_SQL, conn, params={"start": start_ts, "end": end_ts, "top_n": top_n}
+            )
+    except SQLAlchemyError:
+        return None
+    if df.empty:
+        return pd.DataFrame(columns=STATS_COLUMNS)
+    df["times"] = df["times"].astype(int)
+    # 与 aggregate_stats 相同的排序，并列时按 symbol
+    df = df.sort_values("symbol").sort_values(["times", "avg_percentile"], ascending=[False, False])
+    return df[STATS_COLUMNS].reset_index(drop=True)
+
+
+def hourly_rank(df: pd.DataFrame) -> pd.DataFrame:
+    """Return records of hourly ranking for **all** symbols."""
+    if df.empty:
+        return pd.DataFrame(columns=RANK_COLUMNS)
+
+    df["pct"] = (df["close"] - df["open"]) / df["open"] * 100
+    df["rank"] = (
+        df.groupby("time")["pct"].rank(ascending=False, method="min").astype(int)
+    )
+    df = df.sort_values(["time", "rank"])
+    return df[RANK_COLUMNS]
+
+
+def aggregate_stats(ranks: pd.DataFrame, top_n: int = 40) -> pd.DataFrame:
+    """Aggregate :func:`hourly_rank` records into one row per symbol.
+
+    Works on a dense ``(hours, symbols)`` matrix without a per-hour loop:
+
+    * the hourly percentile orders each row by ``pct`` descending with one
+      stable ``argsort`` (missing symbols last, ties in symbol order, i.e.
+      pandas ``rank(method="first", na_option="bottom")``) and scores
+      position ``r`` of ``N`` symbols as ``(N - r) / (N - 1)``;
+    * missing hours count as one rank worse than that hour's worst rank for
+      the median;
+    * ``times`` counts the hours ranked within the top ``top_n``.
+    """
+    if ranks.empty:
+        return pd.DataFrame(columns=STATS_COLUMNS)
+    t_idx, hours = pd.factorize(ranks["time"], sort=True)
+    s_idx, symbols = pd.factorize(ranks["symbol"], sort=True)
+    shape = (len(hours), len(symbols))
+    present = np.zeros(shape, dtype=bool)
+    present[t_idx, s_idx] = True
+    if np.count_nonzero(present) != len(ranks):
+        raise ValueError("ranks contains duplicate (time, symbol) entries")
+    rank = np.full(shape, np.nan)
+    rank[t_idx, s_idx] = ranks["rank"].to_numpy(dtype=float)
+    pct = np.full(shape, np.nan)
+    pct[t_idx, s_idx] = ranks["pct"].to_numpy(dtype=float)
+
+    times = (rank <= top_n).sum(axis=0)
+
+    worst = np.nanmax(rank, axis=1, keepdims=True)
+    median_rank = np.median(np.where(present, rank, worst + 1), axis=0)
+
+    # NaN sorts last, a stable sort keeps ties in symbol order
+    n = shape[1]
+    order = np.argsort(-pct, axis=1, kind="stable")
+    position = np.empty(shape)
+    np.put_along_axis(position, order, np.broadcast_to(np.arange(1.0, n + 1), shape), axis=1)
+    # 位置之和是精确的整数，只做一次除法，得分相同的交易对不受求和顺序影响
+    h = shape[0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avg_percentile = (n * h - position.sum(axis=0)) / ((n - 1) * h)
+
+    stats = pd.DataFrame(
+        {
+            "symbol": symbols,
+            "times": times.astype(int),
+            "avg_percentile": avg_percentile,
+            "median_rank": median_rank,
+        }
+    )
+    stats = stats.sort_values(["times", "avg_percentile"], ascending=[False, False])
+    return stats.reset_index(drop=True)
@@ -0,0 +1,131 @@
+"""Benchmark :func:`strategies.rankings.aggregate_stats` against the old loop.
+
+Builds synthetic hourly bars for a universe of symbols (some listed late, some
+with missing hours), ranks them with :func:`~strategies.rankings.hourly_rank`
+and times the per-hour pandas loop the ranking pages used to run against the
+vectorised :func:`~strategies.rankings.aggregate_stats`, checking that both
+return the same table::
+
+    python -m strategies.rankings_bench
+    python -m strategies.rankings_bench --symbols 800 --hours 24 168 720 --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from strategies.rankings import STATS_COLUMNS, aggregate_stats, hourly_rank
+
+HOUR_MS = 3600 * 1000
+
+
+def legacy_aggregate_stats(ranks: pd.DataFrame, top_n: int = 40) -> pd.DataFrame:
+    """The per-hour ranking loop previously copied into four modules."""
+    if ranks.empty:
+        return pd.DataFrame(columns=STATS_COLUMNS)
+
+    pivot_rank = ranks.pivot(index="symbol", columns="time", values="rank")
+    pivot_pct = ranks.pivot(index="time", columns="symbol", values="pct")
+
+    times = (pivot_rank <= top_n).sum(axis=1)
+
+    max_rank_by_time = ranks.groupby("time")["rank"].max()
+    pivot_rank = pivot_rank.apply(lambda col: col.fillna(max_rank_by_time[col.name] + 1))
+    median_rank = pivot_rank.median(axis=1)
+
+    df_percentile = pd.DataFrame(index=pivot_pct.index, columns=pivot_pct.columns, dtype=float)
+    N = pivot_pct.shape[1]
+    for h in pivot_pct.index:
+        ranks_series = pivot_pct.loc[h].rank(ascending=False, method="first", na_option="bottom")
+        df_percentile.loc[h] = (N - ranks_series) / (N - 1)
+
+    avg_percentile = df_percentile.mean(axis=0)
+
+    stats = pd.DataFrame(
+        {
+            "symbol": avg_percentile.index,
+            "times": times.reindex(avg_percentile.index).fillna(0).astype(int),
+            "avg_percentile": avg_percentile,
+            "median_rank": median_rank.reindex(avg_percentile.index),
+        }
+    )
+    stats = stats.sort_values(["times", "avg_percentile"], ascending=[False, False])
+    return stats.reset_index(drop=True)
+
+
+def synthetic_bars(symbols: int, hours: int, seed: int = 0) -> pd.DataFrame:
+    """Hourly open/close bars shaped like ``fetch_range`` output."""
+    rng = np.random.default_rng(seed)
+    times = np.arange(hours, dtype=np.int64) * HOUR_MS
+    names = np.array([f"S{i:04d}" for i in range(symbols)])
+    t, s = np.meshgrid(times, np.arange(symbols), indexing="ij")
+    # 约 5% 的交易对中途上线，另有零星缺失的小时
+    listed = rng.integers(0, hours, symbols) * (rng.random(symbols) < 0.05)
+    keep = (t >= listed[s] * HOUR_MS) & (rng.random(t.shape) > 0.01)
+    opens = rng.uniform(0.5, 100.0, t.shape)
+    # 四舍五入制造并列涨幅
+    closes = opens * (1 + np.round(rng.normal(0, 0.01, t.shape), 4))
+    return pd.DataFrame(
+        {
+            "symbol": names[s[keep]],
+            "time": t[keep],
+            "open": opens[keep],
+            "close": closes[keep],
+        }
+    )
+
+
+def _best_of(fn, ranks: pd.DataFrame, repeat: int) -> tuple[float, pd.DataFrame]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(ranks)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def _check(got: pd.DataFrame, expected: pd.DataFrame) -> None:
+    """Same values per symbol and the same order up to float noise in ties.
+
+    The loop averages hourly percentiles in pandas' summation order, so two
+    symbols with equal scores can differ in the last bit there and swap places.
+    """
+    pd.testing.assert_frame_equal(
+        got.set_index("symbol").sort_index(),
+        expected.set_index("symbol").sort_index(),
+        check_dtype=False,
+    )
+    keys = ["times", "avg_percentile"]
+    pd.testing.assert_frame_equal(got[keys], expected[keys], check_dtype=False)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark ranking aggregation")
+    parser.add_argument("--symbols", type=int, default=500, help="Universe size")
+    parser.add_argument(
+        "--hours", type=int, nargs="+", default=[24, 168, 720], help="Window lengths to time"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case (best is kept)")
+    parser.add_argument("--top-n", type=int, default=40, help="Top-N threshold for times")
+    args = parser.parse_args(argv)
+
+    print(f"{'hours':>6} {'symbols':>8} {'loop s':>9} {'vector s':>9} {'speedup':>8}")
+    for hours in args.hours:
+        ranks = hourly_rank(synthetic_bars(args.symbols, hours))
+        loop_s, expected = _best_of(
+            lambda r: legacy_aggregate_stats(r, args.top_n), ranks, args.repeat
+        )
+        vec_s, got = _best_of(lambda r: aggregate_stats(r, args.top_n), ranks, args.repeat)
+        _check(got, expected)
+        print(
+            f"{hours:>6} {args.symbols:>8} {loop_s:>9.3f} {vec_s:>9.4f} {loop_s / vec_s:>7.0f}x",
+            flush=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,20 @@
+import numpy as np
 import pandas as pd
-from sqlalchemy import text
 from db import engine_ohlcv      # 使用项目中的 db 连接引擎
 from config import TZ_NAME
+from queries import OHLCVMatrix, fetch_ohlcv
+from bar_cube import load_matrix
+
+METRIC_COLUMNS = [
+    "first_close",
+    "last_close",
+    "period_return",
+    "max_close",
+    "max_close_dt",
+    "min_close",
+    "min_close_dt",
+    "drawdown",
+]
 
 def compute_period_metrics(symbol: str,
                            start_ts: int,
@@ -12,19 +25,8 @@ def compute_period_metrics(symbol: str,
       2) 区间内最高 close 及其北京时间；最低 close 及其北京时间
       3) 回调比例 = (最高 close 后的最低 close - 最高 close) / 最高 close
     """
-    # 1. 拉取 close 数据
-    with engine_ohlcv.connect() as conn:
-        df = pd.read_sql(text("""
-            SELECT time, close
-            FROM ohlcv_1h
-            WHERE symbol = :symbol
-              AND time BETWEEN :start AND :end
-            ORDER BY time
-        """), conn, params={
-            "symbol": symbol,
-            "start":  start_ts,
-            "end":    end_ts,
-        })
+    # 1. 拉取 close 数据（含已归档的 K 线）
+    df = fetch_ohlcv(engine_ohlcv, symbol, start_ts, end_ts)[["time", "close"]]
 
     if df.empty:
         raise ValueError(f"{symbol} 在指定区间无数据")
@@ -69,3 +71,65 @@ def compute_period_metrics(symbol: str,
         "min_close_dt": trough_dt,
         "drawdown": drawdown,
     }
+
+
+def period_metrics_frame(matrix: OHLCVMatrix) -> pd.DataFrame:
+    """
+    对 OHLCVMatrix 中每个交易对按列计算 compute_period_metrics 的同一组指标，
+    结果逐一相同：首尾 close 取区间内第一根/最后一根 K 线，峰值取第一次出现的
+    最高 close，回调低点取峰值之后第一次出现的最低 close。
+    返回 METRIC_COLUMNS + symbol 列，区间内无数据的交易对不出现。
+    """
+    close, mask = matrix.close, matrix.mask
+    valid = mask & ~np.isnan(close)
+    keep = valid.any(axis=0)
+    if not keep.any():
+        return pd.DataFrame(columns=[*METRIC_COLUMNS, "symbol"])
+    close, mask, valid = close[:, keep], mask[:, keep], valid[:, keep]
+    cols = np.arange(close.shape[1])
+    rows = np.arange(close.shape[0])[:, None]
+
+    # 首尾收盘价取存在的第一根/最后一根 K 线
+    first_row = mask.argmax(axis=0)
+    last_row = len(mask) - 1 - mask[::-1].argmax(axis=0)
+    first_close = close[first_row, cols]
+    last_close = close[last_row, cols]
+
+    # argmax/argmin 与 idxmax/idxmin 一样返回第一次出现的位置
+    peak_row = np.where(valid, close, -np.inf).argmax(axis=0)
+    after = valid & (rows > peak_row)
+    trough_row = np.where(after, close, np.inf).argmin(axis=0)
+    trough_row = np.where(after.any(axis=0), trough_row, peak_row)
+    peak_close = close[peak_row, cols]
+    trough_close = close[trough_row, cols]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        period_return = last_close / first_close - 1
+        drawdown = np.where(peak_close != 0, (peak_close - trough_close) / peak_close, 0.0)
+
+    def local_time(idx):
+        return pd.to_datetime(matrix.times[idx], unit="ms", utc=True).tz_convert(TZ_NAME)
+
+    return pd.DataFrame({
+        "first_close": first_close,
+        "last_close": last_close,
+        "period_return": period_return,
+        "max_close": peak_close,
+        "max_close_dt": local_time(peak_row),
+        "min_close": trough_close,
+        "min_close_dt": local_time(trough_row),
+        "drawdown": drawdown,
+        "symbol": np.asarray(matrix.symbols, dtype=object)[keep],
+    })
+
+
+def compute_universe_period_metrics(start_ts: int,
+                                    end_ts: int,
+                                    symbols: list[str] | None = None) -> pd.DataFrame:
+    """
+    一次查询计算所有交易对（或 symbols 中的交易对）在 [start_ts, end_ts] 区间内的
+    compute_period_metrics 指标，替代逐个 symbol 查询的循环。
+    区间落在内存 K 线立方体（bar_cube）内时不查询数据库。
+    """
+    matrix = load_matrix(symbols, start_ts, end_ts)
+    return period_metrics_frame(matrix)
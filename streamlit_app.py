@@ -1,4 +1,5 @@
 import streamlit as st
+import bar_cube
 from app_pages.overview import render_overview
 from app_pages.ohlcv import render_ohlcv_page
 from app_pages.ai_strong_assets import render_ai_strong_assets_page
@@ -37,6 +38,8 @@ PAGES["编辑标的标签"] = render_label_assets_page
 
 def main():
     st.set_page_config(page_title="K2Database Monitor", layout="wide")
+    # 最近 K 线常驻内存，页面计算不再每次查询数据库
+    bar_cube.enable()
     if not require_login():
         return
 
@@ -14,29 +14,18 @@ from __future__ import annotations
 from typing import Dict, List
 
 import pandas as pd
-import psycopg2
 import unicodedata
 
-from config import secret_get
-
-
-DB_CFG = {
-    "host": secret_get("DB_HOST", "127.0.0.1"),
-    "port": secret_get("DB_PORT", "5432"),
-    "dbname": secret_get("DB_NAME", "ohlcv_1h"),
-    "user": secret_get("DB_USER", "postgres"),
-    "password": secret_get("DB_PASSWORD", ""),
-}
+import db
+from queries import fetch_ohlcv_range
+from strategies.rankings import aggregate_stats, fetch_rank_stats, hourly_rank
 
 
 def get_labels_map() -> Dict[str, list]:
     """Return a mapping of symbol -> labels list."""
-    conn = psycopg2.connect(**DB_CFG)
-    cur = conn.cursor()
-    cur.execute("SELECT instrument_id, labels FROM instruments")
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+    with db.connection("ohlcv") as conn, conn.cursor() as cur:
+        cur.execute("SELECT instrument_id, labels FROM instruments")
+        rows = cur.fetchall()
 
     labels = {}
     for sym, lbl in rows:
@@ -52,12 +41,9 @@ def get_labels_map() -> Dict[str, list]:
 
 def get_latest_ts() -> int:
     """Return latest ``time`` value from ``ohlcv_1h``."""
-    conn = psycopg2.connect(**DB_CFG)
-    cur = conn.cursor()
-    cur.execute("SELECT MAX(time) FROM ohlcv_1h")
-    res = cur.fetchone()
-    cur.close()
-    conn.close()
+    with db.connection("ohlcv") as conn, conn.cursor() as cur:
+        cur.execute("SELECT MAX(time) FROM ohlcv_1h")
+        res = cur.fetchone()
     if not res or res[0] is None:
         raise RuntimeError("ohlcv_1h 表无数据")
     return int(res[0])
@@ -65,84 +51,8 @@ def get_latest_ts() -> int:
 
 def fetch_range(start_ts: int, end_ts: int) -> pd.DataFrame:
     """Return OHLCV rows for the given time range."""
-    conn = psycopg2.connect(**DB_CFG)
-    sql = (
-        "SELECT symbol, time, open, close FROM ohlcv_1h "
-        "WHERE time BETWEEN %s AND %s"
-    )
-    df = pd.read_sql(sql, conn, params=(start_ts, end_ts))
-    conn.close()
-    return df
-
-
-def hourly_rank(df: pd.DataFrame) -> pd.DataFrame:
-    """Return records of hourly ranking for **all** symbols."""
-    if df.empty:
-        return pd.DataFrame(columns=["time", "symbol", "pct", "rank"])
-
-    df["pct"] = (df["close"] - df["open"]) / df["open"] * 100
-    df["rank"] = (
-        df.groupby("time")["pct"].rank(ascending=False, method="min").astype(int)
-    )
-
-    df = df.sort_values(["time", "rank"])  # nicer ordering
-    return df[["time", "symbol", "pct", "rank"]]
-
-
-def aggregate_stats(ranks: pd.DataFrame) -> pd.DataFrame:
-    """Aggregate ranking statistics for each symbol.
-
-    ``avg_percentile`` is the mean of each hour's percentile score where a
-    higher value means better performance. ``median_rank`` retains the original
-    median rank logic. Missing hours are counted as one rank worse than the
-    worst actual rank for that hour. ``times`` counts how often a symbol ranked
-    within the top 40.
-    """
-
-    if ranks.empty:
-        return pd.DataFrame(
-            columns=["symbol", "times", "avg_percentile", "median_rank"]
-        )
-
-    # Pivot tables for percentile calculation and median rank
-    pivot_rank = ranks.pivot(index="symbol", columns="time", values="rank")
-    pivot_pct = ranks.pivot(index="time", columns="symbol", values="pct")
-
-    times = (pivot_rank <= 40).sum(axis=1)
-
-    max_rank_by_time = ranks.groupby("time")["rank"].max()
-    pivot_rank = pivot_rank.apply(
-        lambda col: col.fillna(max_rank_by_time[col.name] + 1)
-    )
-
-    median_rank = pivot_rank.median(axis=1)
-
-    # Calculate percentile scores for each hour
-    df_percentile = pd.DataFrame(
-        index=pivot_pct.index, columns=pivot_pct.columns, dtype=float
-    )
-    N = pivot_pct.shape[1]
-    for h in pivot_pct.index:
-        ranks_series = pivot_pct.loc[h].rank(
-            ascending=False, method="first", na_option="bottom"
-        )
-        df_percentile.loc[h] = (N - ranks_series) / (N - 1)
-
-    avg_percentile = df_percentile.mean(axis=0)
-
-    stats = pd.DataFrame(
-        {
-            "symbol": avg_percentile.index,
-            "times": times.reindex(avg_percentile.index).fillna(0).astype(int),
-            "avg_percentile": avg_percentile,
-            "median_rank": median_rank.reindex(avg_percentile.index),
-        }
-    )
-
-    stats = stats.sort_values(
-        ["times", "avg_percentile"], ascending=[False, False]
-    )
-    return stats.reset_index(drop=True)
+    with db.connection("ohlcv") as conn:
+        return fetch_ohlcv_range(conn, start_ts, end_ts, fields=("open", "close"))
 
 
 def _display_width(text: str) -> int:
@@ -204,9 +114,11 @@ def main() -> None:
     end_ts = get_latest_ts()
     start_ts = end_ts - 23 * 3600 * 1000
 
-    df = fetch_range(start_ts, end_ts)
-    ranks = hourly_rank(df)
-    stats = aggregate_stats(ranks)
+    stats = fetch_rank_stats(start_ts, end_ts, 40)
+    if stats is None:
+        df = fetch_range(start_ts, end_ts)
+        ranks = hourly_rank(df)
+        stats = aggregate_stats(ranks)
 
     if stats.empty:
         print("No data in the selected time range")
@@ -1,39 +1,23 @@
 #!/usr/bin/env python3
 """Compute consecutive 4h up candles for all symbols."""
-import psycopg2
-from config import secret_get
-
-DB_CFG = {
-    "host": secret_get("DB_HOST", "127.0.0.1"),
-    "port": secret_get("DB_PORT", "5432"),
-    "dbname": secret_get("DB_NAME", "ohlcv_4h"),
-    "user": secret_get("DB_USER", "postgres"),
-    "password": secret_get("DB_PASSWORD", ""),
-}
+import db
 
 
 def get_symbols():
-    conn = psycopg2.connect(**DB_CFG)
-    cur = conn.cursor()
-    cur.execute("SELECT DISTINCT symbol FROM ohlcv_4h")
-    symbols = [row[0] for row in cur.fetchall()]
-    cur.close()
-    conn.close()
+    with db.connection("ohlcv") as conn, conn.cursor() as cur:
+        cur.execute("SELECT DISTINCT symbol FROM ohlcv_4h")
+        symbols = [row[0] for row in cur.fetchall()]
     return symbols
 
 
 
 def fetch_closes(symbol: str, limit: int = 100):
-    conn = psycopg2.connect(**DB_CFG)
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT close FROM ohlcv_4h WHERE symbol=%s ORDER BY time DESC LIMIT %s",
-        (symbol, limit),
-
-    )
-    closes = [float(r[0]) for r in cur.fetchall()]
-    cur.close()
-    conn.close()
+    with db.connection("ohlcv") as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT close FROM ohlcv_4h WHERE symbol=%s ORDER BY time DESC LIMIT %s",
+            (symbol, limit),
+        )
+        closes = [float(r[0]) for r in cur.fetchall()]
     return closes
 
 
@@ -8,60 +8,18 @@ import time
 from pathlib import Path
 
 import pandas as pd
-import requests
 
 from test1hstrong import (
     get_latest_ts,
     fetch_range,
-    hourly_rank,
     get_labels_map,
     format_ascii_table,
 )
+from strategies.rankings import aggregate_stats, fetch_rank_stats, hourly_rank
 from prompt_manager import get_prompt
 from grok_api import ask_xai
-from config import load_proxy_env, get_proxy_dict, TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID
-
-# Ensure proxy variables are loaded
-load_proxy_env()
-PROXIES = get_proxy_dict()
-
-
-def aggregate_stats(ranks: pd.DataFrame, top_rank: int = 20) -> pd.DataFrame:
-    """Aggregate ranking statistics with ``top_rank`` threshold."""
-    if ranks.empty:
-        return pd.DataFrame(
-            columns=["symbol", "times", "avg_percentile", "median_rank"]
-        )
-
-    pivot_rank = ranks.pivot(index="symbol", columns="time", values="rank")
-    pivot_pct = ranks.pivot(index="time", columns="symbol", values="pct")
-
-    times = (pivot_rank <= top_rank).sum(axis=1)
-
-    max_rank_by_time = ranks.groupby("time")["rank"].max()
-    pivot_rank = pivot_rank.apply(lambda col: col.fillna(max_rank_by_time[col.name] + 1))
-
-    median_rank = pivot_rank.median(axis=1)
-
-    df_percentile = pd.DataFrame(index=pivot_pct.index, columns=pivot_pct.columns, dtype=float)
-    N = pivot_pct.shape[1]
-    for h in pivot_pct.index:
-        ranks_series = pivot_pct.loc[h].rank(ascending=False, method="first", na_option="bottom")
-        df_percentile.loc[h] = (N - ranks_series) / (N - 1)
-
-    avg_percentile = df_percentile.mean(axis=0)
-
-    stats = pd.DataFrame(
-        {
-            "symbol": avg_percentile.index,
-            "times": times.reindex(avg_percentile.index).fillna(0).astype(int),
-            "avg_percentile": avg_percentile,
-            "median_rank": median_rank.reindex(avg_percentile.index),
-        }
-    )
-
-    stats = stats.sort_values(["times", "avg_percentile"], ascending=[False, False])
-    return stats.reset_index(drop=True)
+import http_client
+from config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID
 
 
 def send_telegram(text: str, parse_mode: str | None = None) -> None:
@@ -78,7 +36,7 @@ def send_telegram(text: str, parse_mode: str | None = None) -> None:
         payload["parse_mode"] = parse_mode
 
     try:
-        resp = requests.post(url, json=payload, timeout=10, proxies=PROXIES or None)
+        resp = http_client.post(url, json=payload, timeout=10)
         if resp.status_code != 200:
             print("Failed to send telegram message:", resp.text)
     except Exception as exc:
@@ -92,9 +50,11 @@ def top_assets(limit: int = 5) -> pd.DataFrame:
     """Return top ``limit`` assets ranked by avg_percentile over last 4h."""
     end_ts = get_latest_ts()
     start_ts = end_ts - 3 * 3600 * 1000
-    df = fetch_range(start_ts, end_ts)
-    ranks = hourly_rank(df)
-    stats = aggregate_stats(ranks, top_rank=20)
+    stats = fetch_rank_stats(start_ts, end_ts, 20)
+    if stats is None:
+        df = fetch_range(start_ts, end_ts)
+        ranks = hourly_rank(df)
+        stats = aggregate_stats(ranks, top_n=20)
     if stats.empty:
         return stats
     labels_map = get_labels_map()
@@ -11,15 +11,15 @@ import time
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-import requests
 import pandas as pd
 import pytz
 
 from monitor_bot import send_message
-from config import CG_API_KEY, TZ_NAME
+from config import CG_API_BASE, CG_API_KEY, TZ_NAME
+from ingestion.ratelimit import limited_get
 
 CSV_FILE = Path("data/hyper_whale.csv")
-API_URL = "https://open-api-v4.coinglass.com/api/hyperliquid/whale-alert"
+API_URL = f"{CG_API_BASE}/hyperliquid/whale-alert"
 LOG_FILE = "hyper_whale_alert.log"
 
 TZ = pytz.timezone(TZ_NAME)
@@ -41,7 +41,7 @@ def fetch_records(api_key: str) -> list[dict]:
     """Return whale alert records from Coinglass."""
     headers = {"accept": "application/json", "CG-API-KEY": api_key}
     try:
-        resp = requests.get(API_URL, headers=headers, timeout=15)
+        resp = limited_get(API_URL, priority="high", headers=headers, timeout=15)
         data = resp.json().get("data", []) if resp.status_code == 200 else []
     except Exception:
         return []
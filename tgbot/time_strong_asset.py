@@ -7,11 +7,10 @@ from datetime import datetime, timedelta
 import os
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
-import pandas as pd
 from sqlalchemy import text
 import pytz
 
-from strategies.strong_assets import compute_period_metrics
+from strategies.strong_assets import compute_universe_period_metrics
 from db import engine_ohlcv
 from monitor_bot import ascii_table, send_message
 from config import TZ_NAME
@@ -31,23 +30,13 @@ def last_4h_range() -> tuple[int, int, str]:
 def main() -> None:
     start_ts, end_ts, label = last_4h_range()
     with engine_ohlcv.begin() as conn:
-        symbols = [r[0] for r in conn.execute(text("SELECT DISTINCT symbol FROM ohlcv_1h"))]
         label_map = {r[0]: r[1] for r in conn.execute(text("SELECT instrument_id, labels FROM instruments"))}
 
-    records = []
-    for sym in symbols:
-        try:
-            m = compute_period_metrics(sym, start_ts, end_ts)
-        except ValueError:
-            continue
-        m["symbol"] = sym
-        records.append(m)
-
-    if not records:
+    df = compute_universe_period_metrics(start_ts, end_ts)
+    if df.empty:
         print("No data for the specified period")
         return
 
-    df = pd.DataFrame(records)
     df["标签"] = df["symbol"].map(lambda s: "，".join(label_map.get(s, [])) if label_map.get(s) else "")
     df["期间收益"] = (df["period_return"] * 100).map(lambda x: f"{x:.2f}%")
     df = df.sort_values("period_return", ascending=False).reset_index(drop=True)
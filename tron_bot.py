@@ -4,29 +4,20 @@
 import traceback
 from datetime import datetime, timezone, timedelta
 
-import psycopg2
 import psycopg2.extras
-import requests
 from dotenv import load_dotenv
 
-from config import secret_get, TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, get_proxy_dict
+import db
+import http_client
+from config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID
 
 load_dotenv()
 
-DB_CFG = {
-    "host": secret_get("DB_HOST", "127.0.0.1"),
-    "port": secret_get("DB_PORT", "5432"),
-    "dbname": secret_get("TRON_DB_NAME", secret_get("DB_NAME", "tron_usd1")),
-    "user": secret_get("DB_USER", "postgres"),
-    "password": secret_get("DB_PASSWORD", ""),
-}
-
 API_URL = (
     "https://api.trongrid.io/v1/contracts/TPFqcBAaaUMCSVRCqPaQ9QnzKhmuoLR6Rc"
     "/events?only_confirmed=true&limit=50"
 )
 
-PROXIES = get_proxy_dict()
 TZ8 = timezone(timedelta(hours=8))
 LOG_FILE = "tron_bot.log"
 
@@ -49,7 +40,7 @@ def send_telegram(text: str) -> None:
         return
     url = f"https://api.telegram.org/bot{token}/sendMessage"
     try:
-        requests.post(url, json={"chat_id": chat_id, "text": text}, timeout=10, proxies=PROXIES or None)
+        http_client.post(url, json={"chat_id": chat_id, "text": text}, timeout=10)
     except Exception as exc:
         print("Failed to send telegram message:", exc)
 
@@ -70,13 +61,13 @@ def ensure_table() -> None:
         PRIMARY KEY(transaction_id, event_index)
     );
     """
-    with psycopg2.connect(**DB_CFG) as conn, conn.cursor() as cur:
+    with db.connection("tron") as conn, conn.cursor() as cur:
         cur.execute(sql)
         conn.commit()
 
 
 def fetch_events() -> list[dict]:
-    resp = requests.get(API_URL, headers={"Accept": "application/json"}, timeout=30, proxies=PROXIES or None)
+    resp = http_client.get(API_URL, headers={"Accept": "application/json"}, timeout=30)
     resp.raise_for_status()
     return resp.json().get("data", [])
 
@@ -91,7 +82,7 @@ def insert_events(events: list[dict]) -> list[dict]:
     ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
     ON CONFLICT(transaction_id, event_index) DO NOTHING;
     """
-    with psycopg2.connect(**DB_CFG) as conn, conn.cursor() as cur:
+    with db.connection("tron") as conn, conn.cursor() as cur:
         for ev in events:
             cur.execute(
                 sql,